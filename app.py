@@ -7,188 +7,96 @@
 #!/usr/bin/env python
 # coding: utf-8
 
-import re
-import uuid
+import io
+import os
 from pathlib import Path
 import json
-import unicodedata
-import math
+import numpy as np
 import pandas as pd
 import streamlit as st
 from datetime import datetime
 
+from core.hydraulics import KPA_PER_M
+from core.cache_resultados import cache_global, impressao_digital
+from core.incremental import ResultadosIncrementais
+from core.perf import CapturaPerfil, Rastreador, habilitar_log
+from core.projeto import BASE_COLS, RESULT_COLS, cast_trechos, load_project
+from core.projeto_npz import save_project_npz
+from core.dimensionamento import dimensionar_dn
+from core.excel_parser import SHEETS, load_sheets_streaming, normalize_compr_eq, sheet_names
+from core.conversao import numero, parse_lista, rotulo_trecho
+from core.demanda_estocastica import simular_demanda_estocastica
+from core.malha import resolver_malha
+from core.importacao import importar, ler_tabela, preparar_lote, trechos_de_compr_eq
+from core.pecas import TIPOS_PECAS, QuantidadesPecas, leq_candidatos, leq_trechos
+from core.periodo_estendido import PADRAO_RESIDENCIAL, simular_periodo
+from core.sweep import grade_cenarios, varrer
+from core.table_cache import invalidate as invalidate_tables, read_csv_cached
+from core.tables import dn_index, lookup_row_by_mm
+from core.topologia import normalize_label
+from core.trecho_store import TrechoStore
+
 VERSION_STAMP = datetime.now().strftime("build %Y-%m-%d %H:%M:%S") + " – regras fixas (Entrada=1, Tê=2, Cruzeta=3) + Resultados OK"
 
 # =========================
 # Helpers & constants
 # =========================
 
-KPA_PER_M = 9.80665  # 1 m.c.a. ≈ 9.80665 kPa
-
-# Colunas-base (inclui tipo da conexão no início do trecho)
-BASE_COLS = [
-    'id','ramo','ordem','tipo_ini','de_no','para_no',
-    'dn_mm','de_ref_mm','pol_ref',
-    'comp_real_m','dz_io_m','peso_trecho','leq_m','p_min_ref_kPa'
-]
-DTYPES = {
-    'id':'string','ramo':'string','ordem':'Int64','tipo_ini':'string',
-    'de_no':'string','para_no':'string',
-    'dn_mm':'float','de_ref_mm':'float','pol_ref':'string',
-    'comp_real_m':'float','dz_io_m':'float','peso_trecho':'float','leq_m':'float','p_min_ref_kPa':'float'
-}
-
-def _s(x):
-    try:
-        if pd.isna(x): return ''
-    except Exception:
-        pass
-    return '' if x is None else str(x)
-
-def _num(x, default=0.0):
-    try:
-        if pd.isna(x): return default
-    except Exception:
-        pass
-    try:
-        return float(str(x).replace(',', '.'))
-    except Exception:
-        return default
-
-def _i(x, default=0):
-    try: return int(_num(x, default))
-    except Exception: return default
-
-def trecho_label(r):
-    return f"{_s(r.get('ramo'))}-{_i(r.get('ordem'))} [{_s(r.get('de_no'))}→{_s(r.get('para_no'))}] ({_s(r.get('tipo_ini'))}) id={_s(r.get('id'))}"
-
 def _st_rerun():
     if hasattr(st, 'rerun'):
         st.rerun()
     elif hasattr(st, 'experimental_rerun'):
         st.experimental_rerun()
 
-def _ensure_session_df():
-    if 'trechos' not in st.session_state or not isinstance(st.session_state['trechos'], pd.DataFrame):
-        st.session_state['trechos'] = pd.DataFrame(columns=BASE_COLS)
-    else:
-        df = st.session_state['trechos']
-        for c in BASE_COLS:
-            if c not in df.columns:
-                df[c] = pd.Series([None]*len(df))
-        st.session_state['trechos'] = df[BASE_COLS]
-
-def _norm_tipo(x:str)->str:
-    """Normaliza 'tipo_ini' para comparação robusta (te/tê, entrada de água, cruzeta)."""
-    s = _s(x).lower().strip()
-    s = ''.join(ch for ch in unicodedata.normalize('NFD', s) if unicodedata.category(ch) != 'Mn')  # remove acentos
-    s = s.replace(' ', '')
-    if 'entrada' in s: return 'entrada'
-    if 'cruzeta' in s: return 'cruzeta'
-    if 'te' in s: return 'te'
-    return s
-
-# =========================
-# Notação dos nós (A..Z, AA.. / 1..N)
-# =========================
-
-def excel_next_label(lbl: str) -> str:
-    """Próximo rótulo estilo Excel (A..Z, AA..AZ, BA..)."""
-    s = (lbl or '').strip().upper()
-    if s == '': return 'A'
-    if not re.fullmatch(r'[A-Z]+', s): s = 'A'
-    chars = list(s); i = len(chars) - 1; carry = True
-    while i >= 0 and carry:
-        if chars[i] == 'Z':
-            chars[i] = 'A'; i -= 1
-        else:
-            chars[i] = chr(ord(chars[i]) + 1); carry = False
-    if carry: chars = ['A'] + chars
-    return ''.join(chars)
-
-def normalize_label(value: str, mode: str) -> str:
-    """Limpa/valida rótulos conforme o modo escolhido (Letras ou Números)."""
-    if mode.startswith('Letras'):
-        v = (value or '').strip().upper()
-        if not re.fullmatch(r'[A-Z]+', v):
-            raise ValueError('Use apenas letras maiúsculas (A–Z, AA, AB, ...).')
-        return v
-    else:  # 'Números (1, 2, 3, ...)'
-        v = (value or '').strip()
-        if not re.fullmatch(r'[0-9]+', v):
-            raise ValueError('Use apenas dígitos (0–9).')
-        return str(int(v))  # remove zeros à esquerda (mantém "0" se for zero)
-
-# =========================
-# Modelos de perda de carga (J)
-# =========================
-def j_hazen_williams(Q_Ls: float, D_mm: float, C: float) -> float:
-    """Hazen-Williams (J em m/m). Q em L/s -> m³/s ; D em mm -> m."""
-    Q = max(0.0, _num(Q_Ls, 0.0)) / 1000.0
-    D = max(0.0, _num(D_mm, 0.0)) / 1000.0
-    C = max(0.0, _num(C, 0.0))
-    if D <= 0.0 or C <= 0.0 or Q <= 0.0:
-        return 0.0
-    return 10.67 * (Q ** 1.852) / ((C ** 1.852) * (D ** 4.87))
-
-def j_fair_whipple_hsiao_kPa_per_m(Q_Ls: float, D_mm: float, material: str) -> float:
-    """Fair-Whipple-Hsiao (aprox prática, devolve J em kPa/m)."""
-    Q = max(0.0, _num(Q_Ls, 0.0))
-    D = max(0.0, _num(D_mm, 0.0))
-    if D <= 0.0 or Q <= 0.0:
-        return 0.0
-    mat = (material or '').strip().lower()
-    if mat == 'pvc':
-        return 8.695e6 * (Q ** 1.75) / (D ** 4.75)
-    else:
-        return 20.2e6  * (Q ** 1.88) / (D ** 4.88)
+def _ensure_store():
+    """Trechos ficam em um TrechoStore colunar; um DataFrame legado em 'trechos' é migrado."""
+    if not isinstance(st.session_state.get('trechos_store'), TrechoStore):
+        legado = st.session_state.pop('trechos', None)
+        st.session_state['trechos_store'] = (TrechoStore.from_frame(cast_trechos(legado))
+                                             if isinstance(legado, pd.DataFrame) else TrechoStore())
+    return st.session_state['trechos_store']
+
+def _ensure_pecas() -> QuantidadesPecas:
+    """Quantidades de peças por trecho (matriz esparsa por id), mantidas entre reruns."""
+    if not isinstance(st.session_state.get('pecas_trechos'), QuantidadesPecas):
+        st.session_state['pecas_trechos'] = QuantidadesPecas()
+    return st.session_state['pecas_trechos']
+
+def _sincronizar_leq(indice) -> int:
+    """Regrava leq_m dos trechos com peças cadastradas (um passo para todos); só roda
+    quando trechos, quantidades ou tabela mudaram. Devolve quantos trechos mudaram."""
+    store, pecas = _ensure_store(), _ensure_pecas()
+    chave = (id(store), store.versao, pecas.versao, id(indice))
+    if not len(pecas) or st.session_state.get('_leq_sincronizado') == chave:
+        return 0
+    pecas.podar(store.posicao)
+    leq, com = leq_trechos(pecas, store.posicao, store.coluna('dn_mm'), indice)
+    mudou = np.flatnonzero(com & ~np.isclose(leq, store.coluna('leq_m'), rtol=0.0, atol=1e-9))
+    if mudou.size:
+        store.set_coluna('leq_m', leq[mudou], mudou)
+        if '_motor_resultados' in st.session_state:
+            st.session_state['_motor_resultados'].marcar_sujo(mudou)
+    st.session_state['_leq_sincronizado'] = (id(store), store.versao, pecas.versao, id(indice))
+    return int(mudou.size)
+
+def _trechos_df() -> pd.DataFrame:
+    """Visão DataFrame (somente leitura) dos trechos, para exibição e cálculo."""
+    return _ensure_store().to_frame()
 
 # =========================
 # Tabelas de L_eq (seguras)
 # =========================
 def safe_load_tables():
     pvc = pd.DataFrame(); fofo = pd.DataFrame()
+    base = Path(__file__).parent
     try:
-        base = Path(__file__).parent
-        pvc = pd.read_csv(base / 'data/pvc_pl_eqlen.csv')
+        pvc = read_csv_cached(base / 'data/pvc_pl_eqlen.csv')
     except Exception: pass
     try:
-        base = Path(__file__).parent
-        fofo = pd.read_csv(base / 'data/fofo_pl_eqlen.csv')
+        fofo = read_csv_cached(base / 'data/fofo_pl_eqlen.csv')
     except Exception: pass
     return pvc, fofo
 
-def get_dn_series(table):
-    if table.empty: return None, None
-    for nm in table.columns:
-        low = nm.lower()
-        if ('de' in low or 'dn' in low or 'diam' in low) and 'mm' in low:
-            return table[nm], nm
-    return table.iloc[:, 0], table.columns[0]
-
-def piece_columns_for(table):
-    if table.empty: return [], None
-    dn_series, dn_name = get_dn_series(table)
-    cols = [c for c in table.columns if c not in (dn_name, 'dref_pol')]
-    return cols, dn_name
-
-def lookup_row_by_mm(table, ref_mm):
-    if table.empty:
-        return pd.Series(dtype=float), float(ref_mm or 0), ''
-    dn_series, dn_name = get_dn_series(table)
-    try: x = float(ref_mm)
-    except Exception: x = 0.0
-    idx = (dn_series - x).abs().idxmin()
-    row = table.loc[idx]
-    de_ref_mm = float(row.get(dn_name, 0) or 0)
-    pol_ref = _s(row.get('dref_pol')) if 'dref_pol' in table.columns else ''
-    return row, de_ref_mm, pol_ref
-
-def pretty(name: str):
-    name = (name or '').strip().replace('_', ' ')
-    name = name.replace(' de ', ' DE ').replace(' mm', ' (mm)')
-    return name
-
 # =========================
 # App
 # =========================
@@ -197,8 +105,24 @@ st.set_page_config(page_title='SPAF – Regras de Trechos (ramais, Tês, cruzeta
 st.title('SPAF – Barriletes e Colunas • Regras de Trechos (ramais, Tê, Cruzeta, Entrada)')
 st.caption(VERSION_STAMP)
 
-pvc_table, fofo_table = safe_load_tables()
-_ensure_session_df()
+# Instrumentação por etapas: desligada por padrão (span nulo, custo ~zero);
+# ligue na barra lateral ou com SPAF_PERF=1 (registros JSON no logger 'spaf.perf')
+perf = st.session_state.setdefault('_perf', Rastreador(os.environ.get('SPAF_PERF') == '1'))
+perf.ativo = bool(st.session_state.get('perf_ativo', perf.ativo))
+perf.nova_execucao()
+if perf.ativo:
+    habilitar_log()
+_captura = st.session_state.pop('_perf_captura', None)
+if _captura is not None:  # execução anterior interrompida (st.stop/rerun) antes do fim
+    _captura.parar()
+    st.session_state['_perf_relatorio'] = _captura
+if st.session_state.pop('_perf_capturar', False):
+    st.session_state['_perf_captura'] = CapturaPerfil().iniciar()
+
+with perf.span('safe_load_tables'):
+    pvc_table, fofo_table = safe_load_tables()
+with perf.span('store'):
+    _ensure_store()
 
 # Sidebar
 with st.sidebar:
@@ -213,6 +137,8 @@ with st.sidebar:
     st.markdown('---')
     st.subheader('Conversão de Peso (UC) → Vazão')
     st.caption('Q = k · Peso^exp')
+    acumular_peso = st.checkbox('Acumular peso_trecho a jusante', value=False,
+                                help='Peso informado = peso local do trecho; o app soma os pesos de toda a subárvore a jusante.')
     k_val  = st.number_input('k (Q = k·Peso^exp)',    min_value=0.0, step=0.01, value=0.30, format='%.2f')
     exp_val= st.number_input('exp (Q = k·Peso^exp)',  min_value=0.0, step=0.05, value=0.50, format='%.2f')
 
@@ -238,11 +164,22 @@ with st.sidebar:
 
     st.markdown('---')
     st.caption('Regras FÍSICAS FIXAS: Entrada=1 saída; Tê=2 saídas; Cruzeta=3 saídas.')
+    if st.button('Recarregar catálogos (L_eq/UC)', help='Descarta o cache das tabelas após atualizar os CSVs.'):
+        invalidate_tables()
+        _st_rerun()
+
+    st.markdown('---')
+    st.subheader('Desempenho')
+    st.checkbox('Medir tempo por etapa', value=perf.ativo, key='perf_ativo',
+                help='Mostra a duração de cada etapa da última execução e emite registros no log.')
+    if st.button('Perfilar próxima execução', help='cProfile + tracemalloc de uma execução, para download.'):
+        st.session_state['_perf_capturar'] = True
+        _st_rerun()
 
 tab1, tab2, tab3 = st.tabs(['Trechos', 'L_eq por DN (referencial)', 'Resultados'])
 
 # ---------------- TAB 1: Cadastro ----------------
-with tab1:
+with tab1, perf.span('aba.trechos'):
     st.subheader('Cadastrar trechos')
     with st.form('frm_add'):
         # Linha 1 – identificação
@@ -285,49 +222,17 @@ with tab1:
             except ValueError as e:
                 st.error(f'Erro na notação dos nós: {e}')
                 st.stop()
-            if de_no == para_no:
-                st.error('Início e fim do trecho não podem ser iguais.')
-                st.stop()
-
-            # 2) Duplicidade global (de_no + para_no) — independente do ramo
-            df = pd.DataFrame(st.session_state['trechos']).copy()
-            if not df.empty and {'de_no','para_no'} <= set(df.columns):
-                dup = df[(df['de_no'].astype(str)==de_no) & (df['para_no'].astype(str)==para_no)]
-                if not dup.empty:
-                    st.error(f'Já existe um trecho {de_no} → {para_no}.')
-                    st.stop()
-
-            # 3) Regras FÍSICAS FIXAS de saídas por nó de início + consistência do tipo
-            cap_map = {'entrada': 1, 'te': 2, 'cruzeta': 3}
-            tipo_sel_norm = _norm_tipo(tipo_ini)
-
-            count_out = 0
-            if not df.empty and {'de_no','tipo_ini'} <= set(df.columns):
-                subset = df[df['de_no'].astype(str)==de_no]
-                if not subset.empty:
-                    tipos_exist_norm = set(_norm_tipo(x) for x in subset['tipo_ini'].tolist())
-                    if len(tipos_exist_norm) > 1 and tipo_sel_norm not in tipos_exist_norm:
-                        st.error('O nó de início já foi cadastrado com tipos diferentes. Padronize o tipo.')
-                        st.stop()
-                    if len(tipos_exist_norm) == 1 and tipo_sel_norm not in tipos_exist_norm:
-                        st.error(f'O nó "{de_no}" já está definido como "{list(subset["tipo_ini"].unique())[0]}".')
-                        st.stop()
-                    count_out = len(subset)
-
-            cap_allowed = cap_map.get(tipo_sel_norm, 2)
-            if count_out >= cap_allowed:
-                st.error(f'O nó de início "{de_no}" ({tipo_ini}) já atingiu o limite de {cap_allowed} saída(s).')
+            # 2) Duplicidade (de_no + para_no), tipo do nó de início e regras FÍSICAS FIXAS
+            #    de saídas — O(1) pelo índice de nós mantido no store
+            store = _ensure_store()
+            erro = store.nos.validar(de_no, para_no, tipo_ini)
+            if erro:
+                st.error(erro)
                 st.stop()
+            fecha_malha = store.nos.criaria_ciclo(de_no, para_no)
 
             # 4) Monta nova linha (ID único)
-            base_exist = pd.DataFrame(st.session_state['trechos'])
-            existing_ids = set(
-                base_exist.get('id', pd.Series([], dtype=str)).astype(str).fillna('').str.strip().tolist()
-            )
-            raw_id = (id_val or '').strip()
-            if (not raw_id) or (raw_id in existing_ids):
-                base_tag = raw_id if raw_id else 'row'
-                raw_id = f"{base_tag}_{uuid.uuid4().hex[:6]}"
+            raw_id = store.novo_id(id_val)
 
             # L_eq de referência (se tabelas existirem)
             table_mat = pvc_table if (str(material_sistema).strip().lower()=='pvc') else fofo_table
@@ -341,138 +246,192 @@ with tab1:
                 'peso_trecho':float(peso_trecho),'leq_m':0.0,'p_min_ref_kPa':float(p_min_ref_kPa)
             }
 
-            base = pd.concat([df, pd.DataFrame([nova])], ignore_index=True)
-            for c,t in DTYPES.items():
-                try: base[c] = base[c].astype(t)
-                except Exception: pass
-            st.session_state['trechos'] = base[BASE_COLS]
+            store.append(nova)
             st.success(f'Trecho adicionado: {ramo}: {de_no} → {para_no} ({tipo_ini}).')
+            if fecha_malha:
+                st.warning(f'O trecho {de_no} → {para_no} liga dois nós já conectados (fecha uma malha).')
+
+    with st.expander('Importar trechos em lote (CSV / Excel / Compr_Eq_(AF1))'):
+        st.caption('Colunas com os nomes de BASE_COLS (de_no, para_no e dn_mm obrigatórias). '
+                   'O lote inteiro é validado com as regras do cadastro e gravado de uma vez.')
+        arq = st.file_uploader('Arquivo', type=['csv', 'xlsx', 'xlsm'], key='imp_arquivo')
+        ajustar_dn = st.checkbox('Ajustar dn_mm ao DN de referência mais próximo da tabela de L_eq', value=False)
+        if arq is not None and material_sistema == '(selecione)':
+            st.warning('Selecione o Material do Sistema na barra lateral.')
+        elif arq is not None:
+            try:
+                if arq.name.lower().endswith(('.xlsx', '.xlsm')):
+                    abas = sheet_names(arq)
+                    aba = st.selectbox('Aba', abas, index=abas.index(SHEETS[2]) if SHEETS[2] in abas else 0)
+                    arq.seek(0)
+                    if aba == SHEETS[2]:
+                        bruto = load_sheets_streaming(arq, sheets=[aba]).compr_eq
+                        lote = trechos_de_compr_eq(normalize_compr_eq(bruto))
+                    else:
+                        lote = ler_tabela(arq, arq.name, aba)
+                else:
+                    lote = ler_tabela(arq, arq.name)
+            except Exception as e:
+                st.error(f'Não foi possível ler o arquivo: {e}')
+            else:
+                table_mat = pvc_table if (str(material_sistema).strip().lower()=='pvc') else fofo_table
+                with perf.span('importacao.validar', linhas=len(lote)):
+                    validos, erros = preparar_lote(lote, _ensure_store(), notacao_mode, dn_index(table_mat), ajustar_dn)
+                st.write(f'{len(validos)} trecho(s) válido(s), {len(erros)} rejeitado(s).')
+                if len(erros):
+                    st.dataframe(erros, use_container_width=True, height=200)
+                if len(validos) and st.button(f'Importar {len(validos)} trecho(s)'):
+                    importar(_ensure_store(), validos)
+                    _st_rerun()
+
+    with st.expander('Abrir projeto salvo (.npz / .json)'):
+        arq_proj = st.file_uploader('Projeto', type=['npz', 'json'], key='abrir_projeto')
+        if arq_proj is not None and st.button('Carregar projeto (substitui os trechos atuais)'):
+            try:
+                with perf.span('projeto.carregar'):
+                    params_arq, trechos_arq, pecas_arq = load_project(arq_proj, pecas=True)
+                    st.session_state['trechos_store'] = TrechoStore.from_frame(cast_trechos(trechos_arq))
+                    st.session_state['pecas_trechos'] = QuantidadesPecas.from_triplas(pecas_arq)
+            except Exception as e:
+                st.error(f'Não foi possível abrir o projeto: {e}')
+            else:
+                for k in ('_motor_resultados', '_proposta_dn', '_leq_sincronizado'):
+                    st.session_state.pop(k, None)
+                st.session_state['_params_carregados'] = params_arq
+                _st_rerun()
+        params_arq = st.session_state.get('_params_carregados')
+        if params_arq:
+            q = params_arq.get('Q_from_Peso') or {}
+            malhas = ', malhas resolvidas pelo gradiente global' if params_arq.get('solucionador') == 'malha' else ''
+            st.info(f"Projeto carregado: {params_arq.get('projeto', '')} — material {params_arq.get('material')}, "
+                    f"{params_arq.get('modelo_perda')}, k={q.get('k')}, exp={q.get('exp')}, "
+                    f"H_oper={(params_arq.get('reservatorio_m') or {}).get('H_oper')} m{malhas}. "
+                    'Ajuste os parâmetros da barra lateral, se necessário.')
 
     vis_cols = [c for c in BASE_COLS if c!='leq_m']
-    st.dataframe(pd.DataFrame(st.session_state['trechos'])[vis_cols], use_container_width=True, height=360)
+    with perf.span('trechos.tabela'):
+        st.dataframe(_trechos_df()[vis_cols], use_container_width=True, height=360)
+    with perf.span('trechos.topologia'):
+        nos_idx = _ensure_store().nos
+        ciclos = nos_idx.ciclos
+        soltos = nos_idx.desconectados()
+    if ciclos:
+        st.info('Trechos que fecham malha (resolvidos na aba Resultados pelo gradiente global): '
+                + ', '.join(f'{a} → {b}' for a, b in ciclos))
+    if soltos:
+        st.warning(f'{len(soltos)} nó(s) sem ligação com a Entrada: ' + ', '.join(sorted(soltos)[:20])
+                   + (' …' if len(soltos) > 20 else ''))
 
 # ---------------- Gerenciar trechos ----------------
 st.subheader('Gerenciar trechos')
 
-def _move_row_action(row_id, ramo_val, direction):
-    df = pd.DataFrame(st.session_state.get('trechos', pd.DataFrame()))
-    if df.empty or 'ramo' not in df.columns or 'ordem' not in df.columns:
-        return
-    if 'id' not in df.columns:
-        df = df.reset_index().rename(columns={'index':'id'})
-    sub = df[df['ramo']==ramo_val].sort_values('ordem', kind='stable')
-    ids = sub['id'].tolist()
-    if row_id not in ids:
-        return
-    i = ids.index(row_id)
-    if direction == 'up' and i > 0:
-        ids[i-1], ids[i] = ids[i], ids[i-1]
-    elif direction == 'down' and i < len(ids)-1:
-        ids[i], ids[i+1] = ids[i+1], ids[i]
-    sub = sub.set_index('id').loc[ids].reset_index()
-    sub['ordem'] = range(1, len(sub)+1)
-    df.loc[df['ramo']==ramo_val, 'ordem'] = None
-    for _, r in sub.iterrows():
-        df.loc[(df['ramo']==ramo_val) & (df['id']==r['id']), 'ordem'] = r['ordem']
-    for k, rid in enumerate(ids, start=1):
-        df.loc[df['id']==rid, 'ordem'] = k
-    st.session_state['trechos'] = df[BASE_COLS]
-    _st_rerun()
-
-def _delete_row_action(row_id, ramo_val):
-    df = pd.DataFrame(st.session_state.get('trechos', pd.DataFrame()))
-    if df.empty: return
-    if 'id' not in df.columns:
-        df = df.reset_index().rename(columns={'index':'id'})
-    df = df[df['id'] != row_id].reset_index(drop=True)
-    if 'ramo' in df.columns and 'ordem' in df.columns:
-        for rv in df['ramo'].dropna().unique().tolist():
-            sub = df[df['ramo']==rv].sort_values('ordem', kind='stable').copy()
-            sub['ordem'] = range(1, len(sub)+1)
-            df.loc[df['ramo']==rv, 'ordem'] = None
-            for _, r in sub.iterrows():
-                df.loc[(df['ramo']==rv) & (df['id']==r['id']), 'ordem'] = r['ordem']
-    st.session_state['trechos'] = df[BASE_COLS]
-    _st_rerun()
-
-df_view = pd.DataFrame(st.session_state.get('trechos', pd.DataFrame()))
-if not df_view.empty:
-    if 'ramo' in df_view.columns and 'ordem' in df_view.columns:
-        tman = df_view.sort_values(['ramo','ordem'], kind='stable').reset_index(drop=True)
+def _ids_selecionados(store) -> set:
+    """Ids marcados na grade de gerenciamento (valem entre páginas e filtros)."""
+    sel = st.session_state.setdefault('_mgr_sel', set())
+    sel.intersection_update([i for i in sel if store.tem_id(i)])
+    return sel
+
+with perf.span('gerenciar.grade'):
+    store = _ensure_store()
+    df_view = _trechos_df()
+    if not df_view.empty:
+        # índice do DataFrame = posição no store
+        tman = df_view.sort_values(['ramo', 'ordem'], kind='stable', na_position='last')
+        r_opt = ['Todos'] + sorted(str(x) for x in tman['ramo'].dropna().unique().tolist())
+        g1, g2, g3 = st.columns([2, 1, 1])
+        ramo_sel = g1.selectbox('Filtrar por ramo', r_opt, key='manage_ramo_sel')
+        tview = tman[tman['ramo'].astype(str) == ramo_sel] if ramo_sel != 'Todos' else tman
+        por_pagina = g2.selectbox('Linhas por página', [50, 100, 250, 500], index=1, key='mgr_por_pagina')
+        n_pag = max(1, -(-len(tview) // por_pagina))
+        if st.session_state.get('mgr_pagina', 1) > n_pag:
+            st.session_state['mgr_pagina'] = n_pag
+        pagina = int(g3.number_input(f'Página (de {n_pag})', min_value=1, max_value=n_pag, step=1, key='mgr_pagina'))
+
+        show_cols = ['id','ramo','ordem','tipo_ini','de_no','para_no',
+                     'dn_mm','de_ref_mm','pol_ref','comp_real_m','dz_io_m','peso_trecho']
+        pag = tview.iloc[(pagina-1)*por_pagina : pagina*por_pagina]
+        selecionados = _ids_selecionados(store)
+        ids_pag = pag['id'].astype(str).tolist()
+        grade = pag[show_cols].copy()
+        grade.insert(0, '✓', [i in selecionados for i in ids_pag])
+        st.caption('Marque as linhas (✓) e use os botões abaixo; a seleção vale entre páginas e filtros. '
+                   'Subir/descer troca a posição com o vizinho dentro do ramo (blocos marcados andam juntos).')
+        # as marcações do editor são por linha exibida: a chave muda quando o store ou a
+        # seleção são alterados fora dele (mover, excluir, marcar página, limpar)
+        geracao = st.session_state.setdefault('_mgr_geracao', 0)
+        editada = st.data_editor(grade, hide_index=True, use_container_width=True, disabled=show_cols,
+                                 column_config={'✓': st.column_config.CheckboxColumn(help='Selecionar')},
+                                 key=f'mgr_grade_{store.versao}_{geracao}_{ramo_sel}_{pagina}_{por_pagina}')
+        selecionados.difference_update(ids_pag)
+        selecionados.update(i for i, m in zip(ids_pag, editada['✓'].tolist()) if m)
+
+        a1, a2, a3, a4, a5, a6 = st.columns(6)
+        n_sel = len(selecionados)
+        if a1.button('Marcar página'):
+            selecionados.update(ids_pag)
+            st.session_state['_mgr_geracao'] = geracao + 1
+            _st_rerun()
+        if a2.button('Limpar seleção', disabled=not n_sel):
+            selecionados.clear()
+            st.session_state['_mgr_geracao'] = geracao + 1
+            _st_rerun()
+        pos_sel = [store.posicao(i) for i in selecionados]
+        if a3.button('↑ Subir', disabled=not n_sel):
+            store.mover(pos_sel, -1)
+            _st_rerun()
+        if a4.button('↓ Descer', disabled=not n_sel):
+            store.mover(pos_sel, +1)
+            _st_rerun()
+        if a5.button(f'🗑 Excluir ({n_sel})', disabled=not n_sel):
+            store.remover(pos_sel)
+            selecionados.clear()
+            _st_rerun()
+        if a6.button('Renumerar ordem', help='Reescreve ordem = 1..n em cada ramo (remove as lacunas deixadas por exclusões).'):
+            ren = tman.groupby(tman['ramo'].astype(object).fillna(''), sort=False).cumcount() + 1
+            store.set_coluna('ordem', ren.tolist(), tman.index.to_numpy())
+            _st_rerun()
+        st.caption(f'{len(tview)} trecho(s) no filtro, {n_sel} selecionado(s).')
     else:
-        tman = df_view.reset_index(drop=True)
-
-    r_opt = ['Todos'] + (sorted([str(x) for x in tman['ramo'].dropna().unique().tolist()]) if 'ramo' in tman.columns else [])
-    ramo_sel = st.selectbox('Filtrar por ramo', r_opt or ['Todos'], key='manage_ramo_sel')
-
-    if ramo_sel != 'Todos' and 'ramo' in tman.columns:
-        tview = tman[tman['ramo'].astype(str)==ramo_sel].reset_index(drop=True)
-    else:
-        tview = tman.copy()
-
-    show_cols = [c for c in ['id','ramo','ordem','tipo_ini','de_no','para_no',
-                             'dn_mm','de_ref_mm','pol_ref','comp_real_m','dz_io_m','peso_trecho'] if c in tview.columns]
-
-    st.caption('Use os botões no final de cada linha para reordenar (↑, ↓) ou excluir (🗑).')
-    head = st.columns([*([1]*len(show_cols)), 1.2], gap='small')
-    for c, name in zip(head[:-1], show_cols):
-        c.markdown(f"**{name}**")
-    head[-1].markdown("**Ações**")
-
-    tv = tview.reset_index(drop=True)
-    for i, row in tv.iterrows():
-        row_cols = st.columns([*([1]*len(show_cols)), 1.2], gap='small')
-        for c, name in zip(row_cols[:-1], show_cols):
-            c.markdown(f"{row.get(name, '')}")
-        with row_cols[-1]:
-            a1, a2, a3 = st.columns(3, gap='small')
-            rid = str(row.get('id', '')).strip() or f"row_{i}"
-            ramo_val = row.get('ramo', 'R')
-            rid_key = f"{rid}_{ramo_val}_{i}"
-            with a1:
-                up = st.button("↑", key=f"mgr_up_{rid_key}", help="Mover para cima", disabled=(i==0))
-            with a2:
-                down = st.button("↓", key=f"mgr_down_{rid_key}", help="Mover para baixo", disabled=(i==len(tv)-1))
-            with a3:
-                delete = st.button("🗑", key=f"mgr_del_{rid_key}", help="Excluir esta linha")
-        if up:
-            _move_row_action(rid, ramo_val, 'up')
-        if down:
-            _move_row_action(rid, ramo_val, 'down')
-        if delete:
-            _delete_row_action(rid, ramo_val)
-else:
-    st.info('Nenhum trecho cadastrado ainda.')
+        st.info('Nenhum trecho cadastrado ainda.')
 
 # ---------------- TAB 2: L_eq (referencial) ----------------
-with tab2:
+with tab2, perf.span('aba.leq'):
     st.subheader('Comprimento Equivalente — editar por trecho (baseado no DN **referencial**)')
-    base = pd.DataFrame(st.session_state['trechos'])
+    base = _trechos_df()
     if base.empty:
         st.info('Cadastre trechos na aba 1.')
     elif material_sistema == '(selecione)':
         st.warning('Selecione o Material do Sistema na barra lateral.')
     else:
         table_mat = pvc_table if (str(material_sistema).strip().lower()=='pvc') else fofo_table
-        piece_cols, dn_name = piece_columns_for(table_mat)
-        sel = st.selectbox('Selecione o trecho', [trecho_label(r) for _, r in base.iterrows()])
-        if sel:
+        idx_mat = dn_index(table_mat)
+        pecas = _ensure_pecas()
+        st.caption('As quantidades ficam guardadas por trecho; ao trocar o material ou o DN, o L_eq de todos '
+                   'os trechos com peças é recalculado de uma vez. Trechos sem peças mantêm o leq_m importado.')
+        with perf.span('leq.sincronizar', trechos=len(base), com_pecas=len(pecas)):
+            _sincronizar_leq(idx_mat)
+        with perf.span('leq.selecao', trechos=len(base)):
+            sel = st.selectbox('Selecione o trecho', [rotulo_trecho(r) for _, r in base.iterrows()])
             idx_sel = None
-            for idx, r in base.iterrows():
-                if trecho_label(r) == sel:
+            for idx, r in (base.iterrows() if sel else ()):
+                if rotulo_trecho(r) == sel:
                     idx_sel = idx
                     break
+        if sel:
             if idx_sel is not None:
-                eql_row, de_ref_mm, pol_ref = lookup_row_by_mm(table_mat, base.loc[idx_sel, 'dn_mm'])
-                if piece_cols:
-                    display_labels = [pretty(c) for c in piece_cols]
-                    df = pd.DataFrame({
-                        'Conexão/Peça': display_labels,
-                        '(m)': [ _num(eql_row.get(c, 0.0), 0.0) for c in piece_cols ],
-                        '(Qt.)': [0]*len(piece_cols),
-                    }).set_index('Conexão/Peça')
-                else:
-                    df = pd.DataFrame({'Conexão/Peça': [], '(m)': [], '(Qt.)': []}).set_index('Conexão/Peça')
+                id_sel = str(base.loc[idx_sel, 'id'])
+                qt = pecas.linha(id_sel)
+                linha = idx_mat.canonica[idx_mat.nearest(base.loc[idx_sel, 'dn_mm'])] if not idx_mat.empty \
+                    else np.zeros(len(TIPOS_PECAS))
+                mostrar = [j for j, (k, _) in enumerate(TIPOS_PECAS) if idx_mat.disponivel[j] or k in qt]
+                sem_leq = [TIPOS_PECAS[j][1] for j in mostrar if not idx_mat.disponivel[j]]
+                if sem_leq:
+                    st.warning(f'Sem L_eq na tabela de {material_sistema} (contam 0 m): ' + ', '.join(sem_leq))
+                df = pd.DataFrame({
+                    'Conexão/Peça': [TIPOS_PECAS[j][1] for j in mostrar],
+                    '(m)': linha[mostrar],
+                    '(Qt.)': [qt.get(TIPOS_PECAS[j][0], 0) for j in mostrar],
+                }).set_index('Conexão/Peça')
                 edited = st.data_editor(
                     df,
                     use_container_width=True,
@@ -481,92 +440,295 @@ with tab2:
                         '(m)': st.column_config.NumberColumn(disabled=True, format='%.2f'),
                         '(Qt.)': st.column_config.NumberColumn(min_value=0, step=1)
                     },
-                    key=f'eq_editor_{idx_sel}'
+                    key=f'eq_editor_{id_sel}_{material_sistema}'
                 )
-                leq_total = float((edited['(m)'] * edited['(Qt.)']).sum()) if not edited.empty else 0.0
-                st.session_state['trechos'].loc[idx_sel, 'leq_m'] = leq_total
-                st.success(f'L_eq total para o trecho selecionado: {leq_total:.2f} m')
+                novo = {TIPOS_PECAS[j][0]: numero(q) for j, q in zip(mostrar, edited['(Qt.)'].tolist())}
+                novo = {k: q for k, q in novo.items() if q > 0}
+                if novo != qt and (novo or id_sel in pecas):
+                    pecas.definir(id_sel, novo)
+                    _sincronizar_leq(idx_mat)
+                leq_sel = numero(_ensure_store().coluna('leq_m')[base.index.get_loc(idx_sel)])
+                if id_sel in pecas:
+                    st.success(f'L_eq total para o trecho selecionado: {leq_sel:.2f} m')
+                else:
+                    st.info(f'Trecho sem peças cadastradas: leq_m atual = {leq_sel:.2f} m (digitado ou importado).')
 
 # ---------------- TAB 3: Resultados ----------------
-with tab3:
-    st.subheader('Resultados (kPa) — com J em kPa/m e pressão inicial no nó de origem do ramo')
+with tab3, perf.span('aba.resultados'):
+    st.subheader('Resultados (kPa) — com J em kPa/m e pressão herdada do nó de montante')
     st.caption('p_out = p_in + γ·(z_inicial − z_final) − h_f_cont − h_f_loc, com γ = 9,80665 kPa/m')
-    base = pd.DataFrame(st.session_state['trechos']).copy()
+    base = _trechos_df()
     if base.empty:
         st.info('Cadastre trechos e atribua L_eq na aba 2.')
     else:
-        # Vazão provável (L/s) a partir do Peso (UC)
-        base['Q (L/s)'] = (k_val * (base['peso_trecho'] ** exp_val)).astype(float)
-
-        # Gradiente J (kPa/m) e (m/m)
-        def _J_kPa(rr):
-            if modelo_perda == 'Hazen-Williams':
-                C = c_pvc if material_sistema == 'PVC' else c_fofo
-                j_mm = j_hazen_williams(rr['Q (L/s)'], rr['dn_mm'], C)  # m/m
-                return j_mm * KPA_PER_M
+        # Rede (de_no → para_no): p_in de cada trecho = p_out do trecho que alimenta seu nó
+        # de início; os trechos que partem da Entrada começam em p_in = H_oper * γ
+        # Resultados em cache pela impressão digital (trechos + parâmetros globais); numa falha,
+        # recalcula só os trechos alterados desde a última execução e sua subárvore a jusante
+        motor = st.session_state.setdefault('_motor_resultados', ResultadosIncrementais())
+        C = (c_pvc if material_sistema == 'PVC' else c_fofo) if modelo_perda == 'Hazen-Williams' else None
+        params_calc = dict(material=material_sistema, modelo_perda=modelo_perda, k=k_val, exp=exp_val,
+                           c=C, h_oper=h_oper, acumular_peso=acumular_peso)
+        cache_res = cache_global()
+        with perf.span('resultados.chave'):
+            chave_res = impressao_digital(base, params_calc)
+        calc = cache_res.get(chave_res)
+        if calc is None:
+            with perf.span('resultados.calculo', trechos=len(base)) as sp:
+                res = motor.atualizar(base, versao_estrutura=(id(_ensure_store()), _ensure_store().versao_estrutura),
+                                      **params_calc)
+                sp.anotar(recalculados=motor.ultimo_recalculo)
+            calc = {'t_out': base.assign(**{c: v.copy() for c, v in res.items()}), 'rede': motor.rede}
+            cache_res.put(chave_res, calc)
+            st.caption(f'Trechos recalculados nesta execução: {motor.ultimo_recalculo} de {len(base)}')
+        else:
+            st.caption('Resultados reaproveitados do cache (trechos e parâmetros inalterados).')
+        rede, t_out = calc['rede'], calc['t_out']
+        solucionador = 'arvore'
+        if rede.nos_multiplos.size:
+            nos_txt = ', '.join(rede.nos_multiplos[:20].tolist()) + (' …' if rede.nos_multiplos.size > 20 else '')
+            if st.checkbox('Resolver malhas (método do gradiente global)', value=True,
+                           help='Vazões e pressões de barriletes em anel e colunas interligadas; '
+                                'sem isso, apenas o primeiro trecho de chegada define a pressão a jusante.'):
+                with perf.span('resultados.malha', trechos=len(base)):
+                    sol = cache_res.obter(('malha', chave_res), lambda: resolver_malha(base, rede=rede, **params_calc))
+                t_out = base.assign(**sol.resultados)
+                solucionador = 'malha'
+                msg = (f'Rede com {sol.n_malhas} malha(s) (nós com mais de uma alimentação: {nos_txt}); '
+                       f'{sol.nucleo.size} trecho(s) resolvidos pelo gradiente global em {sol.iteracoes} iteração(ões). '
+                       'Q negativo indica escoamento no sentido para_no → de_no.')
+                if sol.convergiu:
+                    st.info(msg)
+                else:
+                    st.warning(msg + f' Não convergiu (variação relativa {sol.variacao_rel:.1e}).')
             else:
-                return j_fair_whipple_hsiao_kPa_per_m(rr['Q (L/s)'], rr['dn_mm'], material_sistema)
-
-        base['J (kPa/m)'] = base.apply(_J_kPa, axis=1)
-        base['J (m/m)']   = base['J (kPa/m)'] / KPA_PER_M
-
-        # Velocidade v (m/s)
-        def _vel(rr):
-            Q = max(0.0, _num(rr['Q (L/s)'],0.0)) / 1000.0
-            D = max(0.0, _num(rr['dn_mm'],0.0)) / 1000.0
-            if D <= 0 or Q <= 0: return 0.0
-            A = math.pi * (D**2) / 4.0
-            return Q / A
-        base['v (m/s)'] = base.apply(_vel, axis=1)
+                st.warning(f'Nós alimentados por mais de um trecho (malha): {nos_txt}. '
+                           'Apenas o primeiro trecho de chegada define a pressão a jusante.')
+        if rede.orfaos.size:
+            st.warning(f'{rede.orfaos.size} trecho(s) sem caminho a partir da Entrada (ciclo) — pressões não calculadas.')
 
         ordenar = st.checkbox('Ordenar por ramo/ordem (ascendente)', value=False)
-        if ordenar and {'ramo','ordem'} <= set(base.columns):
-            base = base.sort_values(by=['ramo','ordem'], kind='mergesort', na_position='last').reset_index(drop=True)
-
-        # Propagação p_in -> p_out por ramo, partindo de p_in = H_oper * γ
-        resultados = []
-        for ramo_val, grp in base.groupby('ramo', sort=False):
-            p_in = h_oper * KPA_PER_M
-            for _, r in grp.iterrows():
-                J_kPa_m = _num(r['J (kPa/m)'])
-                hf_cont = J_kPa_m * _num(r['comp_real_m'])
-                hf_loc  = J_kPa_m * _num(r.get('leq_m', 0.0))
-                p_disp  = KPA_PER_M * _num(r.get('dz_io_m', 0.0))
-                p_out   = p_in + p_disp - hf_cont - hf_loc
-                row = r.to_dict()
-                row.update({
-                    'p_in (kPa)': p_in,
-                    'hf_cont (kPa)': hf_cont,
-                    'hf_loc (kPa)': hf_loc,
-                    'p_disp (kPa)': p_disp,
-                    'p_out (kPa)': p_out,
-                })
-                resultados.append(row)
-                p_in = p_out
-
-        t_out = pd.DataFrame(resultados)
-
-        base_cols_show = [
-            'id','ramo','ordem','tipo_ini','de_no','para_no','dn_mm','de_ref_mm',
-            'pol_ref','comp_real_m','dz_io_m','peso_trecho','leq_m',
-            'Q (L/s)','v (m/s)','J (kPa/m)','p_in (kPa)','hf_cont (kPa)','hf_loc (kPa)','p_disp (kPa)','p_out (kPa)'
-        ]
-        show_cols = [c for c in base_cols_show if c in t_out.columns]
-        st.dataframe(t_out[show_cols], use_container_width=True, height=520)
+        if ordenar and {'ramo','ordem'} <= set(t_out.columns):
+            t_out = t_out.sort_values(by=['ramo','ordem'], kind='mergesort', na_position='last').reset_index(drop=True)
+
+        show_cols = [c for c in RESULT_COLS if c in t_out.columns]
+        with perf.span('resultados.tabela'):
+            st.dataframe(t_out[show_cols], use_container_width=True, height=520)
+
+        # as análises abaixo propagam a partir da Entrada (aproximação em árvore), mesmo com malhas resolvidas
+        aviso_arvore = ('Esta análise usa a aproximação em árvore (primeiro trecho de chegada em cada nó), '
+                        'não o gradiente global da tabela acima; nas malhas os valores podem diferir.'
+                        if solucionador == 'malha' else None)
+
+        with st.expander('Varredura de parâmetros (nível × k × exp × C)'):
+            st.caption('Valores separados por vírgula. Cada combinação é um cenário; '
+                       'a rede inteira é avaliada de uma vez como array trecho × cenário.')
+            if aviso_arvore:
+                st.warning(aviso_arvore)
+            v1, v2, v3, v4 = st.columns(4)
+            niveis_txt = v1.text_input('Níveis (0 = H_min, 1 = H_max)', f'0, 0.5, {nivel_operacional:g}')
+            k_txt = v2.text_input('k', f'{k_val:g}')
+            exp_txt = v3.text_input('exp', f'{exp_val:g}')
+            c_txt = v4.text_input('C (Hazen-Williams)', f'{C:g}' if C is not None else '',
+                                  disabled=(modelo_perda != 'Hazen-Williams'))
+            if st.button('Executar varredura'):
+                try:
+                    niveis = parse_lista(niveis_txt)
+                    cen = grade_cenarios(
+                        [h_min + nv * (h_max - h_min) for nv in niveis],
+                        parse_lista(k_txt), parse_lista(exp_txt),
+                        parse_lista(c_txt) if modelo_perda == 'Hazen-Williams' else [None],
+                    )
+                except ValueError as e:
+                    st.error(f'Lista inválida: {e}')
+                else:
+                    with perf.span('resultados.varredura', cenarios=len(cen['h_oper'])):
+                        var = varrer(base, cen, material=material_sistema, modelo_perda=modelo_perda,
+                                     acumular_peso=acumular_peso, rede=rede)
+                    ids = base['id'].astype(str).to_numpy()
+                    crit = var['trecho_critico']
+                    t_var = pd.DataFrame({
+                        'H_oper (m)': cen['h_oper'], 'k': cen['k'], 'exp': cen['exp'], 'C': cen['c'],
+                        'p_out mín (kPa)': var['p_out_min (kPa)'],
+                        'folga mín (kPa)': var['folga_min (kPa)'],
+                        'trecho crítico': [ids[i] if i >= 0 else '' for i in crit],
+                        'trechos abaixo de p_min': var['n_abaixo_p_min'],
+                    }).sort_values('folga mín (kPa)', kind='stable', na_position='last')
+                    st.write(f'{len(t_var)} cenário(s); {int((t_var["folga mín (kPa)"] < 0).sum())} com violação de p_min_ref.')
+                    st.dataframe(t_var, use_container_width=True, height=360)
+
+        with st.expander('Dimensionamento automático de DN (catálogo de L_eq)'):
+            st.caption('Escolhe, por trecho, o menor DN do catálogo que mantém p_out ≥ p_min_ref em todos os nós '
+                       'e v ≤ v_máx (programação dinâmica na árvore; L_eq reescalado ao DN candidato).')
+            if aviso_arvore:
+                st.warning(aviso_arvore)
+            table_mat = pvc_table if (str(material_sistema).strip().lower()=='pvc') else fofo_table
+            d1, d2 = st.columns(2)
+            v_max = d1.number_input('v máx (m/s)', min_value=0.1, step=0.1, value=3.0, format='%.2f')
+            passo = d2.number_input('Passo de pressão (kPa)', min_value=0.05, step=0.05, value=0.25, format='%.2f')
+            indice_dn = dn_index(table_mat)
+            catalogo = indice_dn.de_mm
+            if catalogo.size == 0:
+                st.info('Tabela de L_eq indisponível para o material selecionado.')
+            elif st.button('Dimensionar DNs'):
+                with perf.span('resultados.dimensionamento', candidatos=int(catalogo.size)):
+                    # trechos com peças: L_eq da tabela em cada DN candidato (o mesmo que
+                    # `_sincronizar_leq` grava depois de aplicar); os demais são reescalados
+                    pecas = _ensure_pecas()
+                    leq_cand = (leq_candidatos(pecas, _ensure_store().posicao, len(base), indice_dn)
+                                if len(pecas) else None)
+                    st.session_state['_proposta_dn'] = dimensionar_dn(
+                        base, catalogo, material=material_sistema, modelo_perda=modelo_perda,
+                        k=k_val, exp=exp_val, c=C, h_oper=h_oper, acumular_peso=acumular_peso,
+                        v_max=v_max, passo_kpa=passo, leq_candidatos=leq_cand, rede=rede)
+            prop = st.session_state.get('_proposta_dn')
+            if prop is not None and len(prop['dn_mm']) == len(base):
+                if not prop['viavel']:
+                    st.warning('Nenhuma combinação do catálogo atende todas as restrições; '
+                               'a proposta usa o maior DN onde necessário.')
+                st.dataframe(pd.DataFrame({
+                    'id': base['id'], 'dn_mm atual': base['dn_mm'], 'dn_mm proposto': prop['dn_mm'],
+                    'leq_m atual': base['leq_m'], 'leq_m proposto': prop['leq_m'],
+                }), use_container_width=True, height=300)
+                if st.button('Aplicar DNs propostos'):
+                    store = _ensure_store()
+                    _, de_ref_mm, pol_ref = indice_dn.lookup_many(prop['dn_mm'])
+                    store.set_coluna('dn_mm', prop['dn_mm']); store.set_coluna('leq_m', prop['leq_m'])
+                    store.set_coluna('de_ref_mm', de_ref_mm); store.set_coluna('pol_ref', pol_ref)
+                    del st.session_state['_proposta_dn']
+                    _st_rerun()
+
+        with st.expander('Demanda probabilística (Monte Carlo)'):
+            st.caption('Cada ponto de consumo (peso local > 0) abre com probabilidade p_uso e solicita k·Peso^exp; '
+                       'p_uso = 0 calibra a probabilidade para que o P99 da vazão total seja a vazão provável. '
+                       'As realizações são avaliadas em lotes, em paralelo, com semente reprodutível.')
+            if aviso_arvore:
+                st.warning(aviso_arvore)
+            m1, m2, m3 = st.columns(3)
+            n_amostras = int(m1.number_input('Realizações', min_value=512, max_value=200_000, step=512, value=20_000))
+            semente = int(m2.number_input('Semente', min_value=0, step=1, value=0))
+            p_uso_txt = m3.number_input('p_uso (0 = calibrar)', min_value=0.0, max_value=1.0, step=0.01,
+                                        value=0.0, format='%.3f')
+            if st.button('Simular demandas'):
+                kw_mc = {c: v for c, v in params_calc.items() if c != 'acumular_peso'}
+                with perf.span('resultados.monte_carlo', trechos=len(base), amostras=n_amostras):
+                    mc = cache_res.obter(
+                        ('monte_carlo', chave_res, n_amostras, semente, p_uso_txt),
+                        lambda: simular_demanda_estocastica(base, acumular_peso=acumular_peso, rede=rede,
+                                                            p_uso=p_uso_txt or None, n_amostras=n_amostras,
+                                                            seed=semente, **kw_mc))
+                st.write(f"p_uso = {mc['p_uso']:.4f}; vazão total P50 = {mc['vazao_total P50 (L/s)']:.3f} L/s, "
+                         f"P95 = {mc['vazao_total P95 (L/s)']:.3f} L/s "
+                         f"(vazão provável k·ΣPeso^exp = {mc['vazao_provavel (L/s)']:.3f} L/s).")
+                t_mc = pd.DataFrame({
+                    'id': base['id'].to_numpy(), 'nó': base['para_no'].to_numpy(),
+                    'p_out P5 (kPa)': mc['p_out P5 (kPa)'], 'p_out P50 (kPa)': mc['p_out P50 (kPa)'],
+                    'p_out P95 (kPa)': mc['p_out P95 (kPa)'],
+                    'p_min_ref (kPa)': pd.to_numeric(base['p_min_ref_kPa'], errors='coerce').to_numpy(),
+                    'P(p_out < p_min)': mc['prob_abaixo_p_min'],
+                }).sort_values('P(p_out < p_min)', ascending=False, kind='stable', na_position='last')
+                st.dataframe(t_mc, use_container_width=True, height=360)
+
+        with st.expander('Simulação de período estendido (24 h)'):
+            st.caption('Demanda de projeto × fator horário m(t); o nível do reservatório varia entre H_min e H_max '
+                       'conforme entrada (boia) e consumo. Todos os trechos são avaliados em todos os instantes.')
+            if aviso_arvore:
+                st.warning(aviso_arvore)
+            padrao_txt = st.text_input('Fatores de demanda (24 valores horários ou P valores cobrindo 24 h)',
+                                       ', '.join(f'{v:g}' for v in PADRAO_RESIDENCIAL))
+            e1, e2, e3, e4 = st.columns(4)
+            passo_pe = e1.selectbox('Passo (min)', [1, 5, 15, 60], index=1)
+            area_res = e2.number_input('Área do reservatório (m²)', min_value=0.01, step=0.5, value=10.0, format='%.2f')
+            q_entrada = e3.number_input('Vazão de entrada (L/s)', min_value=0.0, step=0.1, value=1.0, format='%.2f')
+            nivel_ini = e4.slider('Nível inicial (0 = H_min, 1 = H_max)', 0.0, 1.0, 1.0, 0.05)
+            if st.button('Simular 24 h'):
+                try:
+                    padrao = parse_lista(padrao_txt)
+                except ValueError as e:
+                    st.error(f'Lista inválida: {e}')
+                else:
+                    with perf.span('resultados.periodo_estendido', trechos=len(base), passo_min=passo_pe):
+                        pe = simular_periodo(base, padrao, material=material_sistema, modelo_perda=modelo_perda,
+                                             k=k_val, exp=exp_val, c=C, acumular_peso=acumular_peso,
+                                             passo_min=float(passo_pe), h_ini=h_min + nivel_ini * (h_max - h_min),
+                                             h_min=h_min, h_max=h_max, area_m2=area_res,
+                                             vazao_entrada_l_s=q_entrada, rede=rede)
+                    serie = pd.DataFrame({'nível (m)': pe['nivel_m'], 'p_out mín (kPa)': pe['p_out_min (kPa)']},
+                                         index=pd.Index(pe['t_h'], name='hora'))
+                    st.line_chart(serie)
+                    if pe['reservatorio_vazio'].any():
+                        st.warning(f"Reservatório em H_min com demanda acima da entrada em "
+                                   f"{pe['reservatorio_vazio'].sum() * passo_pe / 60:g} h do dia.")
+                    viol = np.flatnonzero(pe['horas_abaixo_p_min'] > 0)
+                    if viol.size:
+                        por_hora = pe['abaixo_por_hora'][:, viol]
+                        st.write(f'{viol.size} trecho(s) abaixo de p_min_ref em algum instante do dia.')
+                        st.dataframe(pd.DataFrame({
+                            'id': base['id'].to_numpy()[viol], 'nó': base['para_no'].to_numpy()[viol],
+                            'horas do dia': [', '.join(f'{h}h' for h in np.flatnonzero(por_hora[:, j]))
+                                             for j in range(viol.size)],
+                            'tempo abaixo (h)': pe['horas_abaixo_p_min'][viol],
+                            'p_out mín (kPa)': pe['p_out_min_trecho (kPa)'][viol],
+                            'hora do mínimo': pe['hora_p_out_min'][viol],
+                        }).sort_values('tempo abaixo (h)', ascending=False, kind='stable'),
+                            use_container_width=True, height=360)
+                    else:
+                        st.success('Todos os trechos atendem p_min_ref durante as 24 h.')
 
         params = {
             'projeto': projeto_nome,
             'material': material_sistema,
             'modelo_perda': modelo_perda,
-            'Q_from_Peso': {'k': k_val, 'exp': exp_val},
+            'Q_from_Peso': {'k': k_val, 'exp': exp_val, 'acumular_peso': acumular_peso},
             'HW': ({'C_PVC': c_pvc, 'C_FoFo': c_fofo} if modelo_perda == 'Hazen-Williams' else None),
             'reservatorio_m': {'H_max': h_max, 'H_min': h_min, 'nivel_operacional': nivel_operacional, 'H_oper': h_oper},
             'notacao': notacao_mode,
+            'solucionador': solucionador,  # 'malha' (gradiente global) ou 'arvore' (propagação a partir da Entrada)
             'regras_fixas': {'entrada': 1, 'te': 2, 'cruzeta': 3},
             'KPA_PER_M': KPA_PER_M
         }
-        proj = {'params': params, 'trechos': t_out[show_cols].to_dict(orient='list')}
-        st.download_button('Baixar projeto (.json)',
-                           data=json.dumps(proj, ensure_ascii=False, indent=2).encode('utf-8'),
+        # arquivos de download também em cache: só mudam com os resultados, o solucionador, a ordenação,
+        # os params ou as peças cadastradas
+        pecas = _ensure_pecas()
+        chave_exp = ('export', chave_res, solucionador, ordenar, id(pecas), pecas.versao,
+                     json.dumps(params, sort_keys=True, default=str))
+        arquivos = cache_res.get(chave_exp)
+        if arquivos is None:
+            triplas = pecas.triplas()
+            with perf.span('resultados.json'):
+                proj = {'params': params, 'trechos': t_out[show_cols].to_dict(orient='list'), 'pecas': triplas}
+                dados_json = json.dumps(proj, ensure_ascii=False, indent=2).encode('utf-8')
+            with perf.span('resultados.npz'):
+                buf_npz = io.BytesIO()
+                save_project_npz(buf_npz, t_out[show_cols], params, pecas=triplas)
+            arquivos = {'json': dados_json, 'npz': buf_npz.getvalue()}
+            cache_res.put(chave_exp, arquivos)
+        st.download_button('Baixar projeto (.json)', data=arquivos['json'],
                            file_name='spaf_projeto.json', mime='application/json')
-
+        st.download_button('Baixar projeto (.npz)', data=arquivos['npz'], file_name='spaf_projeto.npz',
+                           mime='application/octet-stream',
+                           help='Formato binário colunar: reabre no app (aba Trechos) e no processamento em lote.')
+        est = cache_res.estatisticas()
+        st.caption(f"Cache de resultados: {est['acertos']} acerto(s), {est['falhas']} falha(s) "
+                   f"({est['taxa_acerto']:.0%}), {est['itens']} item(ns), {est['bytes'] / 2**20:.1f} de "
+                   f"{est['limite_bytes'] / 2**20:.0f} MiB, {est['descartes']} descarte(s).")
+
+# ---------------- Desempenho ----------------
+_captura = st.session_state.pop('_perf_captura', None)
+if _captura is not None:
+    _captura.parar()
+    st.session_state['_perf_relatorio'] = _captura
+with st.sidebar:
+    if perf.ativo:
+        with st.expander('Tempo por etapa (última execução)', expanded=True):
+            resumo_perf = perf.resumo()
+            st.dataframe(resumo_perf, use_container_width=True, hide_index=True)
+            st.caption(f'Execução {perf.execucao}: {resumo_perf.loc[resumo_perf["nivel"] == 0, "total_ms"].sum():.1f} ms '
+                       'nas etapas de 1º nível.')
+    perfil = st.session_state.get('_perf_relatorio')
+    if perfil is not None and perfil.relatorio:
+        st.download_button('Baixar perfil (.txt)', data=perfil.relatorio.encode('utf-8'),
+                           file_name='spaf_perfil.txt', mime='text/plain')
+        if perfil.prof_bytes:
+            st.download_button('Baixar perfil (.prof)', data=perfil.prof_bytes,
+                               file_name='spaf_perfil.prof', mime='application/octet-stream')
@@ -0,0 +1,156 @@
+"""Gerador determinístico (semente) de redes prediais sintéticas para benchmarks.
+
+Topologia, repetida por coluna e andar:
+
+    reservatório ─ Entrada ─ barrilete (Tês em série, um por coluna)
+                               └ coluna (Tê por andar, descendo)
+                                   └ ramal do andar: Cruzeta → Tê → Cruzeta → Tê
+                                       └ sub-ramais dos pontos de utilização (folhas)
+
+Todas as capacidades de saída (Entrada=1, Tê=2, Cruzeta=3) são respeitadas, de
+modo que a rede também passa pela validação de importação (exceto com
+`malhas=True`, que fecha o barrilete em anel e interliga colunas vizinhas em
+cada andar, para o solver de redes malhadas). A geração é
+vetorizada (um bloco-modelo por andar replicado com deslocamento de ids) e
+chega a 1M de trechos em poucos segundos.
+"""
+import numpy as np
+import pandas as pd
+
+from core.projeto import BASE_COLS
+
+MAX_ANDARES = 30
+
+# Bloco de um andar, em ids locais: 0 = nó da coluna, 1 = início do ramal,
+# 2..5 = derivações (a1..a4), 6..12 = pontos de utilização (f1..f7).
+_BLOCO_DE = np.array([0, 1, 2, 2, 2, 3, 3, 4, 4, 4, 5, 5])
+_BLOCO_PARA = np.array([1, 2, 6, 7, 3, 8, 4, 9, 10, 5, 11, 12])
+_BLOCO_TIPO = {0: 'Tê', 1: 'Tê', 2: 'Cruzeta', 3: 'Tê', 4: 'Cruzeta', 5: 'Tê'}
+_NOS_BLOCO = 13
+_TRECHOS_ANDAR = _BLOCO_DE.size + 1        # + o segmento de coluna que chega ao andar
+
+# Pesos (UC) típicos dos pontos de utilização
+_PESOS_PONTOS = np.array([0.3, 0.3, 0.5, 0.7, 0.7, 1.0])
+
+
+def _str(ids, prefixo=''):
+    # str() em lista é bem mais rápido que ndarray.astype(str) para milhões de ints
+    return np.array([prefixo + str(i) for i in ids.tolist()], dtype=object)
+
+
+def dimensoes(n_trechos: int, max_andares: int = MAX_ANDARES):
+    """(colunas, andares) para chegar a ~n_trechos."""
+    n = max(int(n_trechos), _TRECHOS_ANDAR + 1)
+    colunas = max(1, int(np.ceil(n / (_TRECHOS_ANDAR * max_andares))))
+    andares = int(np.clip(round((n - colunas) / (_TRECHOS_ANDAR * colunas)), 1, max_andares))
+    return colunas, andares
+
+
+def gerar_predio(n_trechos: int = 1000, seed: int = 0, max_andares: int = MAX_ANDARES,
+                 malhas: bool = False) -> pd.DataFrame:
+    """Rede com ~n_trechos trechos (BASE_COLS, nós numéricos) e pesos locais nos
+    pontos de utilização — use `acumular_peso=True` no cálculo. Com `malhas`,
+    acrescenta o anel do barrilete e as interligações entre colunas (ramo 'INT')."""
+    rng = np.random.default_rng(seed)
+    C, F = dimensoes(n_trechos, max_andares)
+    B = C * F                                     # blocos (coluna × andar)
+    # ids globais: 0 = reservatório, 1..C = barrilete, blocos a partir de C + 1
+    base_bloco = 1 + C + np.arange(B) * _NOS_BLOCO
+    col_do_bloco = np.repeat(np.arange(C), F)
+    andar_do_bloco = np.tile(np.arange(F), C)
+
+    # Entrada + barrilete
+    de = [np.array([0]), np.arange(1, C)]
+    para = [np.array([1]), np.arange(2, C + 1)]
+    # segmento de coluna que chega a cada andar: do barrilete (andar 0) ou do andar de cima
+    topo = andar_do_bloco == 0
+    de.append(np.where(topo, 1 + col_do_bloco, base_bloco - _NOS_BLOCO))
+    para.append(base_bloco)
+    # trechos internos dos andares
+    de.append((base_bloco[:, None] + _BLOCO_DE[None, :]).ravel())
+    para.append((base_bloco[:, None] + _BLOCO_PARA[None, :]).ravel())
+    de = np.concatenate(de)
+    para = np.concatenate(para)
+    n = de.size
+    n_bar = C                                     # Entrada + C-1 trechos de barrilete
+    n_col = B
+
+    # classe de trecho: 0 = barrilete, 1 = coluna, 2 = ramal, 3 = ponto de utilização
+    classe = np.concatenate([np.zeros(n_bar, np.int8), np.ones(n_col, np.int8),
+                             np.tile(np.where(_BLOCO_PARA >= 6, 3, 2).astype(np.int8), B)])
+    ponto = classe == 3
+
+    tipos = np.array(['Entrada de Água', 'Tê', 'Cruzeta'], dtype=object)
+    cod_tipo = np.ones(n, dtype=np.int8)
+    cod_tipo[0] = 0
+    cod_tipo[n_bar + n_col:] = np.tile(np.array([2 if _BLOCO_TIPO[i] == 'Cruzeta' else 1 for i in _BLOCO_DE],
+                                                dtype=np.int8), B)
+
+    dn = np.array([75.0, 50.0, 25.0, 20.0])[classe]
+    comp = np.choose(classe, [rng.uniform(3, 8, n), np.full(n, 3.0), rng.uniform(0.5, 4, n),
+                              rng.uniform(0.3, 2.5, n)])
+    dz = np.where(ponto, rng.uniform(0.3, 1.8, n), np.array([0.0, 3.0, 0.0, 0.0])[classe])
+    peso = np.where(ponto, rng.choice(_PESOS_PONTOS, n), 0.0)
+
+    # ramo: 'BAR', 'C<coluna>' (segmentos de coluna) e 'C<coluna>-A<andar>' (ramais do andar)
+    rotulos = np.array(['BAR'] + [f'C{c + 1}' for c in range(C)]
+                       + [f'C{c + 1}-A{f + 1}' for c in range(C) for f in range(F)], dtype=object)
+    cod_ramo = np.concatenate([np.zeros(n_bar, np.int64), 1 + col_do_bloco,
+                               1 + C + np.repeat(np.arange(B), _BLOCO_DE.size)])
+    ordem = pd.Series(np.arange(n)).groupby(cod_ramo).cumcount().to_numpy() + 1
+
+    df = pd.DataFrame({
+        'id': _str(np.arange(1, n + 1), 't'),
+        'ramo': rotulos[cod_ramo], 'ordem': ordem, 'tipo_ini': tipos[cod_tipo],
+        'de_no': _str(de), 'para_no': _str(para),
+        'dn_mm': dn, 'de_ref_mm': dn, 'pol_ref': '',
+        'comp_real_m': comp, 'dz_io_m': dz, 'peso_trecho': peso,
+        'leq_m': rng.uniform(0.5, 3.0, n), 'p_min_ref_kPa': np.where(ponto, 10.0, 5.0),
+    }, columns=BASE_COLS)
+    if malhas:
+        df = pd.concat([df, _interligacoes(C, F, base_bloco, n, rng)], ignore_index=True)
+    return df
+
+
+def _interligacoes(C, F, base_bloco, n0, rng) -> pd.DataFrame:
+    # anel: último nó do barrilete de volta ao primeiro; colunas c → c+1 no mesmo andar
+    no_col = base_bloco.reshape(C, F)
+    de = np.concatenate([[C] if C > 2 else [], no_col[:-1].ravel()]).astype(np.int64)
+    para = np.concatenate([[1] if C > 2 else [], no_col[1:].ravel()]).astype(np.int64)
+    m = de.size
+    return pd.DataFrame({
+        'id': _str(np.arange(n0 + 1, n0 + m + 1), 't'), 'ramo': 'INT', 'ordem': np.arange(1, m + 1),
+        'tipo_ini': 'Tê', 'de_no': _str(de), 'para_no': _str(para),
+        'dn_mm': 32.0, 'de_ref_mm': 32.0, 'pol_ref': '',
+        'comp_real_m': rng.uniform(3, 8, m), 'dz_io_m': 0.0, 'peso_trecho': 0.0,
+        'leq_m': rng.uniform(0.5, 3.0, m), 'p_min_ref_kPa': 5.0,
+    }, columns=BASE_COLS)
+
+
+def gerar_compr_eq(n_trechos: int = 200, n_pecas: int = 20, seed: int = 0) -> pd.DataFrame:
+    """Aba bruta no leiaute de Compr_Eq_(AF1) (para `normalize_compr_eq`): um grupo
+    de 3 colunas por trecho com cabeçalho 'X-Y' na linha 2, DN na linha 4 e
+    total/quantidade por peça a partir da linha 6."""
+    rng = np.random.default_rng(seed)
+    raw = np.full((5 + n_pecas, 1 + 3 * n_trechos), np.nan, dtype=object)
+    for g in range(n_trechos):
+        c = 1 + 3 * g
+        raw[1, c] = f'{g}-{g + 1}'
+        raw[3, c] = float(rng.choice([20, 25, 32, 40, 50]))
+        qt = rng.integers(0, 3, n_pecas).astype(float)
+        raw[5:, c] = qt * rng.uniform(0.3, 5.0, n_pecas)
+        raw[5:, c + 2] = qt
+    return pd.DataFrame(raw)
+
+
+def gerar_peso_andar(n_andares: int = 30, seed: int = 0):
+    """(peso_andar_tidy, pesos_uc, aptos_por_andar) sintéticos para compute_uc_by_floor."""
+    rng = np.random.default_rng(seed)
+    aparelhos = ['Bacia Sanitária', 'Chuveiro ou Ducha', 'Lavatório', 'Pia', 'Tanque', 'Máquina de lavar roupa']
+    tidy = pd.DataFrame({'aparelho': aparelhos, 'peca': [''] * len(aparelhos)})
+    for af in ('AF1', 'AF2', 'AF3', 'AF4'):
+        tidy[af] = rng.integers(0, 3, len(aparelhos))
+    pesos = pd.DataFrame({'aparelho_full': aparelhos, 'peso_uc': rng.choice(_PESOS_PONTOS, len(aparelhos))})
+    aptos = pd.DataFrame(rng.integers(0, 4, (n_andares, 4)), columns=['AF1', 'AF2', 'AF3', 'AF4'],
+                         index=[f'{i + 1}º' for i in range(n_andares)])
+    return tidy, pesos, aptos
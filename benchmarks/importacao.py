@@ -0,0 +1,85 @@
+"""Tempo de importação a frio: motor (`core`) × bloco de imports do app.
+
+Cada medida roda num interpretador novo (sem módulos em cache), como um processo
+de trabalho ou script faria. O bloco do app é extraído de app.py (imports de nível
+de módulo) e reflete a partida atual do Streamlit sem a renderização.
+
+Uso (na raiz do repositório):
+    python -m benchmarks.importacao
+    python -m benchmarks.importacao -r 7 --limite 0.2 -o benchmarks/importacao.json
+
+Sai com código 1 se o motor importar algum módulo pesado ou se a razão
+motor / app passar de `--limite`.
+"""
+import argparse
+import ast
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+
+PESADOS = ('pandas', 'streamlit', 'reportlab', 'openpyxl', 'xlsxwriter', 'scipy')
+
+# importa o pacote e resolve todos os nomes públicos (carrega cada submódulo do motor)
+MOTOR = 'import core\nfor _n in core.__all__:\n    getattr(core, _n)\n'
+
+_FILHO = '''
+import sys, time, json
+t0 = time.perf_counter()
+exec(compile({codigo!r}, '<importacao>', 'exec'), {{}})
+dt = time.perf_counter() - t0
+print(json.dumps({{'tempo_s': dt, 'pesados': [m for m in {pesados!r} if m in sys.modules]}}))
+'''
+
+
+def imports_do_app(caminho=RAIZ / 'app.py') -> str:
+    """Imports de nível de módulo de app.py, como código executável."""
+    arvore = ast.parse(Path(caminho).read_text(encoding='utf-8'))
+    nos = [n for n in arvore.body if isinstance(n, (ast.Import, ast.ImportFrom))]
+    return ast.unparse(ast.Module(body=nos, type_ignores=[]))
+
+
+def medir(codigo: str, repeticoes: int = 5) -> dict:
+    """Mediana do tempo de `codigo` em `repeticoes` interpretadores novos."""
+    tempos, pesados = [], []
+    for _ in range(max(1, repeticoes)):
+        r = subprocess.run([sys.executable, '-c', _FILHO.format(codigo=codigo, pesados=PESADOS)],
+                           cwd=RAIZ, capture_output=True, text=True, check=True)
+        saida = json.loads(r.stdout.strip().splitlines()[-1])
+        tempos.append(saida['tempo_s'])
+        pesados = saida['pesados']
+    return {'tempo_s': statistics.median(tempos), 'min_s': min(tempos), 'pesados': pesados}
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(prog='python -m benchmarks.importacao', description=__doc__.splitlines()[0])
+    ap.add_argument('-r', '--repeticoes', type=int, default=5)
+    ap.add_argument('--limite', type=float, default=0.2, help='razão máxima tempo motor / tempo app')
+    ap.add_argument('-o', '--out', help='grava os resultados em JSON')
+    a = ap.parse_args(argv)
+
+    motor = medir(MOTOR, a.repeticoes)
+    app = medir(imports_do_app(), a.repeticoes)
+    razao = motor['tempo_s'] / app['tempo_s'] if app['tempo_s'] > 0 else 0.0
+    print(f"{'motor (core)':<14} {motor['tempo_s']:8.3f} s  pesados: {', '.join(motor['pesados']) or '—'}")
+    print(f"{'app (imports)':<14} {app['tempo_s']:8.3f} s  pesados: {', '.join(app['pesados']) or '—'}")
+    print(f'razão motor/app: {razao:.3f} (limite {a.limite:.3f})')
+    if a.out:
+        Path(a.out).parent.mkdir(parents=True, exist_ok=True)
+        Path(a.out).write_text(json.dumps({'motor': motor, 'app': app, 'razao': razao}, indent=2),
+                               encoding='utf-8')
+    falhas = 0
+    if motor['pesados']:
+        print(f"o motor importou módulos pesados: {', '.join(motor['pesados'])}")
+        falhas += 1
+    if razao > a.limite:
+        print('importação do motor acima do limite')
+        falhas += 1
+    return 1 if falhas else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,241 @@
+"""Benchmarks do pipeline hidráulico: tempo, vazão (trechos/s) e pico de memória
+por etapa e por tamanho de rede, gravados em JSON e comparáveis a uma linha de base.
+
+Uso (na raiz do repositório):
+    python -m benchmarks.run -n 100 1000 10000 -o benchmarks/resultados.json
+    python -m benchmarks.run -n 1000 10000 --comparar benchmarks/baseline.json --tolerancia 0.25
+    python -m benchmarks.run -n 100000 1000000 --etapas calcular_resultados varrer
+"""
+import argparse
+import io
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .gerador import gerar_compr_eq, gerar_peso_andar, gerar_predio
+
+VERSAO = 1
+PARAMS_CALCULO = dict(material='PVC', modelo_perda='Hazen-Williams', k=0.3, exp=0.5, c=150.0,
+                      h_oper=25.0, acumular_peso=True)
+
+
+def _etapas():
+    """Etapas: nome → (função(ctx) que prepara e devolve o callable medido, n máximo)."""
+    from core.demanda_estocastica import simular_demanda_estocastica
+    from core.dimensionamento import dimensionar_dn
+    from core.excel_parser import load_sheets_streaming, normalize_compr_eq
+    from core.importacao import preparar_lote
+    from core.incremental import ResultadosIncrementais
+    from core.malha import resolver_malha
+    from core.network import build_network, calcular_resultados
+    from core.periodo_estendido import PADRAO_RESIDENCIAL, simular_periodo
+    from core.projeto_npz import load_project_npz, save_project_npz
+    from core.reports import export_to_pdf, export_workbook
+    from core.sweep import grade_cenarios, varrer
+    from core.tables import dn_index, load_eqlen_tables
+    from core.trecho_store import TrechoStore
+    from core.weights import compute_uc_by_floor
+
+    def _calc(ctx):
+        return lambda: calcular_resultados(ctx['df'], rede=ctx['rede'], **PARAMS_CALCULO)
+
+    def _incremental(ctx):
+        motor = ResultadosIncrementais()
+        motor.atualizar(ctx['df'], versao_estrutura=0, **PARAMS_CALCULO)
+        meio = len(ctx['df']) // 2
+
+        def f():
+            motor.marcar_sujo(meio)
+            motor.atualizar(ctx['df'], versao_estrutura=0, **PARAMS_CALCULO)   # estrutura inalterada
+        return f
+
+    def _varrer(ctx):
+        cen = grade_cenarios(np.linspace(10, 30, 4), [0.25, 0.3], [0.45, 0.5], [130.0, 140.0, 150.0, 160.0])
+        kw = {k: v for k, v in PARAMS_CALCULO.items() if k in ('material', 'modelo_perda', 'acumular_peso')}
+        return lambda: varrer(ctx['df'], cen, rede=ctx['rede'], **kw)
+
+    def _periodo(ctx):
+        kw = {k: v for k, v in PARAMS_CALCULO.items() if k != 'h_oper'}
+        return lambda: simular_periodo(ctx['df'], PADRAO_RESIDENCIAL, passo_min=5.0, h_ini=25.0, h_min=5.0,
+                                       h_max=25.0, area_m2=20.0, vazao_entrada_l_s=5.0, rede=ctx['rede'], **kw)
+
+    def _monte_carlo(ctx):
+        # um processo: mede o kernel, não o nº de núcleos da máquina
+        return lambda: simular_demanda_estocastica(ctx['df'], n_amostras=4096, seed=ctx['seed'], workers=1,
+                                                   rede=ctx['rede'], **PARAMS_CALCULO)
+
+    def _malha(ctx):
+        df = gerar_predio(ctx['n'], ctx['seed'], malhas=True)
+        return lambda: resolver_malha(df, **PARAMS_CALCULO)
+
+    def _dimensionar(ctx):
+        cat = dn_index(ctx['pvc']).de_mm
+        return lambda: dimensionar_dn(ctx['df'], cat, rede=ctx['rede'], **PARAMS_CALCULO)
+
+    def _lookup(ctx):
+        idx = dn_index(ctx['pvc'])
+        return lambda: idx.lookup_many(ctx['df']['dn_mm'].to_numpy())
+
+    def _uc(ctx):
+        tidy, pesos, aptos = gerar_peso_andar(max(1, len(ctx['df']) // 13), seed=ctx['seed'])
+        return lambda: compute_uc_by_floor(tidy, pesos, aptos)
+
+    def _compr_eq(ctx):
+        raw = gerar_compr_eq(min(len(ctx['df']), 5000), seed=ctx['seed'])
+        return lambda: normalize_compr_eq(raw)
+
+    def _ler_excel(ctx):
+        # planilha gravada uma vez (abas de trechos e de L_eq); mede só a leitura
+        buf = io.BytesIO()
+        with pd.ExcelWriter(buf, engine='xlsxwriter') as xl:
+            ctx['df'].to_excel(xl, sheet_name='Exerc_4_(AF1)', index=False)
+            gerar_compr_eq(min(len(ctx['df']), 5000), seed=ctx['seed']).to_excel(
+                xl, sheet_name='Compr_Eq_(AF1)', header=False, index=False)
+        dados = buf.getvalue()
+        return lambda: load_sheets_streaming(io.BytesIO(dados), sheets=['Exerc_4_(AF1)', 'Compr_Eq_(AF1)'])
+
+    def _xlsx(ctx):
+        return lambda: export_workbook(io.BytesIO(), [('bench', ctx['t_out'], {'bench': True})])
+
+    def _json(ctx):
+        return lambda: json.dumps({'params': {}, 'trechos': ctx['t_out'].to_dict(orient='list')},
+                                  ensure_ascii=False, indent=2, default=str).encode('utf-8')
+
+    def _npz_salvar(ctx):
+        return lambda: save_project_npz(io.BytesIO(), ctx['t_out'], {'bench': True})
+
+    def _npz_carregar(ctx):
+        buf = io.BytesIO()
+        save_project_npz(buf, ctx['t_out'], {'bench': True})
+        dados = buf.getvalue()
+        return lambda: load_project_npz(io.BytesIO(dados))
+
+    def _pdf(ctx):
+        return lambda: export_to_pdf(io.BytesIO(), ctx['t_out'], {'bench': True})
+
+    return {
+        'gerar': (lambda ctx: (lambda: gerar_predio(ctx['n'], ctx['seed'])), None),
+        'store_from_frame': (lambda ctx: (lambda: TrechoStore.from_frame(ctx['df'])), None),
+        'preparar_lote': (lambda ctx: (lambda: preparar_lote(ctx['df'], TrechoStore(), 'Números',
+                                                             dn_index(ctx['pvc']))), None),
+        'build_network': (lambda ctx: (lambda: build_network(ctx['df']['de_no'], ctx['df']['para_no'])), None),
+        'calcular_resultados': (_calc, None),
+        'incremental_1_sujo': (_incremental, None),
+        'varrer_64_cenarios': (_varrer, None),
+        'periodo_24h_5min': (_periodo, None),
+        'resolver_malha': (_malha, 500_000),
+        'monte_carlo_4096': (_monte_carlo, 100_000),
+        'dimensionar_dn': (_dimensionar, 200_000),
+        'lookup_many': (_lookup, None),
+        'compute_uc_by_floor': (_uc, None),
+        'normalize_compr_eq': (_compr_eq, 5_000),
+        'load_sheets_streaming': (_ler_excel, 20_000),
+        'salvar_json': (_json, None),
+        'salvar_npz': (_npz_salvar, None),
+        'carregar_npz_base': (_npz_carregar, None),
+        'export_workbook': (_xlsx, 100_000),
+        'export_to_pdf': (_pdf, 20_000),
+    }, load_eqlen_tables
+
+
+def medir(fn, repeticoes=3, memoria=True) -> dict:
+    """Menor tempo entre `repeticoes` execuções e, opcionalmente, o pico de memória
+    alocada (tracemalloc) em uma execução extra."""
+    tempos = []
+    for _ in range(max(1, repeticoes)):
+        t0 = time.perf_counter()
+        fn()
+        tempos.append(time.perf_counter() - t0)
+    pico = None
+    if memoria:
+        tracemalloc.start()
+        try:
+            fn()
+            pico = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return {'tempo_s': min(tempos), 'pico_mem_bytes': pico}
+
+
+def executar(tamanhos, etapas=None, repeticoes=3, memoria=True, seed=0, log=print) -> dict:
+    from core.network import build_network, calcular_resultados
+
+    todas, load_eqlen_tables = _etapas()
+    escolhidas = [e for e in todas if etapas is None or e in etapas]
+    pvc, _ = load_eqlen_tables()
+    resultados = []
+    for n in tamanhos:
+        df = gerar_predio(n, seed)
+        rede = build_network(df['de_no'], df['para_no'])
+        res = calcular_resultados(df, rede=rede, **PARAMS_CALCULO)
+        ctx = {'n': n, 'seed': seed, 'df': df, 'rede': rede, 'pvc': pvc,
+               't_out': df.assign(**{c: v for c, v in res.items()})}
+        for nome in escolhidas:
+            preparar, limite = todas[nome]
+            if limite is not None and len(df) > limite:
+                continue
+            rep = repeticoes if len(df) <= 100_000 else 1
+            m = medir(preparar(ctx), rep, memoria)
+            linha = {'etapa': nome, 'n': int(n), 'n_trechos': int(len(df)), **m,
+                     'trechos_por_s': len(df) / m['tempo_s'] if m['tempo_s'] > 0 else None}
+            resultados.append(linha)
+            mem = f"{m['pico_mem_bytes'] / 2**20:8.1f} MiB" if m['pico_mem_bytes'] is not None else ''
+            log(f"{nome:<22} n={len(df):>9,d}  {m['tempo_s']:9.4f} s  {linha['trechos_por_s'] or 0:14,.0f} trechos/s {mem}")
+    return {
+        'versao': VERSAO,
+        'ambiente': {'python': platform.python_version(), 'numpy': np.__version__, 'pandas': pd.__version__,
+                     'plataforma': platform.platform(), 'processador': platform.processor()},
+        'parametros': {'repeticoes': repeticoes, 'seed': seed, 'memoria': memoria},
+        'resultados': resultados,
+    }
+
+
+def comparar(atual: dict, base: dict, tolerancia=0.25) -> pd.DataFrame:
+    """Razão tempo atual / linha de base por (etapa, n); `regressao` quando a razão
+    passa de 1 + tolerancia."""
+    a = pd.DataFrame(atual['resultados'])
+    b = pd.DataFrame(base.get('resultados', []))
+    if a.empty or b.empty:
+        return pd.DataFrame(columns=['etapa', 'n', 'tempo_s', 'tempo_base_s', 'razao', 'regressao'])
+    m = a.merge(b[['etapa', 'n', 'tempo_s']], on=['etapa', 'n'], suffixes=('', '_base'))
+    m = m.rename(columns={'tempo_s_base': 'tempo_base_s'})
+    m['razao'] = m['tempo_s'] / m['tempo_base_s']
+    m['regressao'] = m['razao'] > 1.0 + tolerancia
+    return m[['etapa', 'n', 'tempo_s', 'tempo_base_s', 'razao', 'regressao']]
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(prog='python -m benchmarks.run', description=__doc__.splitlines()[0])
+    ap.add_argument('-n', '--tamanhos', type=int, nargs='+', default=[100, 1_000, 10_000],
+                    help='nº aproximado de trechos das redes geradas')
+    ap.add_argument('--etapas', nargs='+', help='só estas etapas (padrão: todas)')
+    ap.add_argument('-r', '--repeticoes', type=int, default=3)
+    ap.add_argument('--seed', type=int, default=0)
+    ap.add_argument('--sem-memoria', action='store_true', help='não mede o pico de memória (tracemalloc)')
+    ap.add_argument('-o', '--out', help='grava os resultados em JSON (ex.: nova linha de base)')
+    ap.add_argument('--comparar', help='JSON de linha de base para detectar regressões')
+    ap.add_argument('--tolerancia', type=float, default=0.25, help='folga relativa antes de acusar regressão')
+    a = ap.parse_args(argv)
+
+    atual = executar(a.tamanhos, a.etapas, a.repeticoes, not a.sem_memoria, a.seed)
+    if a.out:
+        Path(a.out).parent.mkdir(parents=True, exist_ok=True)
+        Path(a.out).write_text(json.dumps(atual, indent=2), encoding='utf-8')
+    if a.comparar:
+        base = json.loads(Path(a.comparar).read_text(encoding='utf-8'))
+        cmp = comparar(atual, base, a.tolerancia)
+        print(cmp.to_string(index=False, float_format=lambda v: f'{v:.4f}'))
+        n_reg = int(cmp['regressao'].sum())
+        print(f'{n_reg} regressão(ões) acima de {a.tolerancia:.0%}')
+        return 1 if n_reg else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
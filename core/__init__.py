@@ -1 +1,46 @@
-# package marker
+"""Motor de cálculo do SPAF, utilizável sem Streamlit.
+
+    import core
+    res = core.calcular_resultados(colunas, material='PVC', modelo_perda='Hazen-Williams',
+                                   k=0.3, exp=0.5, c=150.0, h_oper=10.0)
+
+Os nomes abaixo são carregados sob demanda (PEP 562): `import core` não importa
+nada além deste arquivo, e cada submódulo só exige NumPy. SciPy entra apenas em
+`resolver_malha`/`simular_demanda_estocastica`; pandas, reportlab, xlsxwriter e
+openpyxl ficam restritos aos módulos de E/S (projeto, importacao, reports,
+excel_parser), que continuam acessíveis como `core.<módulo>`.
+"""
+import importlib
+
+_API = {
+    'hydraulics': ('KPA_PER_M', 'to_float_array', 'velocidade', 'j_hazen_williams_m',
+                   'j_fair_whipple_hsiao_kpa', 'hw_c_for', 'fator_gradiente', 'gradiente_e_velocidade'),
+    'network': ('Trecho', 'RedeArvore', 'build_network', 'rede_from_trechos', 'acumular_pesos',
+                'propagar_pressoes', 'calcular_resultados'),
+    'sweep': ('grade_cenarios', 'varrer'),
+    'dimensionamento': ('dimensionar_dn',),
+    'incremental': ('ResultadosIncrementais',),
+    'periodo_estendido': ('PADRAO_RESIDENCIAL', 'multiplicadores', 'niveis_reservatorio', 'simular_periodo'),
+    'malha': ('SolucaoMalha', 'resolver_malha'),
+    'demanda_estocastica': ('calibrar_p_uso', 'simular_demanda_estocastica'),
+    'pecas': ('TIPOS_PECAS', 'ALIASES_PECAS', 'chave_canonica', 'QuantidadesPecas', 'leq_trechos',
+              'leq_candidatos'),
+    'conversao': ('vazio', 'texto', 'numero', 'inteiro', 'parse_lista', 'rotulo_trecho',
+                  'proximo_rotulo_excel'),
+}
+_ORIGEM = {nome: mod for mod, nomes in _API.items() for nome in nomes}
+
+__all__ = sorted(_ORIGEM)
+
+
+def __getattr__(nome):
+    mod = _ORIGEM.get(nome)
+    if mod is None:
+        raise AttributeError(f"module 'core' has no attribute {nome!r}")
+    valor = getattr(importlib.import_module(f'.{mod}', __name__), nome)
+    globals()[nome] = valor
+    return valor
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,176 @@
+"""Recalcula projetos SPAF (.json/.npz exportados pelo app) em lote, sem Streamlit.
+
+Uso:
+    python -m core.batch projetos/ outro.json -o saida -f csv -j 8 --k 0.3 --c-pvc 140
+
+Com `--workbook`, cada processo grava também os resultados do seu projeto em um
+.npz temporário (em `saida/`); o workbook é montado a partir deles, um projeto por
+vez e na ordem de entrada, sem recalcular nada no processo principal.
+"""
+import argparse
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+
+from .projeto import calc_kwargs, compute_project, load_project, project_files, resumo_pressoes
+
+FORMATS = {'csv': '.csv', 'parquet': '.parquet', 'xlsx': '.xlsx', 'pdf': '.pdf'}
+
+logger = logging.getLogger('spaf.batch')
+
+
+def write_results(t_out: pd.DataFrame, params: dict, path: Path, fmt: str):
+    if fmt == 'csv':
+        t_out.to_csv(path, index=False)
+    elif fmt == 'parquet':
+        t_out.to_parquet(path, index=False)
+    elif fmt == 'xlsx':
+        from .reports import export_to_excel
+        export_to_excel(path, t_out, params)
+    elif fmt == 'pdf':
+        from .reports import export_to_pdf
+        export_to_pdf(str(path), t_out, params)
+    else:
+        raise ValueError(f'Formato desconhecido: {fmt}')
+
+
+def process_project(path, out_dir, fmt, overrides, intermediario=None, nome=None) -> dict:
+    """Lê, calcula e grava um projeto em `out_dir`/`nome` (padrão: nome do arquivo sem
+    extensão). Executado em processo separado pelo pool. Com `intermediario` (caminho
+    .npz), grava também resultados e params para o workbook."""
+    t0 = time.perf_counter()
+    linha = {'arquivo': str(path), 'projeto': None, 'saida': None, 'solucionador': None, 'erro': None}
+    try:
+        params, trechos = load_project(path)
+        kwargs = calc_kwargs(params, **overrides)
+        t_out = compute_project(trechos, kwargs)
+        kwargs['solucionador'] = t_out.attrs['solucionador']
+        destino = Path(out_dir) / ((nome or Path(path).stem) + FORMATS[fmt])
+        write_results(t_out, {**params, 'calculo': kwargs}, destino, fmt)
+        if intermediario is not None:
+            from .projeto_npz import save_project_npz
+            save_project_npz(intermediario, t_out, {**params, 'calculo': kwargs})
+        linha.update(projeto=params.get('projeto'), saida=str(destino),
+                     solucionador=t_out.attrs.get('solucionador'), **resumo_pressoes(t_out))
+    except Exception as e:
+        linha['erro'] = f'{type(e).__name__}: {e}'
+    linha['tempo_s'] = round(time.perf_counter() - t0, 4)
+    return linha
+
+
+def iter_results(arquivos, **overrides):
+    """Gera (nome, t_out, params) um projeto por vez, sem manter os anteriores em memória.
+    Projetos com erro são ignorados e registrados no logger 'spaf.batch'."""
+    for path in arquivos:
+        try:
+            params, trechos = load_project(path)
+            kwargs = calc_kwargs(params, **overrides)
+            t_out = compute_project(trechos, kwargs)
+            kwargs['solucionador'] = t_out.attrs['solucionador']
+        except Exception as e:
+            logger.warning('projeto ignorado: %s (%s: %s)', path, type(e).__name__, e)
+            continue
+        yield Path(path).stem, t_out, {**params, 'calculo': kwargs}
+
+
+def _ler_intermediarios(itens):
+    """Gera (nome, t_out, params) dos .npz gravados por `process_project`, na ordem
+    de `itens` ((nome, arquivo, npz, erro)); os que falharam são registrados e ignorados."""
+    from .projeto_npz import load_project_npz
+
+    for nome, arquivo, npz, erro in itens:
+        if erro is not None or not npz.exists():
+            logger.warning('projeto fora do workbook: %s (%s)', arquivo, erro or 'sem resultados')
+            continue
+        params, t_out = load_project_npz(npz, colunas=None)
+        npz.unlink()
+        yield nome, t_out, params
+
+
+def _nomes_saida(arquivos) -> list:
+    """Nome de saída (sem extensão) de cada projeto: o nome do arquivo sem extensão ou,
+    quando dois arquivos o compartilham (a.json e a.npz, x/proj.json e y/proj.json), o
+    caminho relativo à pasta comum com '_' no lugar de '/' e '.' (x_proj_json)."""
+    caminhos = [Path(p).resolve() for p in arquivos]
+    grupos = {}
+    for i, p in enumerate(caminhos):
+        grupos.setdefault(p.stem.casefold(), []).append(i)
+    nomes = [p.stem for p in caminhos]
+    for idx in grupos.values():
+        if len(idx) < 2:
+            continue
+        raiz = Path(os.path.commonpath([caminhos[i].parent for i in idx]))
+        for i in idx:
+            nomes[i] = caminhos[i].relative_to(raiz).as_posix().replace('/', '_').replace('.', '_')
+    vistos = {}
+    for i, n in enumerate(nomes):      # restos (o mesmo arquivo duas vezes, a_json.json ao lado de a.json)
+        k = vistos[n.casefold()] = vistos.get(n.casefold(), 0) + 1
+        if k > 1:
+            nomes[i] = f'{n}-{k}'
+    return nomes
+
+
+def run_batch(entradas, out_dir, fmt='csv', workers=None, workbook=None, **overrides) -> pd.DataFrame:
+    """Distribui os projetos em um ProcessPoolExecutor e devolve o resumo (uma linha por projeto).
+    Com `workbook`, grava também todos os resultados em um único .xlsx (`export_workbook`)."""
+    arquivos = project_files(entradas)
+    out_dir = Path(out_dir); out_dir.mkdir(parents=True, exist_ok=True)
+    tmp = Path(tempfile.mkdtemp(prefix='.workbook-', dir=out_dir)) if workbook else None
+    inter = [tmp / f'{i:06d}.npz' if tmp else None for i in range(len(arquivos))]
+    nomes = _nomes_saida(arquivos)
+    tarefas = list(zip(arquivos, inter, nomes))
+    try:
+        if workers == 1:
+            linhas = [process_project(p, out_dir, fmt, overrides, n, nome) for p, n, nome in tarefas]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futs = [pool.submit(process_project, p, out_dir, fmt, overrides, n, nome) for p, n, nome in tarefas]
+                linhas = [f.result() for f in futs]
+        if workbook:
+            from .reports import export_workbook
+            export_workbook(workbook, _ler_intermediarios(
+                (nome, lin['arquivo'], n, lin['erro']) for lin, n, nome in zip(linhas, inter, nomes)))
+    finally:
+        if tmp is not None:
+            shutil.rmtree(tmp, ignore_errors=True)
+    resumo = pd.DataFrame(linhas)
+    if not resumo.empty:
+        resumo = resumo.sort_values('arquivo', kind='stable').reset_index(drop=True)
+    return resumo
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(prog='python -m core.batch', description=__doc__.splitlines()[0])
+    ap.add_argument('entradas', nargs='+', help='arquivos .json/.npz ou diretórios com projetos')
+    ap.add_argument('-o', '--out', default='resultados', help='diretório de saída')
+    ap.add_argument('-f', '--format', choices=sorted(FORMATS), default='csv')
+    ap.add_argument('-j', '--workers', type=int, default=None, help='processos (padrão: nº de CPUs)')
+    ap.add_argument('--workbook', help='grava também todos os projetos em um único .xlsx (uma aba por ramo)')
+    ap.add_argument('--k', type=float, help='sobrescreve k de Q = k·Peso^exp')
+    ap.add_argument('--exp', type=float, help='sobrescreve exp de Q = k·Peso^exp')
+    ap.add_argument('--c-pvc', type=float, help='sobrescreve C de Hazen-Williams (PVC)')
+    ap.add_argument('--c-fofo', type=float, help='sobrescreve C de Hazen-Williams (FoFo)')
+    ap.add_argument('--h-oper', type=float, help='sobrescreve o nível operacional H_oper (m)')
+    ap.add_argument('--solucionador', choices=['malha', 'arvore'],
+                    help='sobrescreve o solucionador gravado (padrão: malha se a rede tiver malhas)')
+    a = ap.parse_args(argv)
+
+    logging.basicConfig(format='%(levelname)s: %(message)s')
+    resumo = run_batch(a.entradas, a.out, a.format, a.workers, workbook=a.workbook,
+                       k=a.k, exp=a.exp, c_pvc=a.c_pvc, c_fofo=a.c_fofo, h_oper=a.h_oper,
+                       solucionador=a.solucionador)
+    resumo.to_csv(Path(a.out) / 'resumo.csv', index=False)
+    n_err = int(resumo['erro'].notna().sum()) if not resumo.empty else 0
+    print(f'{len(resumo)} projeto(s) processado(s), {n_err} com erro → {Path(a.out) / "resumo.csv"}')
+    return 1 if n_err else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
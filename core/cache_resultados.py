@@ -0,0 +1,156 @@
+"""Cache LRU de resultados, chaveado pelo conteúdo dos trechos e pelos parâmetros.
+
+`impressao_digital` resume as colunas de entrada e os parâmetros globais em um
+hash blake2b: colunas numéricas entram pelos bytes do array float64 mais a máscara
+de vazios (uma célula vazia não colide com um 0 digitado) e colunas de texto pelo
+leiaute UTF-8 + offsets (`projeto_npz.texto_utf8`, direto dos buffers Arrow quando
+há pyarrow). Assim, um rerun do Streamlit que não mudou nem os
+trechos nem a barra lateral reaproveita os resultados em vez de recalculá-los.
+
+`CacheResultados` guarda os valores em ordem de uso, descarta os menos usados
+ao passar do limite de memória (estimado por `nbytes`) e conta acertos/falhas.
+O cache é compartilhado entre sessões do processo: trate os valores como
+somente leitura.
+"""
+import json
+import os
+import threading
+from collections import OrderedDict
+from hashlib import blake2b
+
+import numpy as np
+import pandas as pd
+
+from .hydraulics import to_float_array
+from .projeto import BASE_COLS, DTYPES
+from .projeto_npz import texto_utf8
+
+LIMITE_MB_PADRAO = 256
+_AUSENTE = object()
+
+
+def impressao_digital(colunas, params: dict = None, nomes=BASE_COLS) -> str:
+    """Hash (hex) das colunas `nomes` de `colunas` (DataFrame ou dict) e de `params`."""
+    h = blake2b(digest_size=16)
+    if isinstance(colunas, pd.DataFrame):
+        n = len(colunas)
+    else:
+        n = len(next(iter(colunas.values()))) if colunas else 0
+    h.update(f'n={n}'.encode())
+    for c in nomes:
+        h.update(f'|{c}|'.encode('utf-8'))
+        if c not in colunas:
+            h.update(b'-')
+            continue
+        v = colunas[c]
+        if DTYPES.get(c, 'float') == 'float':
+            # vazio ≠ 0 digitado: a máscara de NaN entra no hash junto com os valores
+            a = to_float_array(v, default=np.nan)
+            vazio = np.isnan(a)
+            h.update(vazio.tobytes())
+            h.update(np.where(vazio, 0.0, a).tobytes())
+        elif DTYPES.get(c) == 'Int64':
+            s = pd.Series(v, copy=False)
+            h.update(s.isna().to_numpy().tobytes())
+            h.update(pd.to_numeric(s, errors='coerce').fillna(0).to_numpy(dtype=np.int64).tobytes())
+        else:
+            for arr in texto_utf8(pd.Series(v, copy=False)):
+                h.update(arr.tobytes())
+    h.update(json.dumps(params or {}, sort_keys=True, default=str).encode('utf-8'))
+    return h.hexdigest()
+
+
+def tamanho(valor) -> int:
+    """Estimativa (bytes) da memória ocupada por um valor em cache."""
+    if isinstance(valor, np.ndarray):
+        return int(valor.nbytes)
+    if isinstance(valor, (pd.DataFrame, pd.Series)):
+        return int(np.sum(valor.memory_usage(index=True, deep=False)))
+    if isinstance(valor, (bytes, bytearray, str)):
+        return len(valor)
+    if isinstance(valor, dict):
+        return sum(tamanho(v) for v in valor.values())
+    if isinstance(valor, (list, tuple)):
+        return sum(tamanho(v) for v in valor)
+    if hasattr(valor, '__dict__'):
+        return sum(tamanho(v) for v in vars(valor).values())
+    return 64
+
+
+class CacheResultados:
+    """Mapa chave → valor com descarte LRU por memória e por nº de itens."""
+
+    def __init__(self, limite_bytes: int = LIMITE_MB_PADRAO * 2**20, max_itens: int = 64):
+        self.limite_bytes = int(limite_bytes)
+        self.max_itens = int(max_itens)
+        self._itens = OrderedDict()      # chave → (valor, bytes)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.falhas = 0
+        self.descartes = 0
+
+    def __len__(self) -> int:
+        return len(self._itens)
+
+    def __contains__(self, chave) -> bool:
+        return chave in self._itens
+
+    def get(self, chave, padrao=None):
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is None:
+                self.falhas += 1
+                return padrao
+            self._itens.move_to_end(chave)
+            self.acertos += 1
+            return item[0]
+
+    def put(self, chave, valor, nbytes: int = None):
+        """Guarda `valor`; valores maiores que o limite inteiro não são guardados."""
+        nbytes = tamanho(valor) if nbytes is None else int(nbytes)
+        if nbytes > self.limite_bytes:
+            return
+        with self._lock:
+            antigo = self._itens.pop(chave, None)
+            if antigo is not None:
+                self._bytes -= antigo[1]
+            self._itens[chave] = (valor, nbytes)
+            self._bytes += nbytes
+            while self._itens and (self._bytes > self.limite_bytes or len(self._itens) > self.max_itens):
+                _, (_, b) = self._itens.popitem(last=False)
+                self._bytes -= b
+                self.descartes += 1
+
+    def obter(self, chave, calcular):
+        """Valor em cache ou `calcular()` (guardado para as próximas chamadas)."""
+        valor = self.get(chave, _AUSENTE)
+        if valor is _AUSENTE:
+            valor = calcular()
+            self.put(chave, valor)
+        return valor
+
+    def limpar(self):
+        with self._lock:
+            self._itens.clear()
+            self._bytes = 0
+
+    def estatisticas(self) -> dict:
+        total = self.acertos + self.falhas
+        return {'acertos': self.acertos, 'falhas': self.falhas, 'descartes': self.descartes,
+                'taxa_acerto': self.acertos / total if total else 0.0,
+                'itens': len(self._itens), 'bytes': self._bytes, 'limite_bytes': self.limite_bytes}
+
+
+_GLOBAL = None
+_GLOBAL_LOCK = threading.Lock()
+
+
+def cache_global() -> CacheResultados:
+    """Instância compartilhada pelo processo (limite em MB via SPAF_CACHE_MB)."""
+    global _GLOBAL
+    with _GLOBAL_LOCK:
+        if _GLOBAL is None:
+            mb = float(os.environ.get('SPAF_CACHE_MB', LIMITE_MB_PADRAO))
+            _GLOBAL = CacheResultados(int(mb * 2**20))
+        return _GLOBAL
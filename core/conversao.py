@@ -0,0 +1,74 @@
+"""Conversões de valores de célula e rótulos, em Python puro (sem pandas/NumPy).
+
+Usadas pelo app e por scripts para ler valores digitados ou vindos de planilhas:
+vazio/None/NaN/pd.NA viram o padrão, vírgula decimal é aceita.
+"""
+import re
+
+
+def vazio(x) -> bool:
+    """True para None, NaN e pd.NA (sem importar pandas)."""
+    if x is None:
+        return True
+    try:
+        return bool(x != x)
+    except TypeError:           # pd.NA não tem valor-verdade
+        return True
+
+
+def texto(x) -> str:
+    return '' if vazio(x) else str(x)
+
+
+def numero(x, default=0.0):
+    if vazio(x):
+        return default
+    try:
+        return float(str(x).replace(',', '.'))
+    except (TypeError, ValueError):
+        return default
+
+
+def inteiro(x, default=0):
+    try:
+        return int(numero(x, default))
+    except (TypeError, ValueError, OverflowError):
+        return default
+
+
+def parse_lista(txt: str):
+    """'0.3; 0,35' ou '0.3, 0.35' → [0.3, 0.35] (aceita vírgula decimal quando separado por ';')."""
+    txt = (txt or '').strip()
+    partes = txt.split(';') if ';' in txt else txt.split(',')
+    vals = [float(p.strip().replace(',', '.')) for p in partes if p.strip()]
+    if not vals:
+        raise ValueError('informe ao menos um valor')
+    return vals
+
+
+def rotulo_trecho(r) -> str:
+    """'ramo-ordem [de→para] (tipo) id=...' de um registro (dict ou linha de DataFrame)."""
+    return (f"{texto(r.get('ramo'))}-{inteiro(r.get('ordem'))} [{texto(r.get('de_no'))}→{texto(r.get('para_no'))}] "
+            f"({texto(r.get('tipo_ini'))}) id={texto(r.get('id'))}")
+
+
+def proximo_rotulo_excel(lbl: str) -> str:
+    """Próximo rótulo estilo Excel (A..Z, AA..AZ, BA..)."""
+    s = (lbl or '').strip().upper()
+    if s == '':
+        return 'A'
+    if not re.fullmatch(r'[A-Z]+', s):
+        s = 'A'
+    chars = list(s)
+    i = len(chars) - 1
+    carry = True
+    while i >= 0 and carry:
+        if chars[i] == 'Z':
+            chars[i] = 'A'
+            i -= 1
+        else:
+            chars[i] = chr(ord(chars[i]) + 1)
+            carry = False
+    if carry:
+        chars = ['A'] + chars
+    return ''.join(chars)
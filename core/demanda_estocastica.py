@@ -0,0 +1,237 @@
+"""Demanda estocástica (Monte Carlo): percentis de p_out por nó e probabilidade de
+ficar abaixo de p_min_ref.
+
+Cada ponto de consumo (trecho com peso local > 0) é um aparelho de peso P em UC
+(`peso_trecho`, com os pesos de `data/uc_nbr5626.csv` / `core.weights`) que, numa
+realização, está aberto com probabilidade `p_uso` e então solicita q = k·P^exp.
+Por padrão `p_uso` é calibrada para que o quantil de 99% da vazão total coincida
+com a vazão provável da norma, k·(ΣP)^exp.
+
+As realizações são avaliadas em lotes como arrays trecho × realização: vazões
+somadas a jusante (um produto esparso por nível da árvore), J = A·Q^n e a
+propagação de pressões nível a nível, em float32 (a resolução dos histogramas é
+bem maior que o erro de arredondamento). Os lotes têm tamanho fixo e cada um usa um gerador filho de
+`SeedSequence(seed)`, de modo que o resultado depende só da semente — não do nº de
+processos. Os lotes são distribuídos em um ProcessPoolExecutor.
+
+Para não guardar N × realizações valores, cada trecho acumula um histograma de
+p_out entre os limites exatos da faixa possível (todos os aparelhos fechados /
+todos abertos: a pressão é monótona na vazão) ajustados à faixa observada num
+lote piloto; os percentis são interpolados no histograma, com resolução de
+(faixa / `bins`).
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Mapping
+
+import numpy as np
+
+from .hydraulics import KPA_PER_M, fator_gradiente, to_float_array
+from .network import RedeArvore, build_network
+
+TAMANHO_LOTE = 512           # realizações por gerador filho (fixo: reprodutibilidade)
+MAX_ELEMENTOS = 1 << 22      # trechos × realizações avaliados de uma vez (memória)
+QUANTIS = (5, 50, 95)
+
+_CTX = None         # contexto do processo de trabalho (ver _iniciar_processo)
+
+
+def pontos_de_consumo(rede: RedeArvore, peso, acumular_peso=False) -> np.ndarray:
+    """Índices dos trechos que são pontos de consumo. Com `acumular_peso`, o peso é
+    local (todo trecho com peso > 0); sem ele, o peso informado já é acumulado e só
+    os trechos terminais (sem filhos) representam aparelhos."""
+    peso = to_float_array(peso)
+    pontos = peso > 0.0
+    if not acumular_peso:
+        pontos &= np.diff(rede.filhos_ptr) == 0
+    return np.flatnonzero(pontos)
+
+
+def calibrar_p_uso(q, q_alvo: float, quantil: float = 0.99) -> float:
+    """Probabilidade de uso tal que o `quantil` da vazão total (aproximação normal da
+    soma de Bernoullis) seja `q_alvo`."""
+    from statistics import NormalDist
+
+    q = np.asarray(q, dtype=float)
+    soma, soma2 = q.sum(), (q * q).sum()
+    if soma <= 0.0 or q_alvo >= soma:
+        return 1.0
+    if q_alvo <= 0.0:
+        return 0.0
+    z = NormalDist().inv_cdf(quantil)
+    p = np.linspace(0.0, 1.0, 100_001)
+    f = p * soma + z * np.sqrt(soma2 * p * (1.0 - p))
+    return float(p[min(int(np.argmax(f >= q_alvo)), p.size - 1)])
+
+
+def _somadores(rede: RedeArvore):
+    """Por nível (do mais profundo ao 1º): (pais únicos, matriz esparsa filhos → pais)."""
+    from scipy import sparse
+
+    ops = []
+    for lvl in reversed(rede.niveis[1:]):
+        pais, inv = np.unique(rede.pai[lvl], return_inverse=True)
+        M = sparse.csr_matrix((np.ones(lvl.size), (inv, np.arange(lvl.size))), shape=(pais.size, lvl.size))
+        ops.append((lvl, pais, M))
+    return ops
+
+
+def _pressoes(ctx, vazao_pontos):
+    """p_out (N × S, float32) para vazões (n_pontos × S) nos pontos de consumo."""
+    Q = np.zeros((ctx['n'], vazao_pontos.shape[1]), dtype=np.float32)
+    Q[ctx['pontos']] = vazao_pontos
+    for lvl, pais, M in ctx['somadores']:
+        Q[pais] += M @ Q[lvl]
+    # com poucos aparelhos abertos a maior parte de Q é nula: potência só onde há vazão
+    p = np.power(Q, np.float32(ctx['n_exp']), out=np.zeros_like(Q), where=Q > 0.0)
+    p *= ctx['perda'][:, None]
+    np.subtract(ctx['p_disp'][:, None], p, out=p)
+    # p_out = p_out(pai) + (p_disp − h_f), nível a nível e no próprio array
+    rede = ctx['rede']
+    for d, lvl in enumerate(rede.niveis):
+        p[lvl] += ctx['p0'] if d == 0 else p[rede.pai[lvl]]
+    if rede.orfaos.size:
+        p[rede.orfaos] = np.nan
+    return p
+
+
+def _iniciar_processo(ctx):
+    global _CTX
+    _CTX = ctx
+
+
+def _realizacoes(ctx, semente, n_amostras):
+    """Gera (p_out dos trechos válidos, vazão total) em blocos de colunas que cabem
+    em ~`MAX_ELEMENTOS` valores; o sorteio é feito de uma vez por lote."""
+    rng = np.random.default_rng(semente)
+    abertos = rng.random((ctx['pontos'].size, n_amostras)) < ctx['p_uso'][:, None]
+    vazao = abertos * ctx['q'][:, None]
+    passo = max(1, MAX_ELEMENTOS // max(ctx['n'], 1))
+    for a in range(0, n_amostras, passo):
+        v = vazao[:, a:a + passo]
+        p = _pressoes(ctx, v)
+        yield (p if ctx['todos_validos'] else p[ctx['valido']]), v.sum(axis=0)
+
+
+def _faixa(semente, n_amostras):
+    """(mín, máx) de p_out por trecho em um lote piloto."""
+    lo = hi = None
+    for p, _ in _realizacoes(_CTX, semente, n_amostras):
+        a, b = p.min(axis=1), p.max(axis=1)
+        lo = a if lo is None else np.minimum(lo, a)
+        hi = b if hi is None else np.maximum(hi, b)
+    return lo, hi
+
+
+def _lote(semente, n_amostras):
+    """Histogramas (N × bins), contagens abaixo de p_min e vazões totais de um lote."""
+    ctx = _CTX
+    bins = ctx['bins']
+    linhas = (np.arange(ctx['lo'].size, dtype=np.int64) * bins)[:, None]
+    hist = np.zeros(ctx['lo'].size * bins, dtype=np.int64)
+    abaixo = np.zeros(ctx['lo'].size, dtype=np.int64)
+    totais = []
+    for p, q_total in _realizacoes(ctx, semente, n_amostras):
+        abaixo += np.count_nonzero(p < ctx['p_min'][:, None], axis=1)
+        p -= ctx['lo'][:, None]
+        p *= ctx['escala'][:, None]
+        np.clip(p, 0, bins - 1, out=p)
+        pos = p.astype(np.int64)
+        pos += linhas
+        hist += np.bincount(pos.ravel(), minlength=hist.size)
+        totais.append(q_total)
+    return hist.reshape(-1, bins), abaixo, np.concatenate(totais)
+
+
+def _percentis(hist, lo, largura, quantis):
+    """Percentis por linha de um histograma, com interpolação linear dentro do bin."""
+    total = hist.sum(axis=1, keepdims=True)
+    acum = np.cumsum(hist, axis=1)
+    out = []
+    for qv in quantis:
+        alvo = qv / 100.0 * total
+        b = np.minimum((acum < alvo).sum(axis=1), hist.shape[1] - 1)
+        antes = np.take_along_axis(acum, b[:, None], axis=1)[:, 0] - np.take_along_axis(hist, b[:, None], axis=1)[:, 0]
+        dentro = np.take_along_axis(hist, b[:, None], axis=1)[:, 0]
+        frac = np.where(dentro > 0, (alvo[:, 0] - antes) / np.maximum(dentro, 1), 0.5)
+        out.append(lo + (b + np.clip(frac, 0.0, 1.0)) * largura)
+    return out
+
+
+def simular_demanda_estocastica(colunas: Mapping, *, material, modelo_perda, k, exp, c=None, h_oper=0.0,
+                                acumular_peso=False, p_uso=None, n_amostras: int = 20_000, seed: int = 0,
+                                bins: int = 256, quantis=QUANTIS, workers=None,
+                                rede: RedeArvore = None) -> dict:
+    """Monte Carlo da demanda; devolve arrays por trecho (p_out no nó para_no) e resumos.
+
+    Chaves por trecho: 'p_out P<q> (kPa)' para cada q de `quantis`, 'prob_abaixo_p_min',
+    'p_out_estatica (kPa)' (todos fechados) e 'p_out_todos_abertos (kPa)'. Resumos:
+    'p_uso', 'n_amostras', 'vazao_total P<q> (L/s)' e 'vazao_provavel (L/s)'.
+    `workers=1` roda no próprio processo; `None` usa todos os núcleos.
+    """
+    if rede is None:
+        rede = build_network(colunas['de_no'], colunas['para_no'])
+    N = rede.n
+    peso = to_float_array(colunas['peso_trecho'])
+    pontos = pontos_de_consumo(rede, peso, acumular_peso)
+    q = k * peso[pontos] ** exp
+    q_prov = k * peso[pontos].sum() ** exp if pontos.size else 0.0
+    if p_uso is None:
+        p_uso = calibrar_p_uso(q, q_prov)
+    A, n_exp = fator_gradiente(colunas['dn_mm'], material, modelo_perda, c)
+    ctx = {
+        'rede': rede, 'n': N, 'pontos': pontos, 'q': q, 'n_exp': n_exp,
+        'p_uso': np.broadcast_to(np.asarray(p_uso, dtype=float), (pontos.size,)).copy(),
+        'perda': (A * (to_float_array(colunas['comp_real_m'])
+                       + to_float_array(colunas['leq_m']))).astype(np.float32),
+        'p_disp': (KPA_PER_M * to_float_array(colunas['dz_io_m'])).astype(np.float32),
+        'p0': h_oper * KPA_PER_M, 'bins': int(bins),
+        'somadores': _somadores(rede),
+    }
+    # faixa exata de p_out: nenhum aparelho aberto / todos abertos
+    extremos = _pressoes(ctx, np.stack([np.zeros(pontos.size), q], axis=1)).astype(float)
+    hi, lo = extremos[:, 0], extremos[:, 1]
+    valido = ~np.isnan(hi)
+    p_min = to_float_array(colunas['p_min_ref_kPa']) if 'p_min_ref_kPa' in colunas else np.zeros(N)
+    ctx.update(valido=valido, todos_validos=bool(valido.all()), p_min=p_min[valido].astype(np.float32))
+
+    tamanhos = [min(TAMANHO_LOTE, n_amostras - a) for a in range(0, n_amostras, TAMANHO_LOTE)]
+    sementes = np.random.SeedSequence(seed).spawn(len(tamanhos) + 1)
+    # histogramas na faixa observada num lote piloto (com folga), dentro dos limites exatos
+    _iniciar_processo(ctx)
+    pil_lo, pil_hi = _faixa(sementes[-1], TAMANHO_LOTE)
+    folga = 0.25 * (pil_hi - pil_lo) + 1e-6
+    h_lo = np.maximum(pil_lo - folga, lo[valido])
+    h_hi = np.minimum(pil_hi + folga, hi[valido])
+    largura = np.maximum(h_hi - h_lo, 1e-6) / bins
+    ctx.update(lo=h_lo.astype(np.float32), escala=(1.0 / largura).astype(np.float32))
+
+    sementes = sementes[:-1]
+    if workers == 1 or len(tamanhos) <= 1:
+        partes = [_lote(s, t) for s, t in zip(sementes, tamanhos)]
+    else:
+        workers = min(workers or os.cpu_count() or 1, len(tamanhos))
+        with ProcessPoolExecutor(max_workers=workers, initializer=_iniciar_processo, initargs=(ctx,)) as pool:
+            partes = list(pool.map(_lote, sementes, tamanhos))
+
+    hist = sum(h for h, _, _ in partes)
+    abaixo = sum(a for _, a, _ in partes)
+    q_total = np.concatenate([qt for _, _, qt in partes]) if partes else np.zeros(0)
+    out = {}
+    for qv, v in zip(quantis, _percentis(hist, h_lo, largura, quantis)):
+        col = np.full(N, np.nan)
+        col[valido] = v
+        out[f'p_out P{qv:g} (kPa)'] = col
+    prob = np.full(N, np.nan)
+    prob[valido] = abaixo / max(n_amostras, 1)
+    out.update({
+        'prob_abaixo_p_min': prob,
+        'p_out_estatica (kPa)': hi,
+        'p_out_todos_abertos (kPa)': lo,
+        'p_uso': float(np.mean(ctx['p_uso'])) if pontos.size else 0.0,
+        'n_amostras': int(n_amostras),
+        'vazao_provavel (L/s)': float(q_prov),
+    })
+    for qv in quantis:
+        out[f'vazao_total P{qv:g} (L/s)'] = float(np.percentile(q_total, qv)) if q_total.size else 0.0
+    return out
@@ -0,0 +1,143 @@
+"""Dimensionamento automático de DN sobre o catálogo das tabelas de L_eq.
+
+Programação dinâmica na árvore (jusante → montante) com a pressão de entrada de
+cada trecho discretizada em passos de `passo_kpa`. Para cada trecho e pressão de
+entrada guarda-se o menor custo (Σ comprimento × DN) da subárvore que mantém
+p_out ≥ p_min_ref_kPa em todos os nós e v ≤ v_max; a escolha ótima é recuperada
+de montante para jusante. O arredondamento é sempre para baixo, então a solução
+é viável também no cálculo exato.
+"""
+from typing import Mapping
+
+import numpy as np
+
+from .hydraulics import KPA_PER_M, gradiente_e_velocidade, to_float_array
+from .network import RedeArvore, acumular_pesos, build_network, propagar_pressoes
+
+
+def dimensionar_dn(colunas: Mapping, diametros, *, material, modelo_perda, k, exp, c=None,
+                   h_oper=0.0, acumular_peso=False, v_max=3.0, passo_kpa=0.25,
+                   leq_candidatos=None, rede: RedeArvore = None) -> dict:
+    """Escolhe, por trecho, o DN do catálogo `diametros` de menor custo viável.
+
+    O L_eq informado é reescalado proporcionalmente ao DN candidato
+    (leq_m · D / de_ref_mm), exceto onde `leq_candidatos` — matriz (n, len(diametros))
+    alinhada a `diametros`, como a de `pecas.leq_candidatos` — traz o L_eq de cada
+    candidato (NaN = reescalar). Devolve dict com 'dn_mm' e 'leq_m' propostos,
+    'viavel' (bool) e 'custo' (Σ comp_real_m · DN).
+    """
+    if rede is None:
+        rede = build_network(colunas['de_no'], colunas['para_no'])
+    n = rede.n
+    D, pos_d = np.unique(to_float_array(diametros), return_index=True)
+    pos_d, D = pos_d[D > 0], D[D > 0]
+    K = D.size
+    dn_atual = to_float_array(colunas['dn_mm'])
+    ref = to_float_array(colunas['de_ref_mm']) if 'de_ref_mm' in colunas else dn_atual.copy()
+    ref = np.where(ref > 0, ref, dn_atual)
+    leq = to_float_array(colunas['leq_m'])
+    comp = to_float_array(colunas['comp_real_m'])
+    p_disp = KPA_PER_M * to_float_array(colunas['dz_io_m'])
+    p_min = to_float_array(colunas['p_min_ref_kPa']) if 'p_min_ref_kPa' in colunas else np.zeros(n)
+    peso = to_float_array(colunas['peso_trecho'])
+    if acumular_peso:
+        peso = acumular_pesos(rede, peso)
+    Q = k * (peso ** exp)
+
+    out = {'dn_mm': dn_atual.copy(), 'leq_m': leq.copy(), 'viavel': False, 'custo': np.nan}
+    if n == 0 or K == 0:
+        out['viavel'] = n == 0
+        return out
+
+    # perdas e restrições de velocidade por (trecho, candidato)
+    escala = D[None, :] / np.where(ref > 0, ref, np.nan)[:, None]
+    escala[np.isnan(escala)] = 1.0
+    leq_c = leq[:, None] * escala
+    if leq_candidatos is not None:
+        tab = np.asarray(leq_candidatos, dtype=float)[:, pos_d]
+        leq_c = np.where(np.isnan(tab), leq_c, tab)
+    jv = gradiente_e_velocidade(Q[:, None], D[None, :], material, modelo_perda, c)
+    delta = p_disp[:, None] - jv['J (kPa/m)'] * (comp[:, None] + leq_c)
+    ok_v = jv['v (m/s)'] <= v_max
+    sem_v = ~ok_v.any(axis=1)
+    ok_v[sem_v, K - 1] = True      # nenhum DN atende v_max: usa o maior e marca inviável
+    custo = np.maximum(comp, 1e-3)[:, None] * D[None, :]
+
+    # grade de pressão: p0 sobre a grade; limite superior com o candidato de menor perda
+    p0 = h_oper * KPA_PER_M
+    p_baixo = min(float(np.nanmin(p_min)), p0)
+    p_lo = p0 - np.floor((p0 - p_baixo) / passo_kpa) * passo_kpa
+    _, p_sup = propagar_pressoes(rede, delta.max(axis=1), p0)
+    p_hi = max(float(np.nanmax(p_sup)) if np.isfinite(p_sup).any() else p0, p0)
+    M = int(np.floor((p_hi - p_lo) / passo_kpa)) + 1
+    j = np.arange(M)
+    desloc = np.floor(delta / passo_kpa).astype(np.int64)             # j_out = j + desloc
+    j_min = np.ceil((p_min[:, None] - delta - p_lo) / passo_kpa - 1e-9).astype(np.int64)
+
+    # folhas (ramais finais, a maioria dos trechos): f(j) = menor custo entre os DNs com
+    # j ≥ j_min — função em degraus; a escolha é refeita na recuperação
+    folha = rede.filhos_ptr[1:] == rede.filhos_ptr[:-1]
+    custo_ok = np.where(ok_v, custo, np.inf)
+    lin_int = np.full(n, -1, dtype=np.int64)
+    lin_int[~folha] = np.arange(int((~folha).sum()))
+    escolha = np.zeros(((~folha).sum(), M), dtype=np.uint8 if K < 256 else np.uint16)
+    g_nivel = {}     # soma dos custos dos filhos por trecho do nível atual
+    f_raiz = None
+    bloco = max(1, int(4e6 // (K * M)))   # trechos por lote (limita arrays K × M a ~32 MB)
+    for d in range(len(rede.niveis) - 1, -1, -1):
+        lvl = rede.niveis[d]
+        g = g_nivel.pop(d, None)
+        f = np.empty((lvl.size, M))
+        pos_f = np.flatnonzero(folha[lvl])
+        if pos_f.size:
+            ii = lvl[pos_f]
+            degraus = np.full((ii.size, M + 1), np.inf)
+            np.minimum.at(degraus, (np.repeat(np.arange(ii.size), K), np.clip(j_min[ii], 0, M).ravel()),
+                          custo_ok[ii].ravel())
+            f[pos_f] = np.minimum.accumulate(degraus, axis=1)[:, :M]
+        pos_i = np.flatnonzero(~folha[lvl])
+        for a in range(0, pos_i.size, bloco):
+            pp = pos_i[a:a + bloco]
+            ii = lvl[pp]
+            j_out = np.minimum(j[None, None, :] + desloc[ii][:, :, None], M - 1)
+            tot = custo_ok[ii][:, :, None] + g[pp[:, None, None], np.maximum(j_out, 0)]
+            ok = (j[None, None, :] >= j_min[ii][:, :, None]) & (j_out >= 0)
+            tot[~ok] = np.inf
+            arg = np.argmin(tot, axis=1)
+            escolha[lin_int[ii]] = arg
+            f[pp] = np.take_along_axis(tot, arg[:, None, :], axis=1)[:, 0, :]
+        if d == 0:
+            f_raiz = f
+        else:
+            acc = np.zeros((rede.niveis[d - 1].size, M))
+            np.add.at(acc, _posicoes(rede.niveis[d - 1], rede.pai[lvl]), f)
+            g_nivel[d - 1] = acc
+
+    j0 = int(round((p0 - p_lo) / passo_kpa))
+    custo_total = float(f_raiz[:, j0].sum())
+    viavel = np.isfinite(custo_total)
+
+    # recuperação (montante → jusante)
+    idx = np.full(n, -1, dtype=np.int64)
+    j_in = np.full(n, j0, dtype=np.int64)
+    for d, lvl in enumerate(rede.niveis):
+        if d > 0:
+            pai = rede.pai[lvl]
+            j_in[lvl] = np.minimum(j_in[pai] + desloc[pai, idx[pai]], M - 1)
+        j_in[lvl] = np.clip(j_in[lvl], 0, M - 1)
+        fl = lvl[folha[lvl]]
+        cand = np.where(j_min[fl] <= j_in[fl][:, None], custo_ok[fl], np.inf)
+        idx[fl] = np.where(np.isfinite(cand).any(axis=1), np.argmin(cand, axis=1), K - 1)
+        it = lvl[~folha[lvl]]
+        idx[it] = escolha[lin_int[it], j_in[it]]
+    alc = idx >= 0
+    out['dn_mm'][alc] = D[idx[alc]]
+    out['leq_m'][alc] = leq_c[alc, idx[alc]]
+    out['viavel'] = bool(viavel and not sem_v[alc].any())
+    out['custo'] = float(np.sum(custo[alc, idx[alc]]))
+    return out
+
+
+def _posicoes(lvl: np.ndarray, alvos: np.ndarray) -> np.ndarray:
+    ordem = np.argsort(lvl, kind='stable')
+    return ordem[np.searchsorted(lvl[ordem], alvos)]
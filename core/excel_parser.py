@@ -1,11 +1,27 @@
 
 from __future__ import annotations
-from typing import Dict
+import time
+import tracemalloc
+from typing import Dict, Optional, Tuple
+import numpy as np
 import pandas as pd
 
+SHEETS = ["Exerc_4_(AF1)", "Peso_Andar", "Compr_Eq_(AF1)", "Quadro 3.3_PVC", "Quadro 3.3_FF"]
+
+# Faixa lida por aba no modo streaming: (min_row, max_row, min_col, max_col), 1-based,
+# None = até o fim. Cobre apenas as colunas usadas pelos normalize_*.
+SHEET_RANGES: Dict[str, Tuple[int, Optional[int], int, Optional[int]]] = {
+    "Exerc_4_(AF1)": (1, None, 1, 19),
+    "Peso_Andar": (1, None, 1, 11),
+    "Compr_Eq_(AF1)": (1, None, 1, None),
+    "Quadro 3.3_PVC": (1, None, 1, None),
+    "Quadro 3.3_FF": (1, None, 1, None),
+}
+
 class ParsedExcel:
-    def __init__(self, raw: Dict[str, pd.DataFrame]):
+    def __init__(self, raw: Dict[str, pd.DataFrame], stats: Optional[Dict[str, dict]] = None):
         self.raw = raw
+        self.stats = stats or {}
         self.exerc = raw.get("Exerc_4_(AF1)")
         self.peso_andar = raw.get("Peso_Andar")
         self.compr_eq = raw.get("Compr_Eq_(AF1)")
@@ -14,10 +30,81 @@ class ParsedExcel:
 
 def load_three_sheets(file) -> ParsedExcel:
     xls = pd.ExcelFile(file, engine="openpyxl")
-    need = ["Exerc_4_(AF1)", "Peso_Andar", "Compr_Eq_(AF1)", "Quadro 3.3_PVC", "Quadro 3.3_FF"]
+    need = SHEETS
     raw = {s: pd.read_excel(xls, sheet_name=s, header=None) for s in need if s in xls.sheet_names}
     return ParsedExcel(raw)
 
+def _cell(v):
+    # mesmas conversões do leitor openpyxl do pandas: vazio → NaN, float inteiro → int
+    if v is None or (isinstance(v, str) and v == ""):
+        return np.nan
+    if isinstance(v, float) and v.is_integer():
+        return int(v)
+    return v
+
+def _read_range(ws, min_row, max_row, min_col, max_col) -> pd.DataFrame:
+    rows = []
+    ultimo = -1
+    for i, row in enumerate(ws.iter_rows(min_row=min_row, max_row=max_row, min_col=min_col,
+                                         max_col=max_col, values_only=True)):
+        vals = [_cell(v) for v in row]
+        while vals and isinstance(vals[-1], float) and vals[-1] != vals[-1]:
+            vals.pop()
+        if vals:
+            ultimo = i
+        rows.append(vals)
+    rows = rows[:ultimo + 1]                       # descarta linhas vazias no fim (formatação)
+    largura = max((len(r) for r in rows), default=0)
+    arr = np.full((len(rows), largura), np.nan, dtype=object)
+    for i, r in enumerate(rows):
+        arr[i, :len(r)] = r
+    return pd.DataFrame(arr).infer_objects()
+
+def sheet_names(file) -> list:
+    """Nomes das abas, abrindo o arquivo em modo somente leitura."""
+    from openpyxl import load_workbook
+    wb = load_workbook(file, read_only=True)
+    try:
+        return list(wb.sheetnames)
+    finally:
+        wb.close()
+
+def load_sheets_streaming(file, sheets=None, ranges=None, medir_memoria=False) -> ParsedExcel:
+    """Importação somente leitura e em streaming: abre o arquivo com
+    `openpyxl.load_workbook(read_only=True)` e lê apenas as abas e faixas de
+    células necessárias (`SHEET_RANGES`, sobrescrevível por `ranges`).
+
+    `ParsedExcel.stats[aba]` traz tempo de leitura (s), memória do DataFrame
+    resultante e, com `medir_memoria=True`, o pico de alocação medido pelo
+    tracemalloc (mais lento)."""
+    from openpyxl import load_workbook
+    faixas = {**SHEET_RANGES, **(ranges or {})}
+    wb = load_workbook(file, read_only=True, data_only=True)
+    raw, stats = {}, {}
+    try:
+        for s in (sheets or SHEETS):
+            if s not in wb.sheetnames:
+                continue
+            t0 = time.perf_counter()
+            if medir_memoria:
+                tracemalloc.start()
+            df = _read_range(wb[s], *faixas.get(s, (1, None, 1, None)))
+            pico = None
+            if medir_memoria:
+                pico = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            raw[s] = df
+            stats[s] = {
+                "tempo_s": time.perf_counter() - t0,
+                "linhas": int(df.shape[0]),
+                "colunas": int(df.shape[1]),
+                "memoria_bytes": int(df.memory_usage(deep=True).sum()),
+                "pico_alocacao_bytes": pico,
+            }
+    finally:
+        wb.close()
+    return ParsedExcel(raw, stats)
+
 def normalize_peso_andar(df: pd.DataFrame) -> pd.DataFrame:
     tmp = df.copy(); tmp.columns = list(range(tmp.shape[1]))
     header_row = tmp.index[tmp.apply(lambda r: r.astype(str).str.contains("Apartamento Tipo", na=False).any(), axis=1)]
@@ -30,28 +117,34 @@ def normalize_peso_andar(df: pd.DataFrame) -> pd.DataFrame:
 
 def normalize_compr_eq(df: pd.DataFrame) -> pd.DataFrame:
     tmp = df.copy(); tmp.columns = list(range(tmp.shape[1]))
+    ncol = tmp.shape[1]
     groups = []
-    for c in range(tmp.shape[1]):
-        txt = str(tmp.iat[1, c]) if 1 < len(tmp) else ""
-        if "-" in txt and len(txt) <= 7:
-            groups.append((c, txt.strip()))
-    out_rows = []
-    for (c0, trecho) in groups:
-        total_col = c0; qt_col = c0 + 2; dn_row_guess = 3
-        for r in range(5, tmp.shape[0]):
-            total = tmp.iat[r, total_col] if total_col < tmp.shape[1] else None
-            qt = tmp.iat[r, qt_col] if qt_col < tmp.shape[1] else None
-            dn = tmp.iat[dn_row_guess, c0] if dn_row_guess < tmp.shape[0] else None
-            if pd.isna(total) and pd.isna(qt): continue
-            try: total_f = float(total)
-            except: total_f = None
-            try: qt_f = float(qt)
-            except: qt_f = None
-            try: dn_f = float(dn)
-            except: dn_f = None
-            if total_f is None and qt_f is None: continue
-            out_rows.append({"trecho": trecho, "dn_mm": dn_f, "quantidade": qt_f, "total_m": total_f})
-    return pd.DataFrame(out_rows)
+    if len(tmp) > 1:
+        cab = tmp.iloc[1].astype(str)
+        for c in np.flatnonzero(cab.str.contains("-", regex=False).to_numpy() & (cab.str.len() <= 7).to_numpy()):
+            groups.append((int(c), cab.iat[c].strip()))
+    if not groups or tmp.shape[0] <= 5:
+        return pd.DataFrame()
+
+    # blocos numéricos (linhas 5.. × grupos) para total (coluna c0) e quantidade (c0+2)
+    c0 = np.array([c for c, _ in groups])
+    corpo = tmp.iloc[5:]
+    def _bloco(cols):
+        out = np.full((corpo.shape[0], cols.size), np.nan)
+        ok = cols < ncol
+        if ok.any():
+            sub = corpo.iloc[:, cols[ok]]
+            out[:, ok] = sub.apply(pd.to_numeric, errors="coerce").to_numpy(dtype=float)
+        return out
+    total = _bloco(c0); qt = _bloco(c0 + 2)
+    dn = pd.to_numeric(tmp.iloc[3, c0], errors="coerce").to_numpy(dtype=float) if tmp.shape[0] > 3 \
+        else np.full(c0.size, np.nan)
+
+    g, r = np.nonzero((~(np.isnan(total) & np.isnan(qt))).T)   # ordem: grupo, depois linha
+    if g.size == 0:
+        return pd.DataFrame()
+    nomes = np.array([t for _, t in groups], dtype=object)
+    return pd.DataFrame({"trecho": nomes[g], "dn_mm": dn[g], "quantidade": qt[r, g], "total_m": total[r, g]})
 
 def normalize_exerc(df: pd.DataFrame) -> pd.DataFrame:
     tmp = df.copy(); tmp.columns = list(range(tmp.shape[1]))
@@ -61,13 +154,28 @@ def normalize_exerc(df: pd.DataFrame) -> pd.DataFrame:
     body = body[mask].reset_index(drop=True)
     return body
 
+_is_number = np.frompyfunc(lambda v: isinstance(v, (int, float, np.number)), 1, 1)
+
 def normalize_quadro33(df: pd.DataFrame) -> pd.DataFrame:
     if df is None or df.empty: return pd.DataFrame()
     tmp = df.copy(); tmp.columns = list(range(tmp.shape[1]))
-    rows = []
-    for r in range(tmp.shape[0]):
-        for c in range(tmp.shape[1]):
-            val = tmp.iat[r, c]
-            if isinstance(val, (int, float)) and not pd.isna(val):
-                rows.append({"row": r, "col": c, "value": float(val)})
-    return pd.DataFrame(rows)
+    linhas, colunas, valores = [], [], []
+    for c in range(tmp.shape[1]):
+        col = tmp[c]
+        if pd.api.types.is_numeric_dtype(col.dtype):
+            vals = col.to_numpy(dtype=float)
+            mask = ~np.isnan(vals)
+        else:
+            obj = col.to_numpy(dtype=object)
+            mask = _is_number(obj).astype(bool)
+            vals = np.zeros(obj.size)
+            if mask.any():
+                vals[mask] = obj[mask].astype(float)
+            mask &= ~np.isnan(vals)
+        idx = np.flatnonzero(mask)
+        linhas.append(idx); colunas.append(np.full(idx.size, c)); valores.append(vals[idx])
+    if not linhas or not sum(a.size for a in linhas):
+        return pd.DataFrame()
+    r = np.concatenate(linhas); c = np.concatenate(colunas); v = np.concatenate(valores)
+    ordem = np.lexsort((c, r))                                  # mesma ordem: linha, depois coluna
+    return pd.DataFrame({"row": r[ordem], "col": c[ordem], "value": v[ordem]})
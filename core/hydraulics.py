@@ -0,0 +1,130 @@
+"""Núcleo vetorizado de perda de carga (J) e velocidade.
+
+Todas as funções aceitam escalares ou arrays (Q, DN, material, C) e devolvem
+arrays NumPy, calculando o trecho inteiro de uma vez.
+"""
+import numpy as np
+
+KPA_PER_M = 9.80665  # 1 m.c.a. ≈ 9.80665 kPa
+
+# Hazen-Williams (SI): J = 10,67 · Q^1,852 / (C^1,852 · D^4,87)
+HW_COEF = 10.67
+HW_Q_EXP = 1.852
+HW_D_EXP = 4.87
+
+# Fair-Whipple-Hsiao (aprox. prática, Q em L/s, D em mm, J em kPa/m)
+FWH_PARAMS = {
+    'pvc':  (8.695e6, 1.75, 4.75),
+    'fofo': (20.2e6,  1.88, 4.88),
+}
+
+
+def _num_scalar(x, default=0.0):
+    if x is None:
+        return default
+    try:
+        v = float(str(x).replace(',', '.'))
+    except Exception:
+        return default
+    return default if v != v else v
+
+
+def to_float_array(values, default=0.0) -> np.ndarray:
+    """Equivalente vetorizado de `_num`: converte para float64, vírgula decimal aceita,
+    valores vazios/inválidos/NaN viram `default`."""
+    try:
+        arr = np.asarray(values, dtype=float)
+    except (TypeError, ValueError):
+        obj = np.asarray(values, dtype=object)
+        arr = np.fromiter((_num_scalar(v, default) for v in obj.ravel()),
+                          dtype=float, count=obj.size).reshape(obj.shape)
+    arr = np.array(arr, dtype=float, copy=True)
+    arr[np.isnan(arr)] = default
+    return arr
+
+
+def _is_pvc(material) -> np.ndarray:
+    mat = np.asarray(material, dtype=object)
+    return np.char.lower(np.char.strip(mat.astype(str))) == 'pvc'
+
+
+def velocidade(q_l_s, d_mm) -> np.ndarray:
+    """v (m/s) = Q / A, com Q em L/s e D em mm. Trechos com Q ou D nulos → 0."""
+    Q = np.maximum(to_float_array(q_l_s), 0.0) / 1000.0
+    D = np.maximum(to_float_array(d_mm), 0.0) / 1000.0
+    Q, D = np.broadcast_arrays(Q, D)
+    out = np.zeros(Q.shape)
+    ok = (Q > 0.0) & (D > 0.0)
+    out[ok] = Q[ok] / (np.pi * D[ok] ** 2 / 4.0)
+    return out
+
+
+def j_hazen_williams_m(q_l_s, d_mm, c) -> np.ndarray:
+    """Hazen-Williams (J em m/m). Q em L/s; D em mm; C escalar ou por trecho."""
+    Q = np.maximum(to_float_array(q_l_s), 0.0) / 1000.0
+    D = np.maximum(to_float_array(d_mm), 0.0) / 1000.0
+    C = np.maximum(to_float_array(c), 0.0)
+    Q, D, C = np.broadcast_arrays(Q, D, C)
+    out = np.zeros(Q.shape)
+    ok = (Q > 0.0) & (D > 0.0) & (C > 0.0)
+    out[ok] = HW_COEF * Q[ok] ** HW_Q_EXP / (C[ok] ** HW_Q_EXP * D[ok] ** HW_D_EXP)
+    return out
+
+
+def j_fair_whipple_hsiao_kpa(q_l_s, d_mm, material) -> np.ndarray:
+    """Fair-Whipple-Hsiao (J em kPa/m). PVC usa os coeficientes de tubo liso;
+    qualquer outro material usa os de ferro fundido."""
+    Q = np.maximum(to_float_array(q_l_s), 0.0)
+    D = np.maximum(to_float_array(d_mm), 0.0)
+    pvc = _is_pvc(material)
+    Q, D, pvc = np.broadcast_arrays(Q, D, pvc)
+    a = np.where(pvc, FWH_PARAMS['pvc'][0], FWH_PARAMS['fofo'][0])
+    b = np.where(pvc, FWH_PARAMS['pvc'][1], FWH_PARAMS['fofo'][1])
+    e = np.where(pvc, FWH_PARAMS['pvc'][2], FWH_PARAMS['fofo'][2])
+    out = np.zeros(Q.shape)
+    ok = (Q > 0.0) & (D > 0.0)
+    out[ok] = a[ok] * Q[ok] ** b[ok] / D[ok] ** e[ok]
+    return out
+
+
+def hw_c_for(material, c_pvc, c_fofo):
+    """C de Hazen-Williams por trecho a partir do material ('PVC' → c_pvc, demais → c_fofo)."""
+    return np.where(_is_pvc(material), to_float_array(c_pvc), to_float_array(c_fofo))
+
+
+def fator_gradiente(d_mm, material, modelo='Hazen-Williams', c=None):
+    """Fatora J = A · Q^n (J em kPa/m, Q em L/s) e devolve (A por trecho, n).
+
+    Útil quando o mesmo trecho é avaliado para muitas vazões (varreduras, séries
+    temporais): só Q^n precisa ser recalculado. Com Fair-Whipple-Hsiao o material
+    deve ser único (escalar).
+    """
+    D = np.maximum(to_float_array(d_mm), 0.0)
+    ok = D > 0.0
+    A = np.zeros(D.shape)
+    if modelo == 'Hazen-Williams':
+        C = np.maximum(to_float_array(1.0 if c is None else c), 0.0)
+        C, D, ok = np.broadcast_arrays(C, D, ok & (C > 0.0))
+        A = np.zeros(D.shape)
+        A[ok] = KPA_PER_M * HW_COEF / (1000.0 ** HW_Q_EXP * C[ok] ** HW_Q_EXP * (D[ok] / 1000.0) ** HW_D_EXP)
+        return A, HW_Q_EXP
+    a, b, e = FWH_PARAMS['pvc' if bool(_is_pvc(material)) else 'fofo']
+    A[ok] = a / D[ok] ** e
+    return A, b
+
+
+def gradiente_e_velocidade(q_l_s, d_mm, material, modelo='Hazen-Williams', c=None) -> dict:
+    """Calcula J (m/m), J (kPa/m) e v (m/s) em uma única passada.
+
+    `modelo` é 'Hazen-Williams' ou 'Fair-Whipple-Hsiao'; `c` (escalar ou array)
+    só é usado em Hazen-Williams.
+    """
+    if modelo == 'Hazen-Williams':
+        j_m = j_hazen_williams_m(q_l_s, d_mm, 0.0 if c is None else c)
+        j_kpa = j_m * KPA_PER_M
+    else:
+        j_kpa = j_fair_whipple_hsiao_kpa(q_l_s, d_mm, material)
+        j_m = j_kpa / KPA_PER_M
+    v = velocidade(q_l_s, d_mm)
+    j_m, j_kpa, v = np.broadcast_arrays(j_m, j_kpa, v)
+    return {'J (m/m)': np.array(j_m), 'J (kPa/m)': np.array(j_kpa), 'v (m/s)': np.array(v)}
@@ -0,0 +1,163 @@
+"""Importação de trechos em lote (CSV, aba do Excel ou bloco Compr_Eq_(AF1)).
+
+O lote inteiro é validado de uma vez, com as mesmas regras do cadastro manual:
+notação dos nós, início ≠ fim, trecho duplicado (no lote ou já cadastrado),
+tipo do nó de início e capacidade de saídas (Entrada=1, Tê=2, Cruzeta=3). O DN
+é associado ao DN de referência mais próximo da tabela de L_eq. As linhas
+válidas entram no store em uma única operação (`TrechoStore.extend`).
+"""
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .hydraulics import to_float_array
+from .projeto import BASE_COLS
+from .topologia import CAPACIDADE_PADRAO, CAPACIDADE_SAIDAS, norm_tipo, normalize_labels
+
+# Rótulo de tipo_ini gravado para cada tipo normalizado (igual ao do formulário)
+ROTULO_TIPO = {'entrada': 'Entrada de Água', 'te': 'Tê', 'cruzeta': 'Cruzeta'}
+ERRO_COLS = ['linha', 'de_no', 'para_no', 'motivo']
+
+
+def ler_tabela(file, nome=None, aba=0) -> pd.DataFrame:
+    """Lê um CSV (separador detectado: ',' ou ';') ou uma aba de Excel com cabeçalho
+    na 1ª linha. Os nomes de coluna são casados com BASE_COLS sem diferenciar caixa."""
+    nome = str(nome or getattr(file, 'name', file))
+    if Path(nome).suffix.lower() in ('.xlsx', '.xlsm', '.xls'):
+        df = pd.read_excel(file, sheet_name=aba)
+    else:
+        df = pd.read_csv(file, sep=None, engine='python')
+    mapa = {c.lower(): c for c in BASE_COLS}
+    return df.rename(columns=lambda c: mapa.get(str(c).strip().lower(), c))
+
+
+def trechos_de_compr_eq(compr_eq: pd.DataFrame) -> pd.DataFrame:
+    """Converte a saída de `excel_parser.normalize_compr_eq` (trecho 'X-Y', dn_mm,
+    quantidade, total_m por peça) em um trecho por grupo, com leq_m = Σ total_m."""
+    if compr_eq is None or compr_eq.empty:
+        return pd.DataFrame(columns=['de_no', 'para_no', 'dn_mm', 'leq_m'])
+    g = compr_eq.assign(total_m=pd.to_numeric(compr_eq['total_m'], errors='coerce')) \
+        .groupby('trecho', sort=False).agg(dn_mm=('dn_mm', 'first'), leq_m=('total_m', 'sum'))
+    partes = g.index.to_series().astype(str).str.split('-', n=1, expand=True)
+    return pd.DataFrame({
+        'id': g.index.astype(str),
+        'de_no': partes[0].str.strip().to_numpy(),
+        'para_no': (partes[1] if partes.shape[1] > 1 else pd.Series('', index=g.index)).str.strip().to_numpy(),
+        'dn_mm': g['dn_mm'].to_numpy(),
+        'leq_m': g['leq_m'].to_numpy(),
+    })
+
+
+def _coluna(df, nome, padrao=None):
+    return df[nome].to_numpy(dtype=object) if nome in df.columns else np.full(len(df), padrao, dtype=object)
+
+
+def preparar_lote(df: pd.DataFrame, store, notacao: str, indice_dn=None, ajustar_dn=False):
+    """Valida e completa um lote de trechos contra o store atual.
+
+    Devolve (validos, erros): `validos` com BASE_COLS pronto para `store.extend`,
+    `erros` com a linha de origem (1-based) e o motivo. Colunas ausentes recebem
+    os padrões do formulário: tipo_ini inferido pelo nº de saídas do nó (nó sem
+    chegada com 1 saída → Entrada de Água; 3 → Cruzeta; demais → Tê), ordem
+    sequencial por ramo após a maior já cadastrada e p_min_ref_kPa = 10 kPa nos
+    pontos finais (nós sem saída) e 5 kPa nos demais.
+    """
+    n = len(df)
+    nos = store.nos
+    motivo = np.full(n, None, dtype=object)
+
+    def _falha(mask, texto):
+        motivo[mask & pd.isna(motivo)] = texto     # guarda só o 1º motivo de cada linha
+
+    de, ok_de = normalize_labels(_coluna(df, 'de_no'), notacao)
+    para, ok_para = normalize_labels(_coluna(df, 'para_no'), notacao)
+    _falha(~(ok_de & ok_para), 'notação dos nós inválida')
+    _falha(de == para, 'início e fim iguais')
+
+    # duplicados: no próprio lote e contra o cadastro
+    chave = pd.Series(de, dtype=object) + '\x00' + pd.Series(para, dtype=object)
+    _falha(chave.duplicated().to_numpy(), 'trecho duplicado no lote')
+    existentes = np.fromiter(((d, p) in nos.arestas for d, p in zip(de, para)), dtype=bool, count=n)
+    _falha(existentes, 'trecho já cadastrado')
+
+    # DN de referência pela tabela de L_eq
+    dn = to_float_array(_coluna(df, 'dn_mm'), default=np.nan)
+    _falha(~(dn > 0), 'dn_mm ausente ou inválido')
+    de_ref, pol = dn.copy(), np.full(n, '', dtype=object)
+    if indice_dn is not None:
+        _, de_ref, pol = indice_dn.lookup_many(np.where(dn > 0, dn, 0.0))
+        de_ref = np.asarray(de_ref, dtype=float)
+        if ajustar_dn:
+            dn = np.where(de_ref > 0, de_ref, dn)
+
+    # tipo do nó de início: o do cadastro, senão o 1º informado no lote, senão inferido
+    vivos = pd.isna(motivo)
+    tipo_raw = _coluna(df, 'tipo_ini')
+    tipo = np.array([norm_tipo(t) for t in tipo_raw], dtype=object)
+    sem_tipo = tipo == ''
+    tipo_no = {no: t.most_common(1)[0][0] for no, t in nos.tipos.items() if len(t) == 1}
+    prim = pd.DataFrame({'de': de[vivos & ~sem_tipo], 'tipo': tipo[vivos & ~sem_tipo]}).drop_duplicates('de')
+    for no, t in zip(prim['de'], prim['tipo']):
+        tipo_no.setdefault(no, t)
+    if sem_tipo.any():
+        saidas_lote = pd.Series(de[vivos]).value_counts()
+        para_todos = set(para[vivos].tolist()) | set(nos.chegadas)
+
+        def _inferir(no):
+            if no in tipo_no:
+                return tipo_no[no]
+            total = int(saidas_lote.get(no, 0)) + nos.saidas.get(no, 0)
+            if total == 1 and no not in para_todos:
+                return 'entrada'
+            return 'cruzeta' if total >= 3 else 'te'
+        tipo[sem_tipo] = [_inferir(no) for no in de[sem_tipo]]
+        tipo_raw = np.where(sem_tipo, [ROTULO_TIPO.get(t, t) for t in tipo], tipo_raw)
+
+    # consistência do tipo por nó e capacidade de saídas
+    esperado = np.array([tipo_no.get(no, t) for no, t in zip(de, tipo)], dtype=object)
+    multiplos = np.fromiter((len(nos.tipos.get(no, ())) > 1 for no in de), dtype=bool, count=n)
+    _falha(multiplos, 'nó de início cadastrado com tipos diferentes')
+    _falha(esperado != tipo, 'tipo do nó de início diverge do já definido')
+
+    vivos = pd.isna(motivo)
+    rank = np.zeros(n, dtype=np.int64)
+    rank[vivos] = pd.Series(de[vivos]).groupby(de[vivos]).cumcount().to_numpy()
+    ja = np.fromiter((nos.saidas.get(no, 0) for no in de), dtype=np.int64, count=n)
+    cap = np.fromiter((CAPACIDADE_SAIDAS.get(t, CAPACIDADE_PADRAO) for t in tipo), dtype=np.int64, count=n)
+    _falha(vivos & (ja + rank >= cap), 'limite de saídas do nó de início')
+
+    vivos = pd.isna(motivo)
+    erros = pd.DataFrame({'linha': np.flatnonzero(~vivos) + 1, 'de_no': de[~vivos], 'para_no': para[~vivos],
+                          'motivo': motivo[~vivos]}, columns=ERRO_COLS)
+
+    # ordem por ramo, continuando da maior já cadastrada
+    ramo = pd.Series(_coluna(df, 'ramo', 'A')).fillna('A').astype(str).to_numpy(dtype=object)
+    ordem = to_float_array(_coluna(df, 'ordem'), default=np.nan)
+    falta = vivos & np.isnan(ordem)
+    if falta.any():
+        ramos_cad, ordens_cad = store.coluna('ramo'), store.coluna('ordem')
+        base = pd.Series(ordens_cad).groupby(pd.Series(ramos_cad, dtype=object)).max()
+        seq = pd.Series(ramo[falta]).groupby(ramo[falta]).cumcount().to_numpy() + 1
+        ordem[falta] = np.array([max(int(base.get(r, 0)), 0) for r in ramo[falta]]) + seq
+
+    folhas = ~np.isin(para, np.concatenate([de[vivos], np.array(list(nos.saidas), dtype=object)]))
+    p_min = to_float_array(_coluna(df, 'p_min_ref_kPa'), default=np.nan)
+    p_min = np.where(np.isnan(p_min), np.where(folhas, 10.0, 5.0), p_min)
+
+    cols = {
+        'id': _coluna(df, 'id'), 'ramo': ramo, 'ordem': ordem, 'tipo_ini': tipo_raw,
+        'de_no': de, 'para_no': para, 'dn_mm': dn, 'de_ref_mm': de_ref, 'pol_ref': pol,
+        'comp_real_m': to_float_array(_coluna(df, 'comp_real_m')),
+        'dz_io_m': to_float_array(_coluna(df, 'dz_io_m')),
+        'peso_trecho': to_float_array(_coluna(df, 'peso_trecho')),
+        'leq_m': to_float_array(_coluna(df, 'leq_m')),
+        'p_min_ref_kPa': p_min,
+    }
+    validos = pd.DataFrame({c: np.asarray(v, dtype=object)[vivos] for c, v in cols.items()}, columns=BASE_COLS)
+    return validos, erros
+
+
+def importar(store, validos: pd.DataFrame) -> np.ndarray:
+    """Grava o lote validado no store em uma única operação; devolve as posições."""
+    return store.extend({c: validos[c].to_numpy(dtype=object) for c in BASE_COLS})
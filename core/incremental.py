@@ -0,0 +1,154 @@
+"""Recálculo incremental dos resultados: só o trecho alterado e sua subárvore a jusante."""
+from typing import Mapping
+
+import numpy as np
+
+from .hydraulics import KPA_PER_M, gradiente_e_velocidade, to_float_array
+from .network import _as_str_array, build_network, calcular_resultados
+
+COLUNAS_HIDRAULICAS = ('leq_m', 'dn_mm', 'comp_real_m', 'dz_io_m', 'peso_trecho')
+COLUNAS_ESTRUTURA = ('id', 'de_no', 'para_no')
+
+
+def _mudou(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    return ~((a == b) | (np.isnan(a) & np.isnan(b)))
+
+
+class ResultadosIncrementais:
+    """Guarda entradas, rede e resultados da última execução.
+
+    Em `atualizar`, compara as colunas hidráulicas com a cópia guardada (e soma os
+    trechos marcados via `marcar_sujo`); se a estrutura (ids, nós) e os parâmetros
+    globais não mudaram, recalcula Q/J/v apenas dos trechos sujos e as pressões
+    apenas da subárvore a jusante deles, reaproveitando as pressões de montante.
+    """
+
+    def __init__(self):
+        self.invalidar()
+
+    def invalidar(self):
+        self._estrutura = None
+        self._versao_estrutura = None
+        self._params = None
+        self._entradas = {}
+        self._rede = None
+        self._prof = None
+        self._res = None
+        self._sujos = set()
+        self.ultimo_recalculo = 0   # nº de trechos com pressão recalculada na última chamada
+
+    @property
+    def rede(self):
+        return self._rede
+
+    def marcar_sujo(self, linhas):
+        """Marca linhas (posições) para recálculo na próxima chamada de `atualizar`."""
+        self._sujos.update(int(i) for i in np.atleast_1d(linhas))
+
+    def atualizar(self, colunas: Mapping, versao_estrutura=None, **params) -> dict:
+        """Resultados de `calcular_resultados(colunas, **params)`, recalculando só o necessário.
+
+        `versao_estrutura` (opcional) é um marcador que só muda quando ids ou nós mudam
+        (ex.: `TrechoStore.versao_estrutura`); com ele, a estrutura não é comparada
+        string a string e a checagem fica restrita às colunas numéricas.
+        """
+        entradas = {c: to_float_array(colunas[c]) for c in COLUNAS_HIDRAULICAS}
+        if self._res is None or params != self._params:
+            return self._completo(colunas, versao_estrutura, entradas, params)
+        if versao_estrutura is not None:
+            mesma = versao_estrutura == self._versao_estrutura
+        else:
+            mesma = self._mesma_estrutura(self._ler_estrutura(colunas))
+        if not mesma:
+            return self._completo(colunas, versao_estrutura, entradas, params)
+
+        sujo = np.zeros(self._rede.n, dtype=bool)
+        for c in COLUNAS_HIDRAULICAS:
+            sujo |= _mudou(entradas[c], self._entradas[c])
+        if self._sujos:
+            sujo[[i for i in self._sujos if 0 <= i < sujo.size]] = True
+        self._sujos.clear()
+        if not sujo.any():
+            self.ultimo_recalculo = 0
+            return self._res
+
+        res = self._res
+        rede = self._rede
+        if params.get('acumular_peso'):
+            dpeso = entradas['peso_trecho'] - self._entradas['peso_trecho']
+            for i in np.flatnonzero(dpeso != 0):
+                if self._prof[i] < 0:
+                    # fora da árvore (ex.: malha sem ligação com a Entrada): o peso não é
+                    # propagado, e o `pai` pode voltar ao próprio trecho
+                    res['peso_acum'][i] += dpeso[i]
+                    continue
+                j = i
+                while j >= 0:   # o peso alterado muda a vazão de todos os trechos de montante
+                    res['peso_acum'][j] += dpeso[i]
+                    sujo[j] = True
+                    j = rede.pai[j]
+            peso = res['peso_acum']
+        else:
+            peso = entradas['peso_trecho']
+
+        idx = np.flatnonzero(sujo)
+        self._hidraulica(idx, peso, entradas, params)
+        self._pressoes(rede.jusante(idx), params)
+        self._entradas = entradas
+        return res
+
+    @staticmethod
+    def _ler_estrutura(colunas):
+        return tuple(_as_str_array(colunas[c]) if c in colunas else None for c in COLUNAS_ESTRUTURA)
+
+    def _mesma_estrutura(self, estrutura) -> bool:
+        for a, b in zip(estrutura, self._estrutura):
+            if (a is None) != (b is None):
+                return False
+            if a is not None and (a.shape != b.shape or not np.array_equal(a, b)):
+                return False
+        return True
+
+    def _completo(self, colunas, versao_estrutura, entradas, params):
+        estrutura = self._ler_estrutura(colunas)
+        self._rede = build_network(estrutura[1], estrutura[2])
+        self._prof = np.full(self._rede.n, -1, dtype=np.int64)
+        for d, lvl in enumerate(self._rede.niveis):
+            self._prof[lvl] = d
+        self._res = calcular_resultados(colunas, rede=self._rede, **params)
+        self._estrutura, self._params, self._entradas = estrutura, dict(params), entradas
+        self._versao_estrutura = versao_estrutura
+        self._sujos.clear()
+        self.ultimo_recalculo = self._rede.n
+        return self._res
+
+    def _hidraulica(self, idx, peso, entradas, params):
+        res = self._res
+        Q = params['k'] * (peso[idx] ** params['exp'])
+        jv = gradiente_e_velocidade(Q, entradas['dn_mm'][idx], params['material'],
+                                    params['modelo_perda'], params.get('c'))
+        res['Q (L/s)'][idx] = Q
+        for c, v in jv.items():
+            res[c][idx] = v
+        J = jv['J (kPa/m)']
+        res['hf_cont (kPa)'][idx] = J * entradas['comp_real_m'][idx]
+        res['hf_loc (kPa)'][idx] = J * entradas['leq_m'][idx]
+        res['p_disp (kPa)'][idx] = KPA_PER_M * entradas['dz_io_m'][idx]
+
+    def _pressoes(self, afetados, params):
+        res = self._res; rede = self._rede
+        afetados = afetados[self._prof[afetados] >= 0]   # fora da árvore: continuam NaN
+        self.ultimo_recalculo = int(afetados.size)
+        if not afetados.size:
+            return
+        p_in, p_out = res['p_in (kPa)'], res['p_out (kPa)']
+        delta = res['p_disp (kPa)'] - res['hf_cont (kPa)'] - res['hf_loc (kPa)']
+        p0 = params.get('h_oper', 0.0) * KPA_PER_M
+        prof = self._prof[afetados]
+        ordem = np.argsort(prof, kind='stable')
+        afetados, prof = afetados[ordem], prof[ordem]
+        cortes = np.flatnonzero(np.diff(prof)) + 1
+        for lvl in np.split(afetados, cortes):
+            pai = rede.pai[lvl]
+            p_in[lvl] = np.where(pai >= 0, p_out[np.maximum(pai, 0)], p0)
+            p_out[lvl] = p_in[lvl] + delta[lvl]
@@ -1,14 +1,20 @@
 import numpy as np
 
+from .hydraulics import HW_COEF, HW_Q_EXP, HW_D_EXP
+from .pecas import ALIASES_PECAS, chave_canonica
+
 def hazen_williams_j(q_l_s: float, d_mm: float, c: float = 150.0) -> float:
     if q_l_s is None or d_mm in (None, 0):
         return 0.0
     Q = q_l_s / 1000.0  # L/s -> m³/s
     D = d_mm / 1000.0   # mm -> m
-    J = 10.67 * (Q**1.852) / ((c**1.852) * (D**4.871))
+    J = HW_COEF * (Q**HW_Q_EXP) / ((c**HW_Q_EXP) * (D**HW_D_EXP))
     return float(J)
 
 def comprimento_equivalente_total(eqlen_row: dict, detalhes: list[dict]) -> float:
+    """Σ quantidade · L_eq; `tipo` é uma chave de TIPOS_PECAS ou um nome de coluna,
+    resolvido nas colunas de `eqlen_row` por ALIASES_PECAS (ou pela própria chave,
+    como em `row_for`). Para todos os trechos de uma vez, use `core.pecas.leq_trechos`."""
     total = 0.0
     if eqlen_row is None:
         return 0.0
@@ -17,6 +23,8 @@ def comprimento_equivalente_total(eqlen_row: dict, detalhes: list[dict]) -> floa
         qtd  = float(item.get("quantidade") or 0)
         if not tipo or qtd <= 0: 
             continue
-        L = float(eqlen_row.get(tipo, 0) or 0)
+        chave = chave_canonica(tipo)
+        nomes = (*ALIASES_PECAS[chave], chave) if chave else (tipo,)
+        L = float(next((eqlen_row[a] for a in nomes if a in eqlen_row), 0) or 0)
         total += qtd * L
     return float(total)
@@ -0,0 +1,212 @@
+"""Redes com malhas (barrilete em anel, colunas interligadas): método do gradiente
+global (Todini–Pilati) com matrizes esparsas do SciPy.
+
+Em `calcular_resultados` cada nó herda a pressão do primeiro trecho que chega a
+ele; quando dois caminhos alimentam o mesmo nó, a vazão em cada um não é
+conhecida de antemão e precisa ser resolvida junto com as pressões.
+
+1. Poda: nós folha (grau 1, exceto a Entrada) são removidos em rodadas, até
+   sobrar o núcleo com malhas. Os trechos podados formam árvores penduradas no
+   núcleo; sua vazão vem do método da vazão provável (Q = k·ΣPeso^exp, com os
+   pesos acumulados a jusante) e entra no núcleo como demanda do nó onde a árvore
+   se liga. Numa rede sem malhas tudo é podado e o resultado coincide com
+   `calcular_resultados(..., acumular_peso=True)`.
+2. Núcleo: para cada trecho i (de u para w) e cada nó livre v,
+
+       p_u − p_w + γ·Δz_i = r_i·|Q_i|^(n−1)·Q_i      r_i = A_i·(L_i + L_eq_i)
+       Σ Q (chegam em v) − Σ Q (saem de v) = d_v
+
+   com J = A·Q^n de `fator_gradiente` (Hazen-Williams ou Fair-Whipple-Hsiao). A
+   cada iteração de Newton resolve-se só o sistema nodal (Mᵀ·D⁻¹·M)·p = b,
+   esparso, simétrico e positivo definido, e as vazões são atualizadas trecho a
+   trecho. Converge em poucas iterações mesmo com milhares de nós e malhas.
+3. As pressões das árvores podadas são propagadas a partir dos nós do núcleo.
+
+A vazão dos trechos sai com sinal: positiva no sentido de_no → para_no.
+"""
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from .hydraulics import KPA_PER_M, fator_gradiente, gradiente_e_velocidade, to_float_array
+from .network import RedeArvore, _as_str_array, build_network
+
+_D_MIN = 1e-6       # derivada mínima (kPa por L/s): evita D⁻¹ infinito com vazão nula ou perda nula
+
+
+@dataclass
+class SolucaoMalha:
+    """Resultado de `resolver_malha`."""
+    resultados: dict                # mesmas chaves de calcular_resultados; Q com sinal
+    p_no: np.ndarray                # pressão (kPa) por nó, na ordem de `rede.nos`
+    nucleo: np.ndarray              # trechos do núcleo com malhas (resolvidos pelo gradiente global)
+    n_malhas: int
+    iteracoes: int
+    variacao_rel: float             # Σ|ΔQ| / Σ|Q| na última iteração
+    convergiu: bool
+    sem_fonte: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.int64))
+
+
+def _podar(de, para, n_nos, fixo):
+    """Remove folhas (grau 1, não fixas) em rodadas; devolve (removido, folha, rodadas).
+
+    A única aresta restante de um nó de grau 1 é o XOR dos ids das arestas que
+    ainda incidem nele, mantido incrementalmente: custo total O(N)."""
+    n = de.size
+    ids = np.arange(n, dtype=np.int64)
+    grau = np.bincount(de, minlength=n_nos) + np.bincount(para, minlength=n_nos)
+    xor = np.zeros(n_nos, dtype=np.int64)
+    np.bitwise_xor.at(xor, de, ids)
+    np.bitwise_xor.at(xor, para, ids)
+    removido = np.zeros(n, dtype=bool)
+    folha = np.full(n, -1, dtype=np.int64)
+    rodadas = []
+    frente = np.flatnonzero((grau == 1) & ~fixo)
+    while frente.size:
+        e, pos = np.unique(xor[frente], return_index=True)   # trecho isolado: as duas pontas são folhas
+        frente = frente[pos]
+        removido[e] = True
+        folha[e] = frente
+        outro = de[e] + para[e] - frente
+        grau[frente] -= 1
+        xor[frente] ^= e
+        np.subtract.at(grau, outro, 1)
+        np.bitwise_xor.at(xor, outro, e)
+        rodadas.append(e)
+        cand = np.unique(outro)
+        frente = cand[(grau[cand] == 1) & ~fixo[cand]]
+    return removido, folha, rodadas
+
+
+def resolver_malha(colunas, *, material, modelo_perda, k, exp, c=None, h_oper=0.0, acumular_peso=False,
+                   rede: RedeArvore = None, fontes=None, tol: float = 1e-6, max_iter: int = 50) -> SolucaoMalha:
+    """Vazões e pressões de uma rede com malhas.
+
+    `fontes` são os rótulos dos nós com pressão imposta (H_oper·γ); por padrão,
+    os nós de onde saem trechos e aos quais nenhum trecho chega, como na árvore.
+    Com `acumular_peso`, o peso de um trecho do núcleo é tratado como demanda
+    local no seu nó final; sem ele, só as árvores penduradas geram demanda.
+    As demandas das árvores são somadas no núcleo (sem reaplicar a
+    simultaneidade entre elas), o que fica a favor da segurança.
+    """
+    from scipy import sparse                     # SciPy só é carregado quando há malhas a resolver
+    from scipy.sparse import csgraph
+    from scipy.sparse.linalg import spsolve
+
+    if rede is None:
+        rede = build_network(colunas['de_no'], colunas['para_no'])
+    n, n_nos = rede.n, rede.nos.size
+    de, para = rede.de_idx, rede.para_idx
+    if fontes is None:
+        fixo = np.zeros(n_nos, dtype=bool)
+        fixo[de] = True
+        fixo[para] = False
+    else:
+        fixo = np.isin(rede.nos, _as_str_array(fontes))
+
+    # trechos em componentes sem fonte (ou laços num único nó) ficam sem solução
+    grafo = sparse.coo_matrix((np.ones(n), (de, para)), shape=(n_nos, n_nos))
+    n_comp, comp = csgraph.connected_components(grafo, directed=False)
+    comp_ativo = np.zeros(n_comp, dtype=bool)
+    comp_ativo[comp[fixo]] = True
+    valido = comp_ativo[comp[de]] & (de != para)
+
+    peso = to_float_array(colunas['peso_trecho'])
+    dn = to_float_array(colunas['dn_mm'])
+    L = to_float_array(colunas['comp_real_m'])
+    Leq = to_float_array(colunas['leq_m'])
+    p_disp = KPA_PER_M * to_float_array(colunas['dz_io_m'])
+    A, n_exp = fator_gradiente(dn, material, modelo_perda, c)
+    r = np.broadcast_to(A, (n,)) * (L + Leq)
+
+    # 1. poda: vazão provável das árvores penduradas (sentido núcleo → folha)
+    removido, folha, rodadas = _podar(de[valido], para[valido], n_nos, fixo)
+    sel = np.flatnonzero(valido)
+    removido_t = np.zeros(n, dtype=bool); removido_t[sel] = removido
+    folha_t = np.full(n, -1, dtype=np.int64); folha_t[sel] = folha
+    rodadas = [sel[e] for e in rodadas]
+    montante = de + para - folha_t
+    peso_acum = np.where(valido, peso, np.nan)
+    if acumular_peso:
+        carga = np.zeros(n_nos)
+        for e in rodadas:
+            peso_acum[e] = peso[e] + carga[folha_t[e]]
+            np.add.at(carga, montante[e], peso_acum[e])
+    Q = np.full(n, np.nan)
+    Q[removido_t] = k * np.maximum(peso_acum[removido_t], 0.0) ** exp
+    Q[removido_t & (folha_t == de)] *= -1.0
+
+    # 2. núcleo
+    nucleo = np.flatnonzero(valido & ~removido_t)
+    p_no = np.full(n_nos, np.nan)
+    p_no[fixo & comp_ativo[comp]] = h_oper * KPA_PER_M
+    iteracoes, variacao, n_malhas = 0, 0.0, 0
+    if nucleo.size:
+        nos_nuc = np.unique(np.concatenate([de[nucleo], para[nucleo]]))
+        livres = nos_nuc[~fixo[nos_nuc]]
+        col = np.full(n_nos, -1, dtype=np.int64)
+        col[livres] = np.arange(livres.size)
+        demanda = np.zeros(n_nos)
+        pend = np.flatnonzero(removido_t)
+        np.add.at(demanda, montante[pend], np.abs(Q[pend]))
+        if acumular_peso:
+            np.add.at(demanda, para[nucleo], k * np.maximum(peso[nucleo], 0.0) ** exp)
+        d = demanda[livres]
+        n_sub = csgraph.connected_components(
+            sparse.coo_matrix((np.ones(nucleo.size), (de[nucleo], para[nucleo])), shape=(n_nos, n_nos)),
+            directed=False)[0] - (n_nos - nos_nuc.size)
+        n_malhas = int(nucleo.size - nos_nuc.size + n_sub)
+
+        # incidência trecho × nó livre: −1 no nó inicial, +1 no final; nós fixos vão para c0
+        m = nucleo.size
+        lin = np.arange(m)
+        cu, cw = col[de[nucleo]], col[para[nucleo]]
+        ku, kw = cu >= 0, cw >= 0
+        M = sparse.csr_matrix((np.r_[-np.ones(ku.sum()), np.ones(kw.sum())],
+                               (np.r_[lin[ku], lin[kw]], np.r_[cu[ku], cw[kw]])), shape=(m, livres.size))
+        Mt = M.T.tocsr()
+        c0 = np.where(ku, 0.0, -p_no[de[nucleo]]) + np.where(kw, 0.0, p_no[para[nucleo]])
+        rn, g = r[nucleo], p_disp[nucleo]
+        # partida: 1 m/s em todos os trechos do núcleo
+        q = np.maximum(np.pi * (dn[nucleo] / 1000.0) ** 2 / 4.0 * 1000.0, 1e-3)
+        p_liv = np.zeros(livres.size)
+        for iteracoes in range(1, max_iter + 1):
+            aq = np.abs(q)
+            h = rn * aq ** (n_exp - 1.0) * q
+            Dinv = 1.0 / np.maximum(n_exp * rn * aq ** (n_exp - 1.0), _D_MIN)
+            resto = h - g + c0
+            S = (Mt @ sparse.diags(Dinv) @ M).tocsc()
+            p_liv = np.atleast_1d(spsolve(S, Mt @ q - Mt @ (Dinv * resto) - d))
+            q_novo = q - Dinv * (resto + M @ p_liv)
+            variacao = float(np.abs(q_novo - q).sum() / max(np.abs(q_novo).sum(), 1e-12))
+            q = q_novo
+            if variacao < tol:
+                break
+        Q[nucleo] = q
+        p_no[livres] = p_liv
+
+    # 3. resultados por trecho e pressões das árvores (do núcleo para as folhas)
+    aq = np.abs(Q)
+    jv = gradiente_e_velocidade(np.nan_to_num(aq), dn, material, modelo_perda, c)
+    sinal = np.sign(Q)
+    J = jv['J (kPa/m)'] * sinal
+    hf_cont, hf_loc = J * L, J * Leq
+    queda = p_disp - hf_cont - hf_loc            # p_para − p_de
+    for e in reversed(rodadas):
+        f = folha_t[e]
+        p_no[f] = p_no[montante[e]] + np.where(f == para[e], queda[e], -queda[e])
+
+    out = {'Q (L/s)': Q}
+    if acumular_peso:
+        out['peso_acum'] = peso_acum
+    out.update({'J (m/m)': jv['J (m/m)'] * sinal, 'J (kPa/m)': J, 'v (m/s)': np.where(valido, jv['v (m/s)'], np.nan)})
+    out.update({
+        'p_in (kPa)': p_no[de],
+        'hf_cont (kPa)': hf_cont,
+        'hf_loc (kPa)': hf_loc,
+        'p_disp (kPa)': p_disp,
+        'p_out (kPa)': p_no[para],
+    })
+    return SolucaoMalha(resultados=out, p_no=p_no, nucleo=nucleo, n_malhas=n_malhas, iteracoes=iteracoes,
+                        variacao_rel=variacao, convergiu=bool(variacao < tol) or not nucleo.size,
+                        sem_fonte=np.flatnonzero(~valido))
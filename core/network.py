@@ -1,8 +1,14 @@
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from typing import List, Mapping
+
+import numpy as np
+
+from .hydraulics import KPA_PER_M, gradiente_e_velocidade, to_float_array
+
 @dataclass
 class Trecho:
-    id: int
+    id: str
     de_no: str
     para_no: str
     andar: str
@@ -10,3 +16,174 @@ class Trecho:
     dn_mm: float
     comp_real_m: float
     leq_m: float = 0.0
+    ramo: str = ''
+    dz_io_m: float = 0.0
+    peso_trecho: float = 0.0
+    p_min_ref_kPa: float = 0.0
+
+
+def _as_str_array(values) -> np.ndarray:
+    """Rótulos de nó como array de str (None/NaN → '')."""
+    obj = np.asarray(values, dtype=object).ravel()
+    out = np.empty(obj.size, dtype=object)
+    for i, v in enumerate(obj):
+        try:
+            vazio = v is None or bool(v != v)
+        except TypeError:  # pd.NA
+            vazio = True
+        out[i] = '' if vazio else str(v).strip()
+    return out.astype(str)
+
+
+def _gather_ranges(ptr: np.ndarray, idx: np.ndarray, sel: np.ndarray) -> np.ndarray:
+    """Concatena idx[ptr[s]:ptr[s+1]] para todo s em `sel` sem laço Python."""
+    starts = ptr[sel]; lens = ptr[sel + 1] - starts
+    total = int(lens.sum())
+    if total == 0:
+        return np.empty(0, dtype=np.int64)
+    offs = np.repeat(starts - np.concatenate(([0], np.cumsum(lens)[:-1])), lens)
+    return idx[offs + np.arange(total)]
+
+
+@dataclass
+class RedeArvore:
+    """Índice de adjacência da rede (trechos como arestas de_no → para_no).
+
+    `pai[i]` é o trecho que chega ao nó de início de i (-1 nos trechos que partem
+    da Entrada); `niveis` agrupa os trechos por profundidade, em ordem topológica.
+    """
+    n: int
+    nos: np.ndarray                 # rótulos únicos dos nós
+    de_idx: np.ndarray              # índice do nó de início por trecho
+    para_idx: np.ndarray            # índice do nó final por trecho
+    pai: np.ndarray
+    filhos_ptr: np.ndarray          # CSR: filhos de i em filhos_idx[ptr[i]:ptr[i+1]]
+    filhos_idx: np.ndarray
+    niveis: List[np.ndarray] = field(default_factory=list)
+    nos_multiplos: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=str))
+    orfaos: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.int64))
+
+    @property
+    def ordem(self) -> np.ndarray:
+        """Trechos alcançáveis em ordem topológica (montante → jusante)."""
+        return np.concatenate(self.niveis) if self.niveis else np.empty(0, dtype=np.int64)
+
+    @property
+    def raizes(self) -> np.ndarray:
+        return self.niveis[0] if self.niveis else np.empty(0, dtype=np.int64)
+
+    def filhos(self, i: int) -> np.ndarray:
+        return self.filhos_idx[self.filhos_ptr[i]:self.filhos_ptr[i + 1]]
+
+    def jusante(self, sel) -> np.ndarray:
+        """Trechos em `sel` mais toda a subárvore a jusante (sem repetição)."""
+        sel = np.unique(np.asarray(sel, dtype=np.int64))
+        visto = np.zeros(self.n, dtype=bool); visto[sel] = True
+        frente = sel
+        while frente.size:
+            nxt = _gather_ranges(self.filhos_ptr, self.filhos_idx, frente)
+            nxt = nxt[~visto[nxt]]
+            visto[nxt] = True
+            frente = nxt
+        return np.flatnonzero(visto)
+
+
+def build_network(de_no, para_no) -> RedeArvore:
+    """Monta o índice de adjacência uma única vez e percorre a árvore por níveis
+    a partir dos nós sem alimentação (Entrada). Custo O(N) após a rotulação."""
+    de = _as_str_array(de_no); para = _as_str_array(para_no)
+    n = de.size
+    nos, inv = np.unique(np.concatenate([de, para]), return_inverse=True)
+    de_idx = inv[:n].astype(np.int64); para_idx = inv[n:].astype(np.int64)
+
+    # trecho que alimenta cada nó (o primeiro, se houver mais de um)
+    chegada = np.full(nos.size, -1, dtype=np.int64)
+    rev = np.arange(n - 1, -1, -1)
+    chegada[para_idx[rev]] = rev
+    n_cheg = np.bincount(para_idx, minlength=nos.size)
+    pai = chegada[de_idx] if n else np.empty(0, dtype=np.int64)
+
+    tem_pai = pai >= 0
+    filhos_ptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(pai[tem_pai], minlength=n), out=filhos_ptr[1:])
+    filhos_idx = np.flatnonzero(tem_pai)[np.argsort(pai[tem_pai], kind='stable')]
+
+    niveis = []
+    visto = np.zeros(n, dtype=bool)
+    frente = np.flatnonzero(~tem_pai)
+    while frente.size:
+        visto[frente] = True
+        niveis.append(frente)
+        frente = _gather_ranges(filhos_ptr, filhos_idx, frente)
+        frente = frente[~visto[frente]]
+
+    return RedeArvore(
+        n=n, nos=nos, de_idx=de_idx, para_idx=para_idx, pai=pai,
+        filhos_ptr=filhos_ptr, filhos_idx=filhos_idx, niveis=niveis,
+        nos_multiplos=nos[n_cheg > 1], orfaos=np.flatnonzero(~visto),
+    )
+
+
+def rede_from_trechos(trechos: List[Trecho]) -> RedeArvore:
+    return build_network([t.de_no for t in trechos], [t.para_no for t in trechos])
+
+
+def acumular_pesos(rede: RedeArvore, peso) -> np.ndarray:
+    """Soma o peso de cada trecho com o de toda a sua subárvore a jusante."""
+    acum = np.array(to_float_array(peso), dtype=float, copy=True)
+    for lvl in reversed(rede.niveis[1:]):
+        np.add.at(acum, rede.pai[lvl], acum[lvl])
+    return acum
+
+
+def propagar_pressoes(rede: RedeArvore, delta_kpa, p0_kpa):
+    """p_out = p_in + delta, com p_in herdado do p_out do trecho pai (p0 nas raízes).
+
+    `delta_kpa` pode ter forma (N,) ou (N, S) para S cenários simultâneos; `p0_kpa`
+    é escalar ou (S,). Trechos não alcançáveis a partir da Entrada ficam com NaN.
+    """
+    delta = np.asarray(delta_kpa, dtype=float)
+    p0 = np.asarray(p0_kpa, dtype=float)
+    shape = np.broadcast_shapes(delta.shape, (rede.n,) + p0.shape)
+    p_in = np.full(shape, np.nan); p_out = np.full(shape, np.nan)
+    delta = np.broadcast_to(delta, shape)
+    for d, lvl in enumerate(rede.niveis):
+        if d == 0:
+            p_in[lvl] = p0
+        else:
+            p_in[lvl] = p_out[rede.pai[lvl]]
+        p_out[lvl] = p_in[lvl] + delta[lvl]
+    return p_in, p_out
+
+
+def calcular_resultados(colunas: Mapping, *, material, modelo_perda, k, exp, c=None,
+                        h_oper=0.0, acumular_peso=False, rede: RedeArvore = None) -> dict:
+    """Q, J, v e pressões de todos os trechos em uma passada sobre a árvore.
+
+    `colunas` é qualquer mapeamento coluna → valores (ex.: DataFrame dos trechos).
+    Devolve um dict de arrays na mesma ordem das linhas de entrada.
+    """
+    if rede is None:
+        rede = build_network(colunas['de_no'], colunas['para_no'])
+    peso = to_float_array(colunas['peso_trecho'])
+    if acumular_peso:
+        peso = acumular_pesos(rede, peso)
+    Q = k * (peso ** exp)
+    jv = gradiente_e_velocidade(Q, colunas['dn_mm'], material, modelo_perda, c)
+    J = jv['J (kPa/m)']
+    hf_cont = J * to_float_array(colunas['comp_real_m'])
+    hf_loc = J * to_float_array(colunas['leq_m'])
+    p_disp = KPA_PER_M * to_float_array(colunas['dz_io_m'])
+    p_in, p_out = propagar_pressoes(rede, p_disp - hf_cont - hf_loc, h_oper * KPA_PER_M)
+    out = {'Q (L/s)': Q}
+    if acumular_peso:
+        out['peso_acum'] = peso
+    out.update(jv)
+    out.update({
+        'p_in (kPa)': p_in,
+        'hf_cont (kPa)': hf_cont,
+        'hf_loc (kPa)': hf_loc,
+        'p_disp (kPa)': p_disp,
+        'p_out (kPa)': p_out,
+    })
+    return out
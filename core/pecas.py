@@ -0,0 +1,239 @@
+"""Quantidades de peças por trecho e L_eq de todos os trechos em um passo.
+
+As peças seguem um vocabulário canônico (`TIPOS_PECAS`); `ALIASES_PECAS` liga cada
+chave às colunas das tabelas de L_eq de cada material, que usam nomes diferentes
+para a mesma peça (PVC 'te_90_saida_de_lado_m', FoFo 'valvula_de_retencao_tipo_leve_m'...).
+
+As quantidades formam uma matriz esparsa Q (trecho × peça), guardada por id de
+trecho. Com T[d, j] = L_eq da peça j na linha d da tabela do material,
+
+    leq_m[i] = Σ_j Q[i, j] · T[dn_ref(i), j]
+
+avaliado só sobre as entradas não nulas de Q (gather + np.bincount): trocar o
+material (outra T), os DNs (outras linhas) ou as quantidades é um único passo
+vetorizado sobre todos os trechos.
+"""
+from typing import Mapping
+
+import numpy as np
+
+TIPOS_PECAS = [
+    ('joelho_90_m', 'Joelho 90°'),
+    ('joelho_45_m', 'Joelho 45°'),
+    ('curva_90_m', 'Curva 90°'),
+    ('curva_45_m', 'Curva 45°'),
+    ('cotovelo_90_raio_longo_m', 'Cotovelo 90° Raio Longo'),
+    ('cotovelo_90_raio_medio_m', 'Cotovelo 90° Raio Médio'),
+    ('cotovelo_90_raio_curto_m', 'Cotovelo 90° Raio Curto'),
+    ('cotovelo_45_m', 'Cotovelo 45°'),
+    ('curva_90_r_div_d_1_2_m', 'Curva 90° R/D = 1½'),
+    ('curva_90_r_div_d_1_m', 'Curva 90° R/D = 1'),
+    ('te_passagem_direita_m', 'Tê 90° Passagem Direita'),
+    ('te_saida_de_lado_m', 'Tê 90° Saída de Lado'),
+    ('te_saida_bilateral_m', 'Tê 90° Saída Bilateral'),
+    ('entrada_normal_m', 'Entrada Normal'),
+    ('entrada_de_borda_m', 'Entrada de Borda'),
+    ('saida_de_canalizacao_m', 'Saída de Canalização'),
+    ('valvula_pe_crivo_m', 'Válvula de Pé e Crivo'),
+    ('valvula_retencao_leve_m', 'Válvula de Retenção (Leve)'),
+    ('valvula_retencao_pesado_m', 'Válvula de Retenção (Pesado)'),
+    ('registro_globo_aberto_m', 'Registro de Globo (aberto)'),
+    ('registro_gaveta_aberto_m', 'Registro de Gaveta (aberto)'),
+    ('registro_angulo_aberto_m', 'Registro de Ângulo (aberto)'),
+]
+
+# Colunas de tabela aceitas para cada peça, em ordem de preferência. Na tabela de
+# FoFo, 'te_passagem_direita_m' traz os valores de saída de lado (iguais aos de
+# saída bilateral, como na de PVC) e a passagem direta está em 'te_passagem_direta_m'.
+ALIASES_PECAS = {
+    'joelho_90_m': ('joelho_90_m',),
+    'joelho_45_m': ('joelho_45_m',),
+    'curva_90_m': ('curva_90_m',),
+    'curva_45_m': ('curva_45_m',),
+    'cotovelo_90_raio_longo_m': ('cotovelo_90_raio_longo_m',),
+    'cotovelo_90_raio_medio_m': ('cotovelo_90_raio_medio_m',),
+    'cotovelo_90_raio_curto_m': ('cotovelo_90_raio_curto_m',),
+    'cotovelo_45_m': ('cotovelo_45_m',),
+    'curva_90_r_div_d_1_2_m': ('curva_90_r_div_d_1_2_m',),
+    'curva_90_r_div_d_1_m': ('curva_90_r_div_d_1_m',),
+    'te_passagem_direita_m': ('te_90_passagem_direita_m', 'te_passagem_direta_m'),
+    'te_saida_de_lado_m': ('te_90_saida_de_lado_m', 'te_saida_de_lado_m', 'te_passagem_direita_m'),
+    'te_saida_bilateral_m': ('te_90_saida_bilateral_m', 'te_saida_bilateral_m', 'te_saida_lateral_m'),
+    'entrada_normal_m': ('entrada_normal_m',),
+    'entrada_de_borda_m': ('entrada_de_borda_m',),
+    'saida_de_canalizacao_m': ('saida_de_canalizacao_m', 'saida_da_canalizacao_m'),
+    'valvula_pe_crivo_m': ('valvula_pe_e_crivo_m', 'valvula_de_pe_e_crivo_m', 'valvula_pe_crivo_m'),
+    'valvula_retencao_leve_m': ('valvula_retencao_tipo_leve_m', 'valvula_de_retencao_tipo_leve_m',
+                                'valvula_retencao_leve_m'),
+    'valvula_retencao_pesado_m': ('valvula_retencao_tipo_pesado_m', 'valvula_de_retencao_tipo_pesado_m',
+                                  'valvula_retencao_pesado_m'),
+    'registro_globo_aberto_m': ('registro_de_globo_aberto_m', 'registro_globo_aberto_m'),
+    'registro_gaveta_aberto_m': ('registro_de_gaveta_aberto_m', 'registro_gaveta_aberto_m'),
+    'registro_angulo_aberto_m': ('registro_de_angulo_aberto_m', 'registro_angulo_aberto_m'),
+}
+
+CHAVES_PECAS = [k for k, _ in TIPOS_PECAS]
+_POS_PECA = {k: j for j, k in enumerate(CHAVES_PECAS)}
+# nome de coluna → chave canônica; as próprias chaves têm precedência sobre os aliases
+_CANONICA = {a: k for k in reversed(CHAVES_PECAS) for a in reversed(ALIASES_PECAS[k])}
+_CANONICA.update({k: k for k in CHAVES_PECAS})
+
+
+def chave_canonica(nome):
+    """Chave de TIPOS_PECAS para uma chave ou nome de coluna de tabela (None se desconhecido)."""
+    return _CANONICA.get(str(nome).strip())
+
+
+def colunas_tabela(colunas) -> np.ndarray:
+    """Para cada peça de TIPOS_PECAS, a posição em `colunas` da primeira coluna
+    aceita em ALIASES_PECAS (-1 se a tabela não tem a peça)."""
+    pos = {c: i for i, c in enumerate(colunas)}
+    return np.array([next((pos[a] for a in ALIASES_PECAS[k] if a in pos), -1) for k in CHAVES_PECAS],
+                    dtype=np.int64)
+
+
+class QuantidadesPecas:
+    """Matriz esparsa trecho × peça, indexada pelo id do trecho.
+
+    Guardar por id (e não por posição) mantém as quantidades ao reordenar ou excluir
+    outros trechos. Um trecho presente com todas as quantidades nulas tem L_eq 0;
+    trechos ausentes mantêm o leq_m digitado ou importado.
+    """
+    __slots__ = ('_linhas', '_versao', '_coo')
+
+    def __init__(self):
+        self._linhas = {}
+        self._versao = 0
+        self._coo = None
+
+    def __len__(self) -> int:
+        return len(self._linhas)
+
+    def __contains__(self, id_) -> bool:
+        return str(id_) in self._linhas
+
+    @property
+    def versao(self) -> int:
+        """Incrementa a cada alteração (útil como chave de cache)."""
+        return self._versao
+
+    def ids(self) -> list:
+        return list(self._linhas)
+
+    def linha(self, id_) -> dict:
+        """{chave canônica: quantidade} do trecho (vazio se não houver)."""
+        cols, qtd = self._linhas.get(str(id_), ((), ()))
+        return {CHAVES_PECAS[j]: q for j, q in zip(cols, qtd)}
+
+    def definir(self, id_, quantidades: Mapping):
+        """Substitui as quantidades do trecho. Aceita chaves canônicas ou nomes de
+        coluna das tabelas; valores nulos, negativos ou inválidos são descartados."""
+        acum = {}
+        for nome, q in quantidades.items():
+            k = chave_canonica(nome)
+            if k is None:
+                raise KeyError(f'peça desconhecida: {nome!r}')
+            try:
+                q = float(q)
+            except (TypeError, ValueError):
+                continue
+            if q > 0:
+                acum[_POS_PECA[k]] = acum.get(_POS_PECA[k], 0.0) + q
+        cols = np.fromiter(sorted(acum), dtype=np.int64, count=len(acum))
+        self._linhas[str(id_)] = (cols, np.array([acum[j] for j in cols.tolist()], dtype=float))
+        self._alterado()
+
+    def remover(self, ids):
+        n = len(self._linhas)
+        for i in ids:
+            self._linhas.pop(str(i), None)
+        if len(self._linhas) != n:
+            self._alterado()
+
+    def podar(self, posicao):
+        """Remove os trechos cujo id não existe mais (`posicao(id)` devolve None)."""
+        self.remover([i for i in self._linhas if posicao(i) is None])
+
+    def coo(self):
+        """(ids, linha, coluna, quantidade): `ids` dos trechos presentes e as
+        entradas não nulas, com `linha` indexando `ids`. Em cache até a próxima alteração."""
+        if self._coo is None:
+            ids = list(self._linhas)
+            partes = list(self._linhas.values())
+            tam = np.fromiter((c.size for c, _ in partes), dtype=np.int64, count=len(partes))
+            lin = np.repeat(np.arange(len(ids), dtype=np.int64), tam)
+            col = np.concatenate([c for c, _ in partes]) if partes else np.zeros(0, dtype=np.int64)
+            qtd = np.concatenate([q for _, q in partes]) if partes else np.zeros(0)
+            self._coo = (ids, lin, col, qtd)
+        return self._coo
+
+    def triplas(self) -> list:
+        """[(id, chave canônica, quantidade), ...] para gravar em projetos; trechos
+        presentes sem nenhuma peça entram como (id, None, 0.0)."""
+        out = []
+        for id_, (cols, qtd) in self._linhas.items():
+            if cols.size:
+                out.extend((id_, CHAVES_PECAS[j], q) for j, q in zip(cols.tolist(), qtd.tolist()))
+            else:
+                out.append((id_, None, 0.0))
+        return out
+
+    @classmethod
+    def from_triplas(cls, triplas) -> 'QuantidadesPecas':
+        """Inverso de `triplas` (aceita também listas, como vêm do JSON)."""
+        por_id = {}
+        for id_, chave, q in triplas:
+            linha = por_id.setdefault(str(id_), {})
+            if chave is not None:
+                linha[chave] = linha.get(chave, 0.0) + float(q)
+        quant = cls()
+        for id_, linha in por_id.items():
+            quant.definir(id_, linha)
+        return quant
+
+    def _alterado(self):
+        self._versao += 1
+        self._coo = None
+
+
+def _entradas(quantidades: QuantidadesPecas, posicao, n: int):
+    """(com_pecas (n,), linha, coluna, quantidade) das entradas não nulas cujos
+    trechos existem entre as n linhas."""
+    ids, lin, col, qtd = quantidades.coo()
+    pos = np.array([-1 if p is None else p for p in map(posicao, ids)], dtype=np.int64)
+    ok = (pos >= 0) & (pos < n)
+    com = np.zeros(n, dtype=bool)
+    com[pos[ok]] = True
+    p = pos[lin]
+    v = (p >= 0) & (p < n)
+    return com, p[v], col[v], qtd[v]
+
+
+def leq_trechos(quantidades: QuantidadesPecas, posicao, dn_mm, indice):
+    """L_eq (m) de todos os trechos com peças cadastradas, em um passo.
+
+    `posicao(id)` dá a linha do trecho (ou None), `dn_mm` os DNs de todas as N
+    linhas e `indice` o IndiceDN da tabela do material (`nearest_many` e
+    `canonica`, a matriz DN × TIPOS_PECAS). Devolve (leq (N,), com_pecas (N,)):
+    só as linhas com `com_pecas` devem ter leq_m substituído.
+    """
+    dn = np.atleast_1d(np.asarray(dn_mm, dtype=float))
+    n = dn.size
+    com, p, col, qtd = _entradas(quantidades, posicao, n)
+    if indice.empty or not p.size:
+        return np.zeros(n), com
+    linha_dn = indice.nearest_many(dn[p])
+    return np.bincount(p, weights=qtd * indice.canonica[linha_dn, col], minlength=n), com
+
+
+def leq_candidatos(quantidades: QuantidadesPecas, posicao, n: int, indice) -> np.ndarray:
+    """L_eq (m) de cada trecho com peças em cada DN da tabela (`indice.de_mm`):
+    matriz (n, n_dn), uma coluna = Q · T[d, :]. Linhas sem peças ficam NaN (o
+    chamador mantém para elas o leq_m informado). Serve de `leq_candidatos` a
+    `dimensionar_dn` com `diametros=indice.de_mm`."""
+    com, p, col, qtd = _entradas(quantidades, posicao, n)
+    out = np.full((n, indice.de_mm.size), np.nan)
+    out[com] = 0.0
+    for d in range(indice.de_mm.size):
+        out[:, d][com] = np.bincount(p, weights=qtd * indice.canonica[d, col], minlength=n)[com]
+    return out
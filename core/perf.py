@@ -0,0 +1,174 @@
+"""Instrumentação por etapas (spans) e captura opcional de perfil.
+
+`Rastreador.span(nome)` mede um bloco com `time.perf_counter` e emite um registro
+estruturado (JSON) no logger 'spaf.perf'. Desativado, `span` devolve sempre o
+mesmo gerenciador de contexto nulo — sem relógio, sem alocação — de modo que a
+instrumentação pode ficar no código em definitivo.
+
+`CapturaPerfil` liga cProfile (e, opcionalmente, tracemalloc) durante uma
+execução do script e gera um relatório em texto e um .prof (pstats) para download.
+"""
+import cProfile
+import io
+import json
+import logging
+import marshal
+import pstats
+import time
+import tracemalloc
+
+
+logger = logging.getLogger('spaf.perf')
+
+RESUMO_COLS = ['span', 'nivel', 'chamadas', 'total_ms', 'max_ms', 'inicio_ms']
+
+
+class _SpanNulo:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def anotar(self, **campos):
+        pass
+
+
+_NULO = _SpanNulo()
+
+
+class _Span:
+    __slots__ = ('_r', '_nome', '_campos', '_nivel', '_t0')
+
+    def __init__(self, rastreador, nome, campos):
+        self._r = rastreador
+        self._nome = nome
+        self._campos = campos
+
+    def __enter__(self):
+        pilha = self._r._pilha
+        self._nivel = len(pilha)
+        pilha.append(self._nome)
+        self._t0 = time.perf_counter()
+        return self
+
+    def anotar(self, **campos):
+        """Acrescenta campos ao registro (ex.: nº de trechos calculado dentro do bloco)."""
+        self._campos.update(campos)
+
+    def __exit__(self, tipo, exc, tb):
+        dur = time.perf_counter() - self._t0
+        self._r._pilha.pop()
+        self._r._registrar(self._nome, self._nivel, self._t0, dur, self._campos, tipo)
+        return False
+
+
+class Rastreador:
+    """Coleta os spans de uma execução (rerun) do app."""
+
+    def __init__(self, ativo: bool = False):
+        self.ativo = bool(ativo)
+        self.execucao = 0
+        self.registros = []
+        self._pilha = []
+        self._t_exec = time.perf_counter()
+
+    def span(self, nome: str, **campos):
+        """Gerenciador de contexto que mede o bloco (nulo se desativado)."""
+        if not self.ativo:
+            return _NULO
+        return _Span(self, nome, campos)
+
+    def nova_execucao(self):
+        """Descarta os spans da execução anterior e zera o relógio relativo."""
+        self.execucao += 1
+        self.registros = []
+        self._pilha = []
+        self._t_exec = time.perf_counter()
+
+    def _registrar(self, nome, nivel, t0, dur, campos, erro):
+        reg = {'execucao': self.execucao, 'span': nome, 'pai': self._pilha[-1] if self._pilha else None,
+               'nivel': nivel, 'inicio_ms': round((t0 - self._t_exec) * 1e3, 3),
+               'duracao_ms': round(dur * 1e3, 3), **campos}
+        if erro is not None:
+            reg['erro'] = erro.__name__
+        self.registros.append(reg)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps(reg, ensure_ascii=False, default=str), extra={'perf': reg})
+
+    def resumo(self) -> 'pd.DataFrame':
+        """Uma linha por span (na ordem da 1ª ocorrência): chamadas, total e máximo."""
+        import pandas as pd
+
+        if not self.registros:
+            return pd.DataFrame(columns=RESUMO_COLS)
+        df = pd.DataFrame(self.registros)
+        g = df.groupby('span', sort=False).agg(nivel=('nivel', 'min'), chamadas=('duracao_ms', 'size'),
+                                               total_ms=('duracao_ms', 'sum'), max_ms=('duracao_ms', 'max'),
+                                               inicio_ms=('inicio_ms', 'min'))
+        return g.reset_index()[RESUMO_COLS]
+
+
+def habilitar_log(stream=None, nivel=logging.INFO):
+    """Liga a saída dos registros de span (uma linha JSON por span) em `stream`."""
+    if not any(getattr(h, '_spaf_perf', False) for h in logger.handlers):
+        h = logging.StreamHandler(stream)
+        h.setFormatter(logging.Formatter('%(message)s'))
+        h._spaf_perf = True
+        logger.addHandler(h)
+    logger.setLevel(nivel)
+    return logger
+
+
+class CapturaPerfil:
+    """cProfile + tracemalloc de uma execução; `parar` pode ser chamado mais de uma vez."""
+
+    def __init__(self, memoria: bool = True, top: int = 40):
+        self.memoria = memoria
+        self.top = top
+        self._prof = None
+        self._mem_propria = False
+        self._t0 = None
+        self.relatorio = None        # texto (pstats + tracemalloc)
+        self.prof_bytes = None       # formato pstats (snakeviz, pstats.Stats)
+
+    def iniciar(self):
+        if self.memoria and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._mem_propria = True
+        self._prof = cProfile.Profile()
+        try:
+            self._prof.enable()
+        except ValueError:           # outro profiler já ativo nesta thread
+            self._prof = None
+        self._t0 = time.perf_counter()
+        return self
+
+    @property
+    def ativa(self) -> bool:
+        return self._t0 is not None and self.relatorio is None
+
+    def parar(self) -> str:
+        if not self.ativa:
+            return self.relatorio or ''
+        dur = time.perf_counter() - self._t0
+        out = io.StringIO()
+        out.write(f'Execução perfilada: {dur * 1e3:.1f} ms\n\n')
+        if self._prof is not None:
+            self._prof.disable()
+            self._prof.create_stats()
+            self.prof_bytes = marshal.dumps(self._prof.stats)
+            pstats.Stats(self._prof, stream=out).strip_dirs().sort_stats('cumulative').print_stats(self.top)
+        else:
+            out.write('(cProfile indisponível: outro profiler ativo)\n')
+        if self._mem_propria:
+            snap = tracemalloc.take_snapshot()
+            atual, pico = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            out.write(f'\nMemória (tracemalloc): atual {atual / 2**20:.1f} MiB, pico {pico / 2**20:.1f} MiB\n')
+            for est in snap.statistics('lineno')[:self.top]:
+                out.write(f'{est}\n')
+        self.relatorio = out.getvalue()
+        return self.relatorio
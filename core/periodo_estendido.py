@@ -0,0 +1,159 @@
+"""Simulação de período estendido: 24 h de demanda variável com o nível do
+reservatório oscilando entre H_min e H_max.
+
+A demanda de cada instante é a vazão de projeto (Q = k·Peso^exp) multiplicada
+pelo fator m(t) de uma curva diária. Como J = A·Q^n, a perda de cada trecho escala
+com m(t)^n e a pressão fica separável em tempo × trecho:
+
+    p_out[t, i] = γ·h(t) + S_disp[i] − m(t)^n · S_hf[i]
+
+onde S_disp e S_hf são as somas de p_disp e de h_f (contínua + localizada, na
+vazão de projeto) ao longo do caminho Entrada → i. Basta uma propagação pela
+árvore; a matriz T × N é avaliada por broadcasting, em lotes de instantes para
+limitar a memória.
+
+O nível h(t) evolui pelo balanço do reservatório: entrada constante (boia fecha
+em H_max) menos a vazão que sai pelos trechos da Entrada.
+"""
+from typing import Mapping
+
+import numpy as np
+
+from .hydraulics import KPA_PER_M, fator_gradiente, to_float_array
+from .network import RedeArvore, acumular_pesos, build_network, propagar_pressoes
+
+# Fatores horários típicos de consumo residencial (0h..23h), relativos à vazão de projeto
+PADRAO_RESIDENCIAL = np.array([
+    0.10, 0.08, 0.07, 0.07, 0.10, 0.30, 0.75, 1.00, 0.80, 0.55, 0.50, 0.60,
+    0.70, 0.60, 0.45, 0.40, 0.45, 0.60, 0.85, 1.00, 0.85, 0.60, 0.35, 0.18,
+])
+
+
+def multiplicadores(padrao, passo_min: float = 60.0) -> tuple:
+    """(t em horas, m(t)) para um dia com passo `passo_min`; o padrão (P valores
+    cobrindo 24 h, ex.: 24 horários ou 96 de 15 min) é mantido constante em cada intervalo."""
+    padrao = np.asarray(padrao, dtype=float).ravel()
+    if padrao.size == 0:
+        raise ValueError('padrão de demanda vazio')
+    if passo_min <= 0:
+        raise ValueError('passo deve ser positivo')
+    t_h = np.arange(0.0, 24.0, passo_min / 60.0)
+    idx = np.minimum((t_h * padrao.size / 24.0).astype(np.int64), padrao.size - 1)
+    return t_h, np.maximum(padrao[idx], 0.0)
+
+
+def niveis_reservatorio(vazao_saida_l_s, dt_s: float, *, h_ini: float, h_min: float, h_max: float,
+                        area_m2: float, vazao_entrada_l_s: float = 0.0):
+    """Nível (m) no início de cada passo e marcação de reservatório vazio.
+
+    h[t+1] = h[t] + (Q_entrada − Q_saida[t])·dt / área, limitado a H_max (boia) e
+    a H_min (sem água útil: a demanda não é atendida integralmente)."""
+    q = np.asarray(vazao_saida_l_s, dtype=float)
+    h = np.empty(q.size)
+    vazio = np.zeros(q.size, dtype=bool)
+    nivel = float(np.clip(h_ini, h_min, h_max))
+    fator = dt_s / 1000.0 / area_m2 if area_m2 > 0 else 0.0
+    for t, qs in enumerate(q.tolist()):          # recorrência escalar: T passos, custo desprezível
+        h[t] = nivel
+        vazio[t] = nivel <= h_min and qs > vazao_entrada_l_s
+        nivel = min(max(nivel + (vazao_entrada_l_s - qs) * fator, h_min), h_max)
+    return h, vazio
+
+
+def simular_periodo(colunas: Mapping, padrao=PADRAO_RESIDENCIAL, *, material, modelo_perda, k, exp,
+                    c=None, acumular_peso=False, passo_min: float = 60.0, h_ini: float, h_min: float,
+                    h_max: float, area_m2: float, vazao_entrada_l_s: float = 0.0,
+                    rede: RedeArvore = None, lote: int = 64, guardar_pressoes: bool = False) -> dict:
+    """Pressões de todos os trechos em todos os instantes do dia.
+
+    Devolve séries por instante (t_h, multiplicador, nivel_m, vazao_saida, reservatório
+    vazio, p_out mínimo, trecho crítico, nº de trechos abaixo de p_min_ref), resumos por
+    trecho (p_out mínimo e hora em que ocorre, horas abaixo de p_min_ref) e a matriz
+    `abaixo_por_hora` (24 × N, True se o trecho ficou abaixo de p_min_ref em algum
+    instante daquela hora). Com `guardar_pressoes`, inclui também p_out (T × N).
+    """
+    if rede is None:
+        rede = build_network(colunas['de_no'], colunas['para_no'])
+    N = rede.n
+    peso = to_float_array(colunas['peso_trecho'])
+    if acumular_peso:
+        peso = acumular_pesos(rede, peso)
+    Q = k * np.maximum(peso, 0.0) ** exp
+    A, n = fator_gradiente(colunas['dn_mm'], material, modelo_perda, c)
+    hf = A * Q ** n * (to_float_array(colunas['comp_real_m']) + to_float_array(colunas['leq_m']))
+    p_disp = KPA_PER_M * to_float_array(colunas['dz_io_m'])
+    p_min = to_float_array(colunas['p_min_ref_kPa']) if 'p_min_ref_kPa' in colunas else np.zeros(N)
+    _, S_disp = propagar_pressoes(rede, p_disp, 0.0)
+    _, S_hf = propagar_pressoes(rede, hf, 0.0)
+
+    t_h, m = multiplicadores(padrao, passo_min)
+    T = t_h.size
+    q_saida = m * Q[rede.raizes].sum()
+    nivel, vazio = niveis_reservatorio(q_saida, passo_min * 60.0, h_ini=h_ini, h_min=h_min, h_max=h_max,
+                                       area_m2=area_m2, vazao_entrada_l_s=vazao_entrada_l_s)
+    p0 = nivel * KPA_PER_M
+    f = m ** n
+    hora = t_h.astype(np.int64) % 24
+
+    # só os trechos alcançáveis a partir da Entrada (os demais ficam NaN / sem violação)
+    val = np.flatnonzero(~np.isnan(S_disp))
+    sd, sh, pm = S_disp[val], S_hf[val], p_min[val]
+
+    out = {
+        't_h': t_h, 'multiplicador': m, 'nivel_m': nivel, 'vazao_saida (L/s)': q_saida,
+        'reservatorio_vazio': vazio,
+        'p_out_min (kPa)': np.full(T, np.nan),
+        'trecho_critico': np.full(T, -1, dtype=np.int64),
+        'n_abaixo_p_min': np.zeros(T, dtype=np.int64),
+        'p_out_min_trecho (kPa)': np.full(N, np.nan),
+        'hora_p_out_min': np.full(N, np.nan),
+        'horas_abaixo_p_min': np.zeros(N),
+        'abaixo_por_hora': np.zeros((24, N), dtype=bool),
+    }
+    if guardar_pressoes:
+        out['p_out (kPa)'] = np.full((T, N), np.nan)
+    if not val.size or not T:
+        return out
+
+    # Mínimos e trecho crítico só dependem dos U valores distintos de m(t) (U ≤ nº de
+    # valores do padrão): avaliados em U passadas de N, sem a matriz T × N
+    fu, inv = np.unique(f, return_inverse=True)
+    folga_base = sd - pm
+    minimo = np.full(val.size, np.inf)
+    t_min = np.zeros(val.size, dtype=np.int64)
+    for u, fv in enumerate(fu.tolist()):
+        passos = np.flatnonzero(inv == u)
+        pu = sd - fv * sh
+        crit = int(np.argmin(folga_base - fv * sh))
+        out['trecho_critico'][passos] = val[crit]
+        out['p_out_min (kPa)'][passos] = p0[passos] + pu.min()
+        t_u = passos[np.argmin(p0[passos])]
+        cand = pu + p0[t_u]
+        melhor = cand < minimo
+        minimo[melhor] = cand[melhor]
+        t_min[melhor] = t_u
+
+    # Violações: matriz instante × trecho, em lotes de `lote` instantes
+    n_abaixo = np.zeros(val.size, dtype=np.int64)
+    por_hora = np.zeros((24, val.size), dtype=bool)
+    perda = np.empty((min(lote, T), val.size))
+    for a in range(0, T, lote):
+        b = min(a + lote, T)
+        w = perda[:b - a]
+        np.multiply.outer(f[a:b], sh, out=w)
+        w -= folga_base                                   # f·S_hf − (S_disp − p_min)
+        if guardar_pressoes:
+            out['p_out (kPa)'][a:b, val] = p0[a:b, None] + sd - f[a:b, None] * sh
+        abaixo = w > p0[a:b, None]                        # p_out < p_min_ref
+        out['n_abaixo_p_min'][a:b] = np.count_nonzero(abaixo, axis=1)
+        n_abaixo += np.count_nonzero(abaixo, axis=0)
+        # OR por hora do dia: os instantes do lote estão em ordem, agrupados por hora
+        h_lote = hora[a:b]
+        inicios = np.flatnonzero(np.r_[True, h_lote[1:] != h_lote[:-1]])
+        por_hora[h_lote[inicios]] |= np.logical_or.reduceat(abaixo, inicios, axis=0)
+
+    out['p_out_min_trecho (kPa)'][val] = minimo
+    out['hora_p_out_min'][val] = t_h[t_min]
+    out['horas_abaixo_p_min'][val] = n_abaixo * passo_min / 60.0
+    out['abaixo_por_hora'][:, val] = por_hora
+    return out
@@ -0,0 +1,148 @@
+"""Projeto SPAF fora do Streamlit: esquema da tabela de trechos, leitura do JSON
+exportado pelo app e cálculo dos resultados a partir do bloco `params`."""
+import json
+from pathlib import Path
+
+import pandas as pd
+
+from .network import build_network, calcular_resultados
+
+# Colunas-base (inclui tipo da conexão no início do trecho)
+BASE_COLS = [
+    'id','ramo','ordem','tipo_ini','de_no','para_no',
+    'dn_mm','de_ref_mm','pol_ref',
+    'comp_real_m','dz_io_m','peso_trecho','leq_m','p_min_ref_kPa'
+]
+DTYPES = {
+    'id':'string','ramo':'string','ordem':'Int64','tipo_ini':'string',
+    'de_no':'string','para_no':'string',
+    'dn_mm':'float','de_ref_mm':'float','pol_ref':'string',
+    'comp_real_m':'float','dz_io_m':'float','peso_trecho':'float','leq_m':'float','p_min_ref_kPa':'float'
+}
+# Colunas exibidas/exportadas na aba Resultados
+RESULT_COLS = [
+    'id','ramo','ordem','tipo_ini','de_no','para_no','dn_mm','de_ref_mm',
+    'pol_ref','comp_real_m','dz_io_m','peso_trecho','peso_acum','leq_m','p_min_ref_kPa',
+    'Q (L/s)','v (m/s)','J (kPa/m)','p_in (kPa)','hf_cont (kPa)','hf_loc (kPa)','p_disp (kPa)','p_out (kPa)'
+]
+
+
+def cast_trechos(df: pd.DataFrame) -> pd.DataFrame:
+    """Garante todas as BASE_COLS (faltantes → vazio) e aplica DTYPES quando possível."""
+    df = df.copy()
+    for c in BASE_COLS:
+        if c not in df.columns:
+            df[c] = pd.Series([None]*len(df), index=df.index)
+    for c, t in DTYPES.items():
+        try: df[c] = df[c].astype(t)
+        except Exception: pass
+    return df[BASE_COLS]
+
+
+def load_project_json(path, pecas=False):
+    """Lê um `spaf_projeto.json` (caminho ou arquivo aberto) e devolve (params,
+    trechos só com as colunas de entrada). Com `pecas=True`, acrescenta a lista de
+    triplas (id, peça, quantidade) do bloco 'pecas' (vazia se não houver)."""
+    if hasattr(path, 'read'):
+        proj = json.load(path)
+    else:
+        with open(path, 'r', encoding='utf-8') as fh:
+            proj = json.load(fh)
+    params = proj.get('params') or {}
+    trechos = pd.DataFrame(proj.get('trechos') or {})
+    if pecas:
+        return params, cast_trechos(trechos), [tuple(t) for t in proj.get('pecas') or []]
+    return params, cast_trechos(trechos)
+
+
+def load_project(path, pecas=False):
+    """(params, trechos) de um projeto .json ou .npz (pelo sufixo do nome); com
+    `pecas=True`, (params, trechos, triplas de peças)."""
+    nome = str(getattr(path, 'name', path))
+    if nome.lower().endswith('.npz'):
+        from .projeto_npz import load_project_npz
+        return load_project_npz(path, pecas=pecas)
+    return load_project_json(path, pecas=pecas)
+
+
+def calc_kwargs(params: dict, **overrides) -> dict:
+    """Converte o bloco `params` do JSON nos argumentos de `compute_project`
+    (os de `calcular_resultados` mais 'solucionador', o gravado pelo app ou None).
+
+    `overrides` aceita k, exp, c_pvc, c_fofo, h_oper, modelo_perda, acumular_peso e
+    solucionador (None = manter o valor do projeto).
+    """
+    ov = {k: v for k, v in overrides.items() if v is not None}
+    q = params.get('Q_from_Peso') or {}
+    hw = params.get('HW') or {}
+    res = params.get('reservatorio_m') or {}
+    material = params.get('material', 'PVC')
+    modelo = ov.get('modelo_perda', params.get('modelo_perda', 'Hazen-Williams'))
+    h_oper = res.get('H_oper')
+    if h_oper is None:
+        h_min = float(res.get('H_min', 0.0)); h_max = float(res.get('H_max', 0.0))
+        h_oper = h_min + float(res.get('nivel_operacional', 1.0)) * (h_max - h_min)
+    c = None
+    if modelo == 'Hazen-Williams':
+        if str(material).strip().lower() == 'pvc':
+            c = ov.get('c_pvc', hw.get('C_PVC', 150.0))
+        else:
+            c = ov.get('c_fofo', hw.get('C_FoFo', 130.0))
+    return {
+        'material': material,
+        'modelo_perda': modelo,
+        'k': float(ov.get('k', q.get('k', 0.30))),
+        'exp': float(ov.get('exp', q.get('exp', 0.50))),
+        'c': c,
+        'h_oper': float(ov.get('h_oper', h_oper)),
+        'acumular_peso': bool(ov.get('acumular_peso', q.get('acumular_peso', False))),
+        'solucionador': ov.get('solucionador', params.get('solucionador')),
+    }
+
+
+def compute_project(trechos: pd.DataFrame, kwargs: dict) -> pd.DataFrame:
+    """Tabela de resultados (RESULT_COLS presentes) para um projeto.
+
+    Redes com nós alimentados por mais de um trecho são resolvidas pelo gradiente
+    global (`resolver_malha`), como no app com "Resolver malhas" marcado, salvo
+    se o projeto foi gravado com solucionador 'arvore'. O solucionador usado fica
+    em `t_out.attrs['solucionador']`."""
+    kw = dict(kwargs)
+    pedido = kw.pop('solucionador', None)
+    rede = build_network(trechos['de_no'], trechos['para_no'])
+    if rede.nos_multiplos.size and pedido != 'arvore':
+        from .malha import resolver_malha
+        res, usado = resolver_malha(trechos, rede=rede, **kw).resultados, 'malha'
+    else:
+        res, usado = calcular_resultados(trechos, rede=rede, **kw), 'arvore'
+    t_out = trechos.reset_index(drop=True).assign(**res)
+    t_out = t_out[[c for c in RESULT_COLS if c in t_out.columns]]
+    t_out.attrs['solucionador'] = usado
+    return t_out
+
+
+def resumo_pressoes(t_out: pd.DataFrame) -> dict:
+    """p_out mínimo, trecho crítico e nº de trechos abaixo de p_min_ref."""
+    p_out = pd.to_numeric(t_out['p_out (kPa)'], errors='coerce')
+    p_min = pd.to_numeric(t_out['p_min_ref_kPa'], errors='coerce') if 'p_min_ref_kPa' in t_out else None
+    out = {'n_trechos': int(len(t_out)), 'p_out_min_kPa': None, 'trecho_critico': None, 'n_abaixo_p_min': 0}
+    if p_out.notna().any():
+        i = p_out.idxmin()
+        out['p_out_min_kPa'] = float(p_out[i])
+        out['trecho_critico'] = str(t_out.loc[i, 'id'])
+    if p_min is not None:
+        out['n_abaixo_p_min'] = int((p_out < p_min).sum())
+    return out
+
+
+def project_files(entradas):
+    """Expande arquivos e diretórios (*.json, *.npz) em uma lista ordenada de caminhos."""
+    arquivos = []
+    for e in entradas:
+        p = Path(e)
+        if p.is_dir():
+            arquivos.extend(sorted([*p.glob('*.json'), *p.glob('*.npz')]))
+        else:
+            arquivos.append(p)
+    return arquivos
+
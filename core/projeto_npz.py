@@ -0,0 +1,215 @@
+"""Formato binário colunar de projeto (.npz, versionado).
+
+Cada coluna vira um ou mais arrays NumPy dentro do .npz (sem pickle):
+
+- float: float64 como está (NaN preservado);
+- int (Int64): int64 + máscara de ausentes;
+- str: bytes UTF-8 concatenados (uint8) + offsets em bytes (int64, n+1) + máscara
+  de nulos — o mesmo leiaute de uma coluna `large_string` do Arrow. Com pyarrow
+  instalado, a conversão é feita direto sobre os buffers (sem laço em Python);
+  sem ele, por um caminho NumPy/Python equivalente.
+
+O membro `meta` guarda, em JSON, a versão do formato, o bloco `params` do projeto
+e a lista de colunas (nome, tipo, dtype pandas, se é coluna de entrada). As
+quantidades de peças por trecho, se houver, vão em triplas COO: `pecas_ids`
+(texto, mesmo leiaute), `pecas_col` (posição em `meta['pecas_chaves']`, -1 =
+trecho sem peças) e `pecas_qtd`. Os
+membros são nomeados pelo índice da coluna (`c0`, `c0_off`, ...), porque nomes
+como 'Q (L/s)' não servem como nome de arquivo no zip.
+
+`ProjetoNpz` lê sob demanda: só as colunas pedidas são descomprimidas e
+decodificadas, de modo que carregar apenas BASE_COLS ignora as calculadas.
+"""
+import json
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+except ImportError:  # opcional: só acelera as colunas de texto
+    pa = None
+
+from .projeto import BASE_COLS, DTYPES
+
+FORMATO = 'spaf-npz'
+VERSAO = 1
+
+
+def _tipo_coluna(s: pd.Series) -> str:
+    if pd.api.types.is_bool_dtype(s):
+        return 'bool'
+    if pd.api.types.is_integer_dtype(s):
+        return 'int'
+    if pd.api.types.is_float_dtype(s):
+        return 'float'
+    return 'str'
+
+
+def _codificar(s: pd.Series, tipo: str, prefixo: str) -> dict:
+    if tipo == 'float':
+        return {prefixo: s.to_numpy(dtype=np.float64, na_value=np.nan)}
+    if tipo == 'bool':
+        return {prefixo: s.to_numpy(dtype=bool)}
+    if tipo == 'int':
+        nulo = s.isna().to_numpy()
+        return {prefixo: s.fillna(0).to_numpy(dtype=np.int64), prefixo + '_nulo': nulo}
+    dados, off, nulo = texto_utf8(s)
+    return {prefixo: dados, prefixo + '_off': off, prefixo + '_nulo': nulo}
+
+
+def texto_utf8(s: pd.Series):
+    """(dados uint8, offsets int64, nulos bool) de uma coluna de texto, no leiaute
+    `large_string` do Arrow. Com pyarrow, vem direto dos buffers; sem ele (ou com
+    tipos misturados na coluna), codifica valor a valor com `str`."""
+    if pa is not None:
+        try:
+            a = pa.array(s, type=pa.large_string())
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            a = None
+        if a is not None:
+            if isinstance(a, pa.ChunkedArray):
+                a = a.combine_chunks()
+            n = len(a)
+            if not n:
+                return np.zeros(0, np.uint8), np.zeros(1, np.int64), np.zeros(0, bool)
+            bufs = a.buffers()
+            off = np.frombuffer(bufs[1], dtype=np.int64)[a.offset:a.offset + n + 1]
+            dados = np.frombuffer(bufs[2], dtype=np.uint8)[off[0]:off[-1]] if bufs[2] is not None \
+                else np.zeros(0, np.uint8)
+            return dados, off - off[0], a.is_null().to_numpy(zero_copy_only=False)
+    vals = s.to_numpy(dtype=object)
+    nulo = pd.isna(vals)
+    brutos = [b'' if z else str(v).encode('utf-8') for v, z in zip(vals.tolist(), nulo.tolist())]
+    off = np.zeros(len(brutos) + 1, dtype=np.int64)
+    np.cumsum(np.fromiter(map(len, brutos), dtype=np.int64, count=len(brutos)), out=off[1:])
+    return np.frombuffer(b''.join(brutos), dtype=np.uint8), off, nulo
+
+
+def _decodificar_texto(dados, off, nulo, objeto=False):
+    if pa is not None:
+        n = len(nulo)
+        validos = pa.py_buffer(np.packbits(~nulo, bitorder='little')) if nulo.any() else None
+        a = pa.LargeStringArray.from_buffers(n, pa.py_buffer(off), pa.py_buffer(dados), validos)
+        return a.to_numpy(zero_copy_only=False) if objeto else pd.array(a, dtype='string')
+    raw = dados.tobytes()
+    return np.array([None if z else raw[a:b].decode('utf-8')
+                     for a, b, z in zip(off[:-1].tolist(), off[1:].tolist(), nulo.tolist())], dtype=object)
+
+
+def save_project_npz(destino, trechos: pd.DataFrame, params: dict = None, comprimir: bool = False,
+                     pecas=None):
+    """Grava `trechos` (BASE_COLS e, se houver, colunas de resultado) e `params` em
+    `destino` (caminho ou arquivo binário). `pecas` são as triplas (id, peça,
+    quantidade) de `QuantidadesPecas.triplas`. Sem compressão por padrão: o .npz é
+    lido/gravado na velocidade da memória; `comprimir=True` reduz o tamanho."""
+    arrays, colunas = {}, []
+    for i, c in enumerate(trechos.columns):
+        s = trechos[c]
+        tipo = _tipo_coluna(s)
+        arrays.update(_codificar(s, tipo, f'c{i}'))
+        colunas.append({'nome': str(c), 'tipo': tipo, 'dtype': str(s.dtype), 'base': c in BASE_COLS})
+    meta = {'formato': FORMATO, 'versao': VERSAO, 'n': int(len(trechos)),
+            'params': params or {}, 'colunas': colunas}
+    if pecas:
+        ids, chaves, qtd = zip(*pecas)
+        meta['pecas_chaves'] = sorted({k for k in chaves if k is not None})
+        pos = {k: j for j, k in enumerate(meta['pecas_chaves'])}
+        arrays.update(_codificar(pd.Series(ids, dtype=object), 'str', 'pecas_ids'))
+        arrays['pecas_col'] = np.array([-1 if k is None else pos[k] for k in chaves], dtype=np.int64)
+        arrays['pecas_qtd'] = np.asarray(qtd, dtype=np.float64)
+    arrays['meta'] = np.frombuffer(json.dumps(meta, ensure_ascii=False, default=str).encode('utf-8'), dtype=np.uint8)
+    (np.savez_compressed if comprimir else np.savez)(destino, **arrays)
+
+
+class ProjetoNpz:
+    """Projeto .npz aberto para leitura; colunas decodificadas sob demanda (e em cache)."""
+
+    def __init__(self, origem):
+        self._npz = np.load(origem, allow_pickle=False)
+        try:
+            meta = json.loads(self._npz['meta'].tobytes().decode('utf-8'))
+        except KeyError:
+            raise ValueError('arquivo .npz não é um projeto SPAF (sem metadados)') from None
+        if meta.get('formato') != FORMATO:
+            raise ValueError(f"formato desconhecido: {meta.get('formato')!r}")
+        if int(meta.get('versao', 0)) > VERSAO:
+            raise ValueError(f"projeto gravado na versão {meta['versao']} do formato; "
+                             f'esta versão do SPAF lê até a {VERSAO}')
+        self.meta = meta
+        self.versao = int(meta['versao'])
+        self.params = meta.get('params') or {}
+        self.n = int(meta['n'])
+        self._pos = {c['nome']: i for i, c in enumerate(meta['colunas'])}
+        self._cache = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def close(self):
+        self._npz.close()
+
+    @property
+    def colunas(self) -> list:
+        return [c['nome'] for c in self.meta['colunas']]
+
+    @property
+    def colunas_base(self) -> list:
+        return [c['nome'] for c in self.meta['colunas'] if c['base']]
+
+    def coluna(self, nome: str) -> pd.Series:
+        """Uma coluna com o dtype original."""
+        if nome not in self._cache:
+            i = self._pos[nome]
+            info = self.meta['colunas'][i]
+            p = f'c{i}'
+            if info['tipo'] in ('float', 'bool'):
+                vals = self._npz[p]
+            elif info['tipo'] == 'int':
+                vals = pd.arrays.IntegerArray(self._npz[p], self._npz[p + '_nulo'])
+            else:
+                vals = _decodificar_texto(self._npz[p], self._npz[p + '_off'], self._npz[p + '_nulo'],
+                                          objeto=info['dtype'] == 'object')
+            s = pd.Series(vals, name=nome, copy=False)
+            if str(s.dtype) != info['dtype']:
+                try:
+                    s = s.astype(info['dtype'])
+                except (TypeError, ValueError):
+                    pass
+            self._cache[nome] = s
+        return self._cache[nome]
+
+    def frame(self, colunas=None) -> pd.DataFrame:
+        """DataFrame com as colunas pedidas (padrão: todas), na ordem gravada."""
+        nomes = self.colunas if colunas is None else [c for c in colunas if c in self._pos]
+        return pd.DataFrame({c: self.coluna(c) for c in nomes}, columns=nomes)
+
+    def pecas(self) -> list:
+        """Triplas (id, peça, quantidade) gravadas com o projeto (vazia se não houver)."""
+        chaves = self.meta.get('pecas_chaves')
+        if chaves is None:
+            return []
+        ids = _decodificar_texto(self._npz['pecas_ids'], self._npz['pecas_ids_off'],
+                                 self._npz['pecas_ids_nulo'], objeto=True)
+        col, qtd = self._npz['pecas_col'].tolist(), self._npz['pecas_qtd'].tolist()
+        return [(i, chaves[j] if j >= 0 else None, q) for i, j, q in zip(ids.tolist(), col, qtd)]
+
+    def trechos(self) -> pd.DataFrame:
+        """Só as colunas de entrada (BASE_COLS, com DTYPES), sem as calculadas."""
+        df = self.frame(BASE_COLS)
+        for c in BASE_COLS:
+            if c not in df.columns:
+                df[c] = pd.Series([None] * self.n, dtype=DTYPES.get(c, 'float'))
+        return df[BASE_COLS]
+
+
+def load_project_npz(origem, colunas=BASE_COLS, pecas=False):
+    """(params, trechos) de um .npz; `colunas=None` carrega também as calculadas.
+    Com `pecas=True`, acrescenta as triplas de peças (`ProjetoNpz.pecas`)."""
+    with ProjetoNpz(origem) as proj:
+        df = proj.trechos() if colunas is BASE_COLS else proj.frame(colunas)
+        return (proj.params, df, proj.pecas()) if pecas else (proj.params, df)
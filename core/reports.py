@@ -1,37 +1,318 @@
+import numpy as np
 import pandas as pd
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
-from reportlab.lib.units import cm
+
+# reportlab e xlsxwriter só são importados na primeira exportação (import de core.reports
+# fica leve para scripts e processos de trabalho que não geram relatórios)
+_CM = 72.0 / 2.54           # reportlab.lib.units.cm
+
 
 def export_to_excel(path_or_buf, trechos_calc: pd.DataFrame, params: dict):
     with pd.ExcelWriter(path_or_buf, engine='xlsxwriter') as xl:
         trechos_calc.to_excel(xl, sheet_name='Trechos', index=False)
-        pd.DataFrame({k:[v] for k,v in params.items()}).to_excel(xl, sheet_name='Parametros', index=False)
-
-def export_to_pdf(path_or_buf, trechos_calc: pd.DataFrame, params: dict):
-    if hasattr(path_or_buf, 'write'):
-        from reportlab.pdfgen.canvas import Canvas
-        c = Canvas(path_or_buf, pagesize=A4)
-    else:
-        c = canvas.Canvas(path_or_buf, pagesize=A4)
-    w, h = A4
-    y = h - 2*cm
-    c.setFont('Helvetica-Bold', 12)
-    c.drawString(2*cm, y, 'Relatório – Dimensionamento de Água Fria (Simplificado)')
-    y -= 0.8*cm
-    c.setFont('Helvetica', 9)
-    for k, v in params.items():
-        c.drawString(2*cm, y, f'{k}: {v}'); y -= 0.5*cm
-        if y < 3*cm:
-            c.showPage(); y = h - 2*cm
-    y -= 0.3*cm
-    c.setFont('Helvetica-Bold', 10)
-    c.drawString(2*cm, y, 'Trechos (resumo)')
-    y -= 0.6*cm; c.setFont('Helvetica', 8)
-    cols = trechos_calc.columns.tolist()[:12]
-    for _, row in trechos_calc.iterrows():
-        line = ', '.join([f'{col}={row[col]}' for col in cols])
-        c.drawString(2*cm, y, line[:120]); y -= 0.4*cm
-        if y < 3*cm:
-            c.showPage(); y = h - 2*cm
-    c.save()
+        pd.DataFrame({k: [v] for k, v in _flatten(params).items()}).to_excel(xl, sheet_name='Parametros', index=False)
+
+
+RESUMO_COLS = ['projeto', 'ramo', 'aba', 'n_trechos', 'p_out_min_kPa', 'p_out_max_kPa',
+               'trecho_critico', 'n_abaixo_p_min']
+_ABA_INVALIDOS = str.maketrans({c: '_' for c in '[]:*?/\\'})
+
+
+def _nome_aba(base: str, usados: set) -> str:
+    """Nome de aba válido no Excel (≤ 31 caracteres, sem []:*?/\\), único no workbook."""
+    nome = (str(base).translate(_ABA_INVALIDOS).strip("'") or 'Trechos')[:31]
+    i, cand = 1, nome
+    while cand.lower() in usados:
+        i += 1
+        suf = f'~{i}'
+        cand = nome[:31 - len(suf)] + suf
+    usados.add(cand.lower())
+    return cand
+
+
+def _celulas(valores):
+    # NaN/NA viram célula vazia; tipos NumPy viram nativos
+    out = []
+    for v in valores:
+        if v is None or v is pd.NA or (isinstance(v, float) and v != v):
+            out.append(None)
+        elif isinstance(v, np.generic):
+            out.append(v.item())
+        else:
+            out.append(v)
+    return out
+
+
+def export_workbook(path_or_buf, projetos, bloco: int = 5000) -> pd.DataFrame:
+    """Grava um ou vários projetos em um único .xlsx no modo `constant_memory` do
+    xlsxwriter: uma aba por (projeto, ramo), mais 'Resumo' (uma linha por ramo) e
+    'Parametros' (params achatados, chave → valor).
+
+    `projetos` é um iterável de (nome, trechos_calc, params) — pode ser um gerador,
+    de modo que só um projeto fica em memória por vez. Devolve o resumo gravado.
+    """
+    import xlsxwriter
+
+    wb = xlsxwriter.Workbook(path_or_buf, {'constant_memory': True})
+    negrito = wb.add_format({'bold': True, 'bg_color': '#dde4ee'})
+    usados = set()
+    ws_res = wb.add_worksheet(_nome_aba('Resumo', usados))
+    ws_par = wb.add_worksheet(_nome_aba('Parametros', usados))
+    ws_res.write_row(0, 0, RESUMO_COLS, negrito)
+    ws_par.write_row(0, 0, ['projeto', 'chave', 'valor'], negrito)
+    lin_res = lin_par = 1
+    resumo = []
+    for nome, trechos_calc, params in projetos:
+        nome = str(nome)
+        for k, v in _flatten(params).items():
+            ws_par.write_row(lin_par, 0, _celulas([nome, k, str(v) if isinstance(v, (list, tuple, set)) else v]))
+            lin_par += 1
+        pr = _pressoes(trechos_calc)
+        cols = [str(c) for c in trechos_calc.columns]
+        for ramo, pos in pr.groupby('ramo', sort=True).indices.items():
+            sub = trechos_calc.iloc[pos]
+            if 'ordem' in sub.columns:
+                sub = sub.sort_values('ordem', kind='stable')
+            aba = _nome_aba(f'{nome}-{ramo}' if ramo else nome, usados)
+            ws = wb.add_worksheet(aba)
+            ws.write_row(0, 0, cols, negrito)
+            ws.freeze_panes(1, 0)
+            r = 1
+            for a in range(0, len(sub), bloco):
+                for row in sub.iloc[a:a + bloco].itertuples(index=False, name=None):
+                    ws.write_row(r, 0, _celulas(row))
+                    r += 1
+            p = pr.iloc[pos]
+            validos = p['p_out'].dropna()
+            crit = None
+            if not validos.empty:
+                i = validos.idxmin()
+                crit = trechos_calc.loc[i, 'id'] if 'id' in trechos_calc.columns else i
+            linha = [nome, ramo, aba, len(sub),
+                     validos.min() if not validos.empty else None,
+                     validos.max() if not validos.empty else None,
+                     None if crit is None else str(crit), int(p['abaixo'].sum())]
+            ws_res.write_row(lin_res, 0, _celulas(linha))
+            lin_res += 1
+            resumo.append(dict(zip(RESUMO_COLS, linha)))
+    wb.close()
+    return pd.DataFrame(resumo, columns=RESUMO_COLS)
+
+
+def _pressoes(df: pd.DataFrame) -> pd.DataFrame:
+    """Colunas auxiliares dos resumos: ramo (str), p_out e se está abaixo de p_min_ref."""
+    idx = df.index
+    ramo = df['ramo'].fillna('').astype(str) if 'ramo' in df.columns else pd.Series('', index=idx)
+    p_out = pd.to_numeric(df['p_out (kPa)'], errors='coerce') if 'p_out (kPa)' in df.columns \
+        else pd.Series(np.nan, index=idx)
+    p_min = pd.to_numeric(df['p_min_ref_kPa'], errors='coerce') if 'p_min_ref_kPa' in df.columns \
+        else pd.Series(np.nan, index=idx)
+    return pd.DataFrame({'ramo': ramo, 'p_out': p_out, 'abaixo': p_out < p_min}, index=idx)
+
+
+# Colunas do relatório PDF: (coluna, rótulo, largura em caracteres, formato).
+# As ausentes no DataFrame são ignoradas. As de texto (formato None) crescem até
+# o maior valor do DataFrame, dentro da largura útil da página (ver `_larguras`).
+PDF_COLS = [
+    ('id', 'id', 10, None), ('de_no', 'de', 8, None), ('para_no', 'para', 8, None),
+    ('dn_mm', 'DN (mm)', 8, '{:.0f}'), ('comp_real_m', 'L (m)', 8, '{:.2f}'),
+    ('leq_m', 'L_eq (m)', 9, '{:.2f}'), ('peso_trecho', 'Peso', 8, '{:.1f}'),
+    ('Q (L/s)', 'Q (L/s)', 8, '{:.3f}'), ('v (m/s)', 'v (m/s)', 8, '{:.2f}'),
+    ('J (kPa/m)', 'J (kPa/m)', 10, '{:.3f}'), ('p_in (kPa)', 'p_in (kPa)', 11, '{:.2f}'),
+    ('p_out (kPa)', 'p_out (kPa)', 12, '{:.2f}'), ('p_min_ref_kPa', 'p_min (kPa)', 12, '{:.1f}'),
+]
+
+_FONTE_TAB = 'Courier'     # fonte monoespaçada: cada linha da tabela é uma única string
+_TAM_TAB = 7
+_ALT_LINHA = 9.5           # pt
+
+
+def _fmt(v, fmt):
+    if v is None or (isinstance(v, float) and v != v):
+        return ''
+    if fmt is None:
+        return str(v)
+    try:
+        return fmt.format(float(v))
+    except (TypeError, ValueError):
+        return str(v)
+
+
+def _linha_fixa(valores, larguras, alinhar_dir):
+    partes = []
+    for v, w, d in zip(valores, larguras, alinhar_dir):
+        if len(v) > w - 1:
+            v = v[:w - 2] + '…'      # truncamento sempre visível
+        partes.append(' ' + (v.rjust(w - 1) if d else v.ljust(w - 1)))
+    return ''.join(partes)
+
+
+def _larguras(df: pd.DataFrame, nomes, larguras, fmts, total: int) -> list:
+    """Larguras (caracteres) das colunas: as de texto crescem até o maior valor
+    em `df` (+1 de espaçamento); se a soma passar de `total`, as mais largas são
+    limitadas a um teto comum, sem ficar abaixo da largura padrão."""
+    desejada = list(larguras)
+    for i, f in enumerate(fmts):
+        if f is None and nomes[i] in df.columns and len(df):
+            desejada[i] = max(larguras[i], int(df[nomes[i]].astype(str).str.len().max()) + 1)
+
+    def com_teto(teto):
+        return [min(d, max(teto, w)) for d, w in zip(desejada, larguras)]
+
+    if sum(desejada) <= total:
+        return desejada
+    lo, hi = 0, max(desejada)          # maior teto que cabe em `total`
+    while lo < hi:
+        meio = (lo + hi + 1) // 2
+        lo, hi = (meio, hi) if sum(com_teto(meio)) <= total else (lo, meio - 1)
+    return com_teto(lo)
+
+
+def _flatten(d, prefix=''):
+    out = {}
+    for k, v in (d or {}).items():
+        key = f'{prefix}{k}'
+        if isinstance(v, dict):
+            out.update(_flatten(v, key + '.'))
+        else:
+            out[key] = v
+    return out
+
+
+class _PdfPages:
+    """Canvas com cursor vertical, quebra de página automática e tabelas em
+    largura fixa (uma string por linha, grade desenhada por bloco)."""
+    def __init__(self, path_or_buf, pagesize):
+        from reportlab.pdfbase import pdfmetrics
+        from reportlab.pdfgen import canvas
+
+        self.c = canvas.Canvas(path_or_buf, pagesize=pagesize, pageCompression=1)
+        self.w, self.h = pagesize
+        self.margem = 1.5*_CM
+        self.pagina = 1
+        self.y = self.h - self.margem
+        self.larg_car = pdfmetrics.stringWidth('0', _FONTE_TAB, _TAM_TAB)
+
+    def caracteres_por_linha(self) -> int:
+        return int((self.w - 2 * self.margem) // self.larg_car)
+
+    def _rodape(self):
+        self.c.setFont('Helvetica', 7)
+        self.c.drawRightString(self.w - self.margem, 0.8*_CM, f'p. {self.pagina}')
+
+    def nova_pagina(self):
+        self._rodape()
+        self.c.showPage()
+        self.pagina += 1
+        self.y = self.h - self.margem
+
+    def garantir(self, altura):
+        if self.y - altura < self.margem:
+            self.nova_pagina()
+
+    def linhas_livres(self):
+        return int((self.y - self.margem) // _ALT_LINHA)
+
+    def texto(self, txt, fonte='Helvetica', tam=9, passo=0.45*_CM):
+        self.garantir(passo)
+        self.c.setFont(fonte, tam)
+        self.c.drawString(self.margem, self.y - tam, txt)
+        self.y -= passo
+
+    def tabela(self, cabecalho, linhas, larguras, alinhar_dir):
+        """Desenha cabeçalho + linhas (listas de str) a partir do cursor; o chamador
+        garante que cabem na página (ver `linhas_livres`)."""
+        from reportlab.lib import colors
+
+        c, x0 = self.c, self.margem
+        xs = [x0]
+        for w in larguras:
+            xs.append(xs[-1] + w * self.larg_car)
+        n = len(linhas) + 1
+        topo, base = self.y, self.y - n * _ALT_LINHA
+        c.setFillColor(colors.HexColor('#dde4ee'))
+        c.rect(x0, topo - _ALT_LINHA, xs[-1] - x0, _ALT_LINHA, stroke=0, fill=1)
+        c.setFillColor(colors.black)
+        c.setLineWidth(0.25)
+        c.setStrokeColor(colors.grey)
+        c.grid(xs, [topo - i * _ALT_LINHA for i in range(n + 1)])
+        t = c.beginText(x0, topo - _ALT_LINHA + 2.5)
+        t.setFont(_FONTE_TAB, _TAM_TAB, _ALT_LINHA)
+        t.textLine(_linha_fixa(cabecalho, larguras, [False] * len(larguras)))
+        for lin in linhas:
+            t.textLine(_linha_fixa(lin, larguras, alinhar_dir))
+        c.drawText(t)
+        self.y = base - 0.3*_CM
+
+    def tabela_paginada(self, cabecalho, linhas, larguras, alinhar_dir, linhas_por_bloco):
+        """Quebra `linhas` (iterável) em blocos que cabem na página, repetindo o cabeçalho."""
+        buf = []
+        for lin in linhas:
+            buf.append(lin)
+            if len(buf) >= min(linhas_por_bloco, max(self.linhas_livres() - 1, 1)):
+                self.garantir(2 * _ALT_LINHA)
+                self.tabela(cabecalho, buf, larguras, alinhar_dir)
+                buf = []
+                if self.linhas_livres() < 3:
+                    self.nova_pagina()
+        if buf:
+            if self.linhas_livres() < len(buf) + 1:
+                self.nova_pagina()
+            self.tabela(cabecalho, buf, larguras, alinhar_dir)
+
+    def fechar(self):
+        self._rodape()
+        self.c.save()
+
+
+def export_to_pdf(path_or_buf, trechos_calc: pd.DataFrame, params: dict, linhas_por_bloco: int = 50):
+    """Relatório paginado: parâmetros, resumo de pressões e uma seção por ramo com
+    tabelas de até `linhas_por_bloco` linhas (cabeçalho repetido a cada bloco).
+    As linhas são formatadas sob demanda, um bloco por vez."""
+    from reportlab.lib.pagesizes import A4, landscape
+
+    pdf = _PdfPages(path_or_buf, landscape(A4))
+    cols = [col for col in PDF_COLS if col[0] in trechos_calc.columns]
+    nomes = [c for c, _, _, _ in cols]
+    cab = [lab for _, lab, _, _ in cols]
+    fmts = [f for _, _, _, f in cols]
+    larg = _larguras(trechos_calc, nomes, [w for _, _, w, _ in cols], fmts, pdf.caracteres_por_linha())
+    dir_ = [f is not None for f in fmts]
+
+    pdf.texto('Relatório – Dimensionamento de Água Fria (Simplificado)', 'Helvetica-Bold', 12, 0.8*_CM)
+    for k, v in _flatten(params).items():
+        pdf.texto(f'{k}: {v}', tam=8, passo=0.4*_CM)
+
+    # Resumo de pressões (geral e por ramo)
+    pr = _pressoes(trechos_calc)
+    p_out, abaixo = pr['p_out'], pr['abaixo']
+    pdf.y -= 0.3*_CM
+    pdf.texto('Resumo de pressões', 'Helvetica-Bold', 10, 0.6*_CM)
+    if p_out.notna().any():
+        i = p_out.idxmin()
+        crit = trechos_calc.loc[i, 'id'] if 'id' in trechos_calc.columns else i
+        pdf.texto(f'p_out mínimo: {p_out[i]:.2f} kPa (trecho {crit}); '
+                  f'{int(abaixo.sum())} trecho(s) abaixo de p_min_ref.', tam=8)
+    grp = pr.groupby('ramo', sort=True)
+    resumo = grp.agg(n=('p_out', 'size'), pmin=('p_out', 'min'), pmax=('p_out', 'max'), ab=('abaixo', 'sum'))
+    larg_resumo = _larguras(pd.DataFrame({'ramo': resumo.index}), ['ramo', 'n', 'pmin', 'pmax', 'ab'],
+                            [16, 10, 17, 17, 17], [None, '', '', '', ''], pdf.caracteres_por_linha())
+    pdf.tabela_paginada(
+        ['Ramo', 'Trechos', 'p_out mín (kPa)', 'p_out máx (kPa)', 'Abaixo de p_min'],
+        ([str(r), str(int(n)), _fmt(a, '{:.2f}'), _fmt(b, '{:.2f}'), str(int(ab))]
+         for r, n, a, b, ab in resumo.itertuples(name=None)),
+        larg_resumo, [False, True, True, True, True], linhas_por_bloco)
+
+    # Seções por ramo, formatadas em blocos de tamanho fixo
+    for r, pos in grp.indices.items():
+        sub = trechos_calc.iloc[pos]
+        if 'ordem' in sub.columns:
+            sub = sub.sort_values('ordem', kind='stable')
+        pdf.nova_pagina()
+        pdf.texto(f'Ramo {r or "(sem ramo)"} — {len(sub)} trecho(s)', 'Helvetica-Bold', 10, 0.6*_CM)
+
+        def linhas(sub=sub):
+            for a in range(0, len(sub), linhas_por_bloco):
+                for row in sub.iloc[a:a + linhas_por_bloco][nomes].itertuples(index=False, name=None):
+                    yield [_fmt(v, f) for v, f in zip(row, fmts)]
+        pdf.tabela_paginada(cab, linhas(), larg, dir_, linhas_por_bloco)
+    pdf.fechar()
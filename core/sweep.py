@@ -0,0 +1,77 @@
+"""Varredura de parâmetros: avalia a rede inteira para uma grade de cenários
+(nível do reservatório, k/exp de Q = k·Peso^exp e C de Hazen-Williams) como um
+único array trecho × cenário."""
+from itertools import product
+from typing import Mapping
+
+import numpy as np
+
+from .hydraulics import KPA_PER_M, fator_gradiente, to_float_array
+from .network import RedeArvore, acumular_pesos, build_network, propagar_pressoes
+
+
+def grade_cenarios(h_oper, k, exp, c=(None,)) -> dict:
+    """Produto cartesiano das listas de valores → dict de arrays com S cenários."""
+    combos = list(product(np.atleast_1d(h_oper), np.atleast_1d(k), np.atleast_1d(exp),
+                          np.atleast_1d(np.asarray(c, dtype=object))))
+    h, kk, ee, cc = zip(*combos) if combos else ((),) * 4
+    return {
+        'h_oper': np.asarray(h, dtype=float),
+        'k': np.asarray(kk, dtype=float),
+        'exp': np.asarray(ee, dtype=float),
+        'c': np.array([np.nan if v is None else float(v) for v in cc], dtype=float),
+    }
+
+
+def varrer(colunas: Mapping, cenarios: Mapping, *, material, modelo_perda,
+           acumular_peso=False, rede: RedeArvore = None, lote=512) -> dict:
+    """Avalia todos os cenários e devolve, por cenário, o p_out mínimo, a menor folga
+    p_out − p_min_ref_kPa, o trecho crítico (posição da linha) e o nº de trechos abaixo
+    de p_min_ref. Os cenários são processados em lotes de `lote` colunas para limitar
+    a memória a N × lote floats."""
+    if rede is None:
+        rede = build_network(colunas['de_no'], colunas['para_no'])
+    peso = to_float_array(colunas['peso_trecho'])
+    if acumular_peso:
+        peso = acumular_pesos(rede, peso)
+    comp = (to_float_array(colunas['comp_real_m']) + to_float_array(colunas['leq_m']))[:, None]
+    p_disp = (KPA_PER_M * to_float_array(colunas['dz_io_m']))[:, None]
+    p_min = to_float_array(colunas['p_min_ref_kPa'])[:, None] if 'p_min_ref_kPa' in colunas \
+        else np.zeros((rede.n, 1))
+
+    h = np.asarray(cenarios['h_oper'], dtype=float)
+    S = h.size
+    kk = np.broadcast_to(np.asarray(cenarios['k'], dtype=float), (S,))
+    ee = np.broadcast_to(np.asarray(cenarios['exp'], dtype=float), (S,))
+    cc = np.broadcast_to(np.asarray(cenarios.get('c', np.nan), dtype=float), (S,))
+
+    # J = A·Q^n com Q = k·Peso^exp  ⇒  J = A · Peso^(exp·n) · k^n (· C^-n em Hazen-Williams):
+    # só há potências N × (nº de valores distintos de exp), não N × S.
+    A, n = fator_gradiente(colunas['dn_mm'], material, modelo_perda)
+    B = np.maximum(kk, 0.0) ** n
+    if modelo_perda == 'Hazen-Williams':
+        B = np.where(cc > 0.0, B / np.where(cc > 0.0, cc, 1.0) ** n, 0.0)
+    exps, inv = np.unique(ee, return_inverse=True)
+    G = np.maximum(peso, 0.0)[:, None] ** (exps * n)[None, :]
+
+    out = {
+        'p_out_min (kPa)': np.full(S, np.nan),
+        'folga_min (kPa)': np.full(S, np.nan),
+        'trecho_critico': np.full(S, -1, dtype=np.int64),
+        'n_abaixo_p_min': np.zeros(S, dtype=np.int64),
+    }
+    for a in range(0, S, lote):
+        b = min(a + lote, S)
+        J = A[:, None] * G[:, inv[a:b]] * B[None, a:b]
+        _, p_out = propagar_pressoes(rede, p_disp - J * comp, h[a:b] * KPA_PER_M)
+        folga = p_out - p_min
+        valido = ~np.isnan(folga).all(axis=0)
+        if not valido.any():
+            continue
+        cols = np.flatnonzero(valido)
+        crit = np.nanargmin(folga[:, cols], axis=0)
+        out['trecho_critico'][a + cols] = crit
+        out['folga_min (kPa)'][a + cols] = folga[crit, cols]
+        out['p_out_min (kPa)'][a + cols] = np.nanmin(p_out[:, cols], axis=0)
+        out['n_abaixo_p_min'][a:b] = (folga < 0).sum(axis=0)
+    return out
@@ -0,0 +1,119 @@
+"""Cache compartilhado das tabelas de catálogo (L_eq, UC).
+
+Cada CSV é lido uma vez por processo e reaproveitado enquanto o arquivo não mudar
+(chave: caminho + mtime + tamanho). Uma cópia pré-processada em formato binário
+(.npz, sem pickle) fica em `.cache/` ao lado do CSV, de modo que uma partida a
+frio não precisa interpretar o CSV de novo. Os DataFrames devolvidos são
+compartilhados: trate-os como somente leitura.
+"""
+import json
+import os
+import threading
+from hashlib import blake2b
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+CACHE_VERSION = 1
+CACHE_DIRNAME = '.cache'
+
+_MEM = {}
+_VISTOS = set()    # CSVs já lidos neste processo (para invalidar também o disco)
+_LOCK = threading.Lock()
+
+
+def _assinatura(path: Path):
+    st = path.stat()
+    return st.st_mtime_ns, st.st_size
+
+
+def _cache_file(path: Path) -> Path:
+    base = os.environ.get('SPAF_CACHE_DIR')
+    pasta = Path(base) if base else path.parent / CACHE_DIRNAME
+    tag = blake2b(str(path).encode('utf-8'), digest_size=6).hexdigest()
+    return pasta / f'{path.stem}.{tag}.npz'
+
+
+def _salvar_npz(df: pd.DataFrame, destino: Path, assinatura):
+    arrays = {}
+    tipos = []
+    dtypes = [str(df[c].dtype) for c in df.columns]
+    for i, c in enumerate(df.columns):
+        col = df[c]
+        if pd.api.types.is_numeric_dtype(col.dtype) and not pd.api.types.is_bool_dtype(col.dtype):
+            arrays[f'c{i}'] = col.to_numpy()
+            tipos.append('num')
+        else:
+            nulos = col.isna().to_numpy()
+            arrays[f'c{i}'] = np.array(['' if n else str(v) for v, n in zip(col.tolist(), nulos)], dtype=str)
+            arrays[f'm{i}'] = nulos
+            tipos.append('str')
+    meta = {'versao': CACHE_VERSION, 'assinatura': list(assinatura),
+            'colunas': [str(c) for c in df.columns], 'tipos': tipos, 'dtypes': dtypes}
+    arrays['meta'] = np.frombuffer(json.dumps(meta).encode('utf-8'), dtype=np.uint8)
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    tmp = destino.with_suffix(f'.{os.getpid()}.tmp')
+    with open(tmp, 'wb') as fh:
+        np.savez(fh, **arrays)
+    os.replace(tmp, destino)
+
+
+def _ler_npz(origem: Path, assinatura):
+    with np.load(origem, allow_pickle=False) as z:
+        meta = json.loads(z['meta'].tobytes().decode('utf-8'))
+        if meta.get('versao') != CACHE_VERSION or tuple(meta.get('assinatura', ())) != tuple(assinatura):
+            return None
+        dados = {}
+        for i, (c, t) in enumerate(zip(meta['colunas'], meta['tipos'])):
+            if t == 'num':
+                dados[c] = z[f'c{i}']
+            else:
+                vals = z[f'c{i}'].astype(object)
+                vals[z[f'm{i}']] = np.nan
+                try:
+                    dados[c] = pd.Series(vals).astype(meta['dtypes'][i])
+                except Exception:
+                    dados[c] = vals
+    return pd.DataFrame(dados, columns=meta['colunas'])
+
+
+def read_csv_cached(path) -> pd.DataFrame:
+    """`pd.read_csv(path)` com cache em memória e em disco, invalidado por mtime/tamanho."""
+    path = Path(path).resolve()
+    assinatura = _assinatura(path)
+    with _LOCK:
+        hit = _MEM.get(path)
+        if hit is not None and hit[0] == assinatura:
+            return hit[1]
+    destino = _cache_file(path)
+    df = None
+    if destino.exists():
+        try:
+            df = _ler_npz(destino, assinatura)
+        except Exception:
+            df = None
+    if df is None:
+        df = pd.read_csv(path)
+        try:
+            _salvar_npz(df, destino, assinatura)
+        except OSError:
+            pass    # diretório sem permissão de escrita: fica só o cache em memória
+    with _LOCK:
+        _MEM[path] = (assinatura, df)
+        _VISTOS.add(path)
+    return df
+
+
+def invalidate(path=None):
+    """Descarta o cache (memória e disco) de um CSV, ou de todos se `path` for None.
+    Use após atualizar os catálogos."""
+    with _LOCK:
+        alvos = [Path(path).resolve()] if path is not None else list(_VISTOS | set(_MEM))
+        for p in alvos:
+            _MEM.pop(p, None)
+    for p in alvos:
+        try:
+            _cache_file(p).unlink()
+        except OSError:
+            pass
@@ -1,28 +1,120 @@
+import weakref
+
+import numpy as np
 import pandas as pd
 
+from .pecas import TIPOS_PECAS, colunas_tabela
+from .table_cache import read_csv_cached
+
 def load_eqlen_tables(pvc_csv='data/pvc_pl_eqlen.csv', fofo_csv='data/fofo_pl_eqlen.csv'):
-    pvc = pd.read_csv(pvc_csv)
-    fofo = pd.read_csv(fofo_csv)
+    pvc = read_csv_cached(pvc_csv)
+    fofo = read_csv_cached(fofo_csv)
     return pvc, fofo
 
-TIPOS_PECAS = [
-    ('joelho_90_m', 'Joelho 90°'),
-    ('joelho_45_m', 'Joelho 45°'),
-    ('curva_90_m', 'Curva 90°'),
-    ('curva_45_m', 'Curva 45°'),
-    ('te_passagem_direita_m', 'Tê 90° Passagem Direita'),
-    ('te_saida_de_lado_m', 'Tê 90° Saída de Lado'),
-    ('te_saida_bilateral_m', 'Tê 90° Saída Bilateral'),
-    ('entrada_normal_m', 'Entrada Normal'),
-    ('entrada_de_borda_m', 'Entrada de Borda'),
-    ('saida_de_canalizacao_m', 'Saída de Canalização'),
-    ('valvula_pe_crivo_m', 'Válvula de Pé e Crivo'),
-    ('valvula_retencao_leve_m', 'Válvula de Retenção (Leve)'),
-    ('valvula_retencao_pesado_m', 'Válvula de Retenção (Pesado)'),
-    ('registro_globo_aberto_m', 'Registro de Globo (aberto)'),
-    ('registro_gaveta_aberto_m', 'Registro de Gaveta (aberto)'),
-    ('registro_angulo_aberto_m', 'Registro de Ângulo (aberto)'),
-]
+
+def dn_column(table) -> str:
+    """Nome da coluna de diâmetro (de_mm/dn_mm/diam..mm); na falta, a primeira coluna."""
+    for nm in table.columns:
+        low = nm.lower()
+        if ('de' in low or 'dn' in low or 'diam' in low) and 'mm' in low:
+            return nm
+    return table.columns[0]
+
+
+class IndiceDN:
+    """Índice de uma tabela de L_eq para consultas DN → linha mais próxima.
+
+    Construído uma única vez: DNs ordenados (para `searchsorted`), polegadas de
+    referência e a matriz densa peça × DN. As consultas devolvem arrays/valores
+    NumPy, sem criar objetos pandas. `canonica` é a mesma matriz nas colunas de
+    TIPOS_PECAS (resolvidas por ALIASES_PECAS; 0 onde a tabela não tem a peça).
+    """
+    __slots__ = ('dn_name', 'pecas', 'de_mm', 'pol', 'matriz', 'canonica', 'disponivel')
+
+    def __init__(self, table):
+        if table is None or table.empty:
+            self.dn_name = None
+            self.pecas = []
+            self.de_mm = np.empty(0)
+            self.pol = np.empty(0, dtype=object)
+            self.matriz = np.empty((0, 0))
+        else:
+            self.dn_name = dn_column(table)
+            self.pecas = [c for c in table.columns if c not in (self.dn_name, 'dref_pol')]
+            de = pd.to_numeric(table[self.dn_name], errors='coerce').to_numpy(dtype=float)
+            ordem = np.argsort(np.where(np.isnan(de), np.inf, de), kind='stable')
+            ordem = ordem[~np.isnan(de[ordem])]
+            self.de_mm = de[ordem]
+            pol = table['dref_pol'].to_numpy(dtype=object) if 'dref_pol' in table.columns \
+                else np.full(len(table), '', dtype=object)
+            self.pol = np.array(['' if pd.isna(v) else str(v) for v in pol[ordem]], dtype=object)
+            self.matriz = table[self.pecas].apply(pd.to_numeric, errors='coerce') \
+                .fillna(0.0).to_numpy(dtype=float)[ordem]
+        cols = colunas_tabela(self.pecas)
+        self.disponivel = cols >= 0
+        self.canonica = np.zeros((self.de_mm.size, cols.size))
+        self.canonica[:, self.disponivel] = self.matriz[:, cols[self.disponivel]]
+
+    @property
+    def empty(self) -> bool:
+        return self.de_mm.size == 0
+
+    def nearest_many(self, dn_mm) -> np.ndarray:
+        """Posições (na ordem crescente de DN) das linhas mais próximas; empate → menor DN."""
+        x = np.atleast_1d(np.asarray(dn_mm, dtype=float))
+        x = np.where(np.isnan(x), 0.0, x)
+        pos = np.clip(np.searchsorted(self.de_mm, x), 1, max(self.de_mm.size - 1, 1))
+        esq = pos - 1
+        if self.de_mm.size == 1:
+            return np.zeros(x.shape, dtype=np.int64)
+        usa_esq = (x - self.de_mm[esq]) <= (self.de_mm[pos] - x)
+        return np.where(usa_esq, esq, pos).astype(np.int64)
+
+    def nearest(self, dn_mm) -> int:
+        return int(self.nearest_many(_float_or_zero(dn_mm))[0])
+
+    def lookup(self, dn_mm):
+        """(linha de L_eq alinhada a `pecas`, de_ref_mm, pol_ref) do DN mais próximo."""
+        if self.empty:
+            return np.zeros(len(self.pecas)), _float_or_zero(dn_mm), ''
+        i = self.nearest(dn_mm)
+        return self.matriz[i], float(self.de_mm[i]), self.pol[i]
+
+    def lookup_many(self, dn_mm):
+        """Versão em lote de `lookup`: (matriz N × peças, de_ref_mm (N,), pol_ref (N,))."""
+        x = np.atleast_1d(np.asarray(dn_mm, dtype=float))
+        if self.empty:
+            return np.zeros((x.size, len(self.pecas))), np.nan_to_num(x), np.full(x.size, '', dtype=object)
+        i = self.nearest_many(x)
+        return self.matriz[i], self.de_mm[i], self.pol[i]
+
+
+def _float_or_zero(x) -> float:
+    try:
+        v = float(x)
+    except Exception:
+        return 0.0
+    return 0.0 if v != v else v
+
+
+_INDICES = {}
+
+def dn_index(table) -> IndiceDN:
+    """IndiceDN da tabela, construído na primeira consulta e reaproveitado enquanto
+    o mesmo objeto DataFrame existir (as tabelas de catálogo são somente leitura)."""
+    key = id(table)
+    hit = _INDICES.get(key)
+    if hit is not None and hit[0]() is table:
+        return hit[1]
+    idx = IndiceDN(table)
+    _INDICES[key] = (weakref.ref(table, lambda _r, k=key: _INDICES.pop(k, None)), idx)
+    return idx
+
+
+def lookup_row_by_mm(table, ref_mm):
+    """(linha de L_eq alinhada a dn_index(table).pecas, de_ref_mm, pol_ref) do DN mais próximo."""
+    return dn_index(table).lookup(ref_mm)
+
 
 def row_for(material: str, dn_mm: float, pvc, fofo) -> dict:
     table = pvc if (material or '').lower() == 'pvc' else fofo
@@ -30,12 +122,9 @@ def row_for(material: str, dn_mm: float, pvc, fofo) -> dict:
         dn = float(dn_mm)
     except Exception:
         return None
-    idx = int((table['de_mm'] - dn).abs().idxmin())
-    row = table.loc[idx].to_dict()
-    out = {}
-    for key, _label in TIPOS_PECAS:
-        out[key] = row.get(key, 0)
-    return out
+    idx = dn_index(table)
+    linha = idx.canonica[idx.nearest(dn)] if not idx.empty else np.zeros(len(TIPOS_PECAS))
+    return {key: float(v) for (key, _label), v in zip(TIPOS_PECAS, linha)}
 
 def options_for_editor():
     return [label for _key, label in TIPOS_PECAS]
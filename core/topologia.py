@@ -0,0 +1,281 @@
+"""Índice de nós/arestas mantido a cada inserção de trecho.
+
+Guarda, por nó, o tipo normalizado da conexão de início (Entrada/Tê/Cruzeta), o
+nº de saídas e de chegadas, o conjunto de arestas (de_no, para_no) e uma
+union-find dos nós. Assim as regras de cadastro (aresta duplicada, tipo do nó,
+capacidade de saídas) são verificadas em O(1), e trechos que fecham ciclos e nós
+desconectados da Entrada são detectados incrementalmente.
+"""
+import re
+import unicodedata
+from collections import Counter
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+# Regras FÍSICAS FIXAS de saídas por tipo de nó de início
+CAPACIDADE_SAIDAS = {'entrada': 1, 'te': 2, 'cruzeta': 3}
+CAPACIDADE_PADRAO = 2
+
+
+@lru_cache(maxsize=256)
+def _norm_tipo_str(s: str) -> str:
+    s = s.lower().strip()
+    s = ''.join(ch for ch in unicodedata.normalize('NFD', s) if unicodedata.category(ch) != 'Mn')  # remove acentos
+    s = s.replace(' ', '')
+    if 'entrada' in s: return 'entrada'
+    if 'cruzeta' in s: return 'cruzeta'
+    if 'te' in s: return 'te'
+    return s
+
+
+def norm_tipo(x) -> str:
+    """Normaliza 'tipo_ini' para comparação robusta (te/tê, entrada de água, cruzeta)."""
+    if x is None:
+        return ''
+    try:
+        if x != x:
+            return ''
+    except (TypeError, ValueError):
+        pass
+    return _norm_tipo_str(str(x))
+
+
+def normalize_label(value: str, mode: str) -> str:
+    """Limpa/valida rótulos conforme o modo escolhido (Letras ou Números)."""
+    if mode.startswith('Letras'):
+        v = (value or '').strip().upper()
+        if not re.fullmatch(r'[A-Z]+', v):
+            raise ValueError('Use apenas letras maiúsculas (A–Z, AA, AB, ...).')
+        return v
+    else:  # 'Números (1, 2, 3, ...)'
+        v = (value or '').strip()
+        if not re.fullmatch(r'[0-9]+', v):
+            raise ValueError('Use apenas dígitos (0–9).')
+        return str(int(v))  # remove zeros à esquerda (mantém "0" se for zero)
+
+
+def normalize_labels(values, mode: str):
+    """Versão vetorizada de `normalize_label`: devolve (rótulos, válidos) como arrays;
+    rótulos inválidos ficam como vieram (sem espaços)."""
+    s = pd.Series(values, dtype=object)
+    num = s.map(lambda v: isinstance(v, (int, float, np.number)) and not isinstance(v, bool) and v == v)
+    s = s.where(~num, s[num].map(lambda v: str(int(v)) if float(v).is_integer() else str(v)))
+    s = s.fillna('').astype(str).str.strip()
+    if mode.startswith('Letras'):
+        s = s.str.upper()
+        ok = s.str.fullmatch(r'[A-Z]+').to_numpy(dtype=bool)
+    else:
+        ok = s.str.fullmatch(r'[0-9]+').to_numpy(dtype=bool)
+        s = s.where(~ok, s.str.lstrip('0').replace('', '0'))
+    return s.to_numpy(dtype=object), ok
+
+
+class IndiceNos:
+    """Adjacência de-para com tipo e contagem de saídas por nó.
+
+    A union-find guarda, por raiz, o tamanho, a lista de nós e quantos nós do tipo
+    Entrada o componente tem; `desconectados` sai direto das raízes, sem percorrer
+    os nós. Uniões não se desfazem: a baixa de um trecho que fechava malha só o
+    retira de `ciclos`, e a de um trecho de árvore marca o componente, que é
+    refeito (só ele, com as arestas na ordem de cadastro) na próxima consulta.
+    """
+
+    def __init__(self):
+        self.arestas = Counter()       # (de_no, para_no) → nº de trechos
+        self.saidas = Counter()        # nó → nº de trechos que partem dele
+        self.chegadas = Counter()      # nó → nº de trechos que chegam nele
+        self.tipos = {}                # nó → Counter(tipo normalizado)
+        self.rotulo = {}               # nó → tipo_ini como digitado no 1º trecho
+        self._ordem = {}               # aresta → nº de sequência do cadastro (baixa em O(1))
+        self._seq = 0
+        self._destinos = {}            # nó → {para_no} (arestas de um componente ao refazê-lo)
+        self._entradas = {}            # nós do tipo Entrada, na ordem de cadastro
+        self._uf_pai = {}
+        self._uf_tam = {}              # raiz → nº de nós
+        self._uf_nos = {}              # raiz → nós do componente
+        self._uf_ent = {}              # raiz → nº de nós do tipo Entrada
+        self._ciclos = []
+        self._sujos = set()            # raízes de componentes a refazer
+
+    @classmethod
+    def from_columns(cls, de_no, para_no, tipo_ini) -> 'IndiceNos':
+        idx = cls()
+        for de, para, tipo in zip(de_no, para_no, tipo_ini):
+            idx.adicionar(de, para, tipo)
+        return idx
+
+    # ---------- regras de cadastro ----------
+    def validar(self, de_no: str, para_no: str, tipo_ini: str):
+        """Mensagem de erro se o trecho violar as regras de cadastro, senão None."""
+        de_no, para_no = str(de_no), str(para_no)
+        if de_no == para_no:
+            return 'Início e fim do trecho não podem ser iguais.'
+        if self.arestas.get((de_no, para_no)):
+            return f'Já existe um trecho {de_no} → {para_no}.'
+        tipo = norm_tipo(tipo_ini)
+        existentes = self.tipos.get(de_no)
+        if existentes:
+            if len(existentes) > 1 and tipo not in existentes:
+                return 'O nó de início já foi cadastrado com tipos diferentes. Padronize o tipo.'
+            if len(existentes) == 1 and tipo not in existentes:
+                return f'O nó "{de_no}" já está definido como "{self.rotulo.get(de_no, "")}".'
+        cap = CAPACIDADE_SAIDAS.get(tipo, CAPACIDADE_PADRAO)
+        if self.saidas.get(de_no, 0) >= cap:
+            return f'O nó de início "{de_no}" ({tipo_ini}) já atingiu o limite de {cap} saída(s).'
+        return None
+
+    def criaria_ciclo(self, de_no: str, para_no: str) -> bool:
+        """True se os dois nós já estão ligados (o trecho fecharia uma malha)."""
+        self._reconstruir()
+        de_no, para_no = str(de_no), str(para_no)
+        if de_no not in self._uf_pai or para_no not in self._uf_pai:
+            return False
+        return self._raiz(de_no) == self._raiz(para_no)
+
+    # ---------- manutenção ----------
+    def adicionar(self, de_no, para_no, tipo_ini):
+        self._reconstruir()
+        de_no, para_no = str(de_no), str(para_no)
+        aresta = (de_no, para_no)
+        self.arestas[aresta] += 1
+        self.saidas[de_no] += 1
+        self.chegadas[para_no] += 1
+        tipo = norm_tipo(tipo_ini)
+        self.tipos.setdefault(de_no, Counter())[tipo] += 1
+        if de_no not in self.rotulo and tipo_ini is not None:
+            self.rotulo[de_no] = str(tipo_ini)
+        if aresta not in self._ordem:
+            self._ordem[aresta] = self._seq
+            self._seq += 1
+            self._destinos.setdefault(de_no, set()).add(para_no)
+        self._unir(de_no, para_no)
+        if tipo == 'entrada' and de_no not in self._entradas:
+            self._entradas[de_no] = None
+            self._uf_ent[self._raiz(de_no)] += 1
+
+    def remover(self, de_no, para_no, tipo_ini):
+        de_no, para_no = str(de_no), str(para_no)
+        aresta = (de_no, para_no)
+        if not self.arestas.get(aresta):
+            return
+        for cont, chave in ((self.arestas, aresta), (self.saidas, de_no), (self.chegadas, para_no)):
+            cont[chave] -= 1
+            if cont[chave] <= 0:
+                del cont[chave]
+        t = self.tipos.get(de_no)
+        if t is not None:
+            t[norm_tipo(tipo_ini)] -= 1
+            t += Counter()          # descarta contagens zeradas
+            if t:
+                self.tipos[de_no] = t
+            else:
+                del self.tipos[de_no]
+                self.rotulo.pop(de_no, None)
+        raiz = self._raiz(de_no)
+        if de_no in self._entradas and 'entrada' not in self.tipos.get(de_no, ()):
+            del self._entradas[de_no]
+            self._uf_ent[raiz] -= 1
+        if aresta not in self.arestas:
+            del self._ordem[aresta]
+            d = self._destinos[de_no]
+            d.discard(para_no)
+            if not d:
+                del self._destinos[de_no]
+        if raiz in self._sujos:
+            return
+        if aresta in self._ciclos:
+            # a aresta não uniu nada ao ser cadastrada: os componentes não mudam
+            self._ciclos.remove(aresta)
+            for no in {de_no, para_no}:
+                if no not in self.saidas and no not in self.chegadas and self._uf_tam.get(no) == 1:
+                    self._descartar(no)
+        else:
+            self._sujos.add(raiz)
+
+    # ---------- union-find ----------
+    def _raiz(self, no):
+        pai = self._uf_pai
+        while pai[no] != no:
+            pai[no] = pai[pai[no]]
+            no = pai[no]
+        return no
+
+    def _unir(self, a, b):
+        for no in (a, b):
+            if no not in self._uf_pai:
+                self._uf_pai[no] = no
+                self._uf_tam[no] = 1
+                self._uf_nos[no] = [no]
+                self._uf_ent[no] = 0
+        ra, rb = self._raiz(a), self._raiz(b)
+        if ra == rb:
+            self._ciclos.append((a, b))
+            return
+        if self._uf_tam[ra] < self._uf_tam[rb]:
+            ra, rb = rb, ra
+        self._uf_pai[rb] = ra
+        self._uf_tam[ra] += self._uf_tam.pop(rb)
+        self._uf_nos[ra].extend(self._uf_nos.pop(rb))
+        self._uf_ent[ra] += self._uf_ent.pop(rb)
+
+    def _descartar(self, no):
+        for d in (self._uf_pai, self._uf_tam, self._uf_nos, self._uf_ent):
+            d.pop(no, None)
+
+    def _reconstruir(self):
+        """Refaz os componentes marcados por `remover`, cada um só com as próprias arestas."""
+        if not self._sujos:
+            return
+        nos = set()
+        for r in self._sujos:
+            nos.update(self._uf_nos[r])
+        self._sujos = set()
+        if 2 * len(nos) > len(self._uf_pai):
+            # quase todos os nós: recomeça do zero; `_ordem` já está na ordem de cadastro
+            self._uf_pai, self._uf_tam, self._uf_nos, self._uf_ent, self._ciclos = {}, {}, {}, {}, []
+            nos, arestas = self._entradas, self._ordem
+        else:
+            for no in nos:
+                self._descartar(no)
+            arestas = sorted(((de, para) for de in nos for para in self._destinos.get(de, ())),
+                             key=self._ordem.__getitem__)
+            self._ciclos = [c for c in self._ciclos if c[0] not in nos]
+        for aresta in arestas:
+            for _ in range(self.arestas[aresta]):
+                self._unir(*aresta)
+        for no in self._entradas.keys() & nos:
+            self._uf_ent[self._raiz(no)] += 1
+        self._ciclos.sort(key=self._ordem.__getitem__)
+
+    # ---------- consultas de conectividade ----------
+    @property
+    def nos(self):
+        self._reconstruir()
+        return list(self._uf_pai)
+
+    @property
+    def ciclos(self) -> list:
+        """Trechos (de_no, para_no) que, na ordem de cadastro, fecharam uma malha."""
+        self._reconstruir()
+        return list(self._ciclos)
+
+    def componentes(self) -> dict:
+        """Raiz → lista de nós de cada componente conexo."""
+        self._reconstruir()
+        return {r: list(nos) for r, nos in self._uf_nos.items()}
+
+    def desconectados(self) -> list:
+        """Nós de componentes sem nenhum nó do tipo Entrada (na falta de Entrada na
+        rede, os de fora do maior componente). Sai das contagens por raiz: o custo
+        é proporcional ao nº de componentes e de nós devolvidos."""
+        self._reconstruir()
+        if len(self._uf_tam) <= 1:
+            return []
+        if self._entradas:
+            fora = [r for r, e in self._uf_ent.items() if not e]
+        else:
+            principal = max(self._uf_tam, key=self._uf_tam.__getitem__)
+            fora = [r for r in self._uf_tam if r != principal]
+        return [no for r in fora for no in self._uf_nos[r]]
@@ -0,0 +1,385 @@
+"""Armazenamento colunar dos trechos cadastrados.
+
+Cada coluna de BASE_COLS é um array NumPy pré-alocado que cresce geometricamente
+(inserção amortizada O(1)); strings ficam em arrays `object`, 'ordem' em int64 com
+máscara de ausentes e as demais em float64 (NaN = ausente). O conjunto de ids é
+mantido a cada alteração. O DataFrame com DTYPES só é montado para exibição
+(`to_frame`) e fica em cache até a próxima alteração. O índice de nós
+(`topologia.IndiceNos`) é atualizado junto com as linhas.
+"""
+import uuid
+from typing import Mapping
+
+import numpy as np
+import pandas as pd
+
+from .projeto import BASE_COLS, DTYPES
+from .topologia import IndiceNos
+
+
+def _tipo(dtype: str) -> str:
+    if dtype == 'string':
+        return 'str'
+    if dtype == 'Int64':
+        return 'int'
+    return 'float'
+
+
+def _ausente(v) -> bool:
+    if v is None or v is pd.NA:
+        return True
+    try:
+        return bool(v != v)
+    except (TypeError, ValueError):
+        return False
+
+
+def _conv_str(v):
+    return None if _ausente(v) else str(v)
+
+
+def _conv_float(v) -> float:
+    if _ausente(v):
+        return np.nan
+    try:
+        return float(str(v).replace(',', '.')) if isinstance(v, str) else float(v)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+class TrechoStore:
+    """Tabela de trechos append-friendly com índice de ids."""
+
+    __slots__ = ('_n', '_cap', '_dados', '_mascara', '_tipos', '_pos_id', '_versao', '_versao_estrutura',
+                 '_cache', '_nos', '_seq_ramo', '_casa')
+
+    def __init__(self, capacidade: int = 64):
+        self._n = 0
+        self._cap = max(int(capacidade), 1)
+        self._tipos = {c: _tipo(DTYPES.get(c, 'float')) for c in BASE_COLS}
+        self._dados = {}
+        self._mascara = {}
+        for c, t in self._tipos.items():
+            if t == 'str':
+                self._dados[c] = np.full(self._cap, None, dtype=object)
+            elif t == 'int':
+                self._dados[c] = np.zeros(self._cap, dtype=np.int64)
+                self._mascara[c] = np.ones(self._cap, dtype=bool)
+            else:
+                self._dados[c] = np.full(self._cap, np.nan)
+        self._pos_id = {}
+        self._versao = 0
+        self._versao_estrutura = 0
+        self._cache = None
+        self._nos = IndiceNos()
+        self._seq_ramo = {}                        # ramo → posições na sequência de 'ordem' (ver `mover`)
+        self._casa = np.zeros(0, dtype=np.int64)   # posição → índice na sequência do seu ramo
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> 'TrechoStore':
+        store = cls(capacidade=max(64, len(df)))
+        if len(df):
+            store.extend({c: df[c].to_numpy(dtype=object) for c in BASE_COLS if c in df.columns})
+        return store
+
+    def __len__(self) -> int:
+        return self._n
+
+    @property
+    def nos(self) -> IndiceNos:
+        """Índice de nós/arestas (regras de cadastro, ciclos, desconexões)."""
+        return self._nos
+
+    @property
+    def versao(self) -> int:
+        """Incrementa a cada alteração (útil como chave de cache)."""
+        return self._versao
+
+    @property
+    def versao_estrutura(self) -> int:
+        """Incrementa só com inserção, exclusão ou edição de id/de_no/para_no: enquanto não
+        muda, linhas e rede continuam as mesmas (ver `ResultadosIncrementais.atualizar`)."""
+        return self._versao_estrutura
+
+    # ---------- ids ----------
+    def tem_id(self, id_) -> bool:
+        return str(id_) in self._pos_id
+
+    def posicao(self, id_):
+        """Posição da linha com esse id (ou None)."""
+        return self._pos_id.get(str(id_))
+
+    def novo_id(self, desejado=None, reservados=()) -> str:
+        """`desejado` se estiver livre; senão '<desejado|row>_<hex>' único
+        (também fora de `reservados`)."""
+        raw = (_conv_str(desejado) or '').strip()
+        if raw and raw not in self._pos_id and raw not in reservados:
+            return raw
+        base = raw or 'row'
+        while True:
+            cand = f'{base}_{uuid.uuid4().hex[:6]}'
+            if cand not in self._pos_id and cand not in reservados:
+                return cand
+
+    # ---------- escrita ----------
+    def _reservar(self, extra: int):
+        need = self._n + extra
+        if need <= self._cap:
+            return
+        cap = self._cap
+        while cap < need:
+            cap *= 2
+        for c, arr in self._dados.items():
+            t = self._tipos[c]
+            novo = np.full(cap, None, dtype=object) if t == 'str' else \
+                np.zeros(cap, dtype=np.int64) if t == 'int' else np.full(cap, np.nan)
+            novo[:self._n] = arr[:self._n]
+            self._dados[c] = novo
+        for c, m in self._mascara.items():
+            novo = np.ones(cap, dtype=bool)
+            novo[:self._n] = m[:self._n]
+            self._mascara[c] = novo
+        self._cap = cap
+
+    def _gravar(self, c, pos, valores):
+        t = self._tipos[c]
+        if t == 'str':
+            self._dados[c][pos] = [_conv_str(v) for v in valores]
+        elif t == 'int':
+            f = np.array([_conv_float(v) for v in valores], dtype=float)
+            ok = np.isfinite(f)
+            self._dados[c][pos] = np.where(ok, f, 0).astype(np.int64)
+            self._mascara[c][pos] = ~ok
+        else:
+            self._dados[c][pos] = [_conv_float(v) for v in valores]
+
+    def _gravar_um(self, c, pos, v):
+        t = self._tipos[c]
+        if t == 'str':
+            self._dados[c][pos] = _conv_str(v)
+        elif t == 'int':
+            f = _conv_float(v)
+            ok = f == f and abs(f) != np.inf
+            self._dados[c][pos] = int(f) if ok else 0
+            self._mascara[c][pos] = not ok
+        else:
+            self._dados[c][pos] = _conv_float(v)
+
+    def _alterado(self, estrutura: bool = False):
+        self._versao += 1
+        if estrutura:
+            self._versao_estrutura += 1
+        self._cache = None
+
+    def append(self, registro: Mapping) -> int:
+        """Acrescenta um trecho (colunas ausentes ficam vazias) e devolve sua posição.
+        O id deve ser único — use `novo_id` antes."""
+        id_ = _conv_str(registro.get('id'))
+        if id_ is None or id_ in self._pos_id:
+            raise ValueError(f'id ausente ou duplicado: {id_!r}')
+        self._reservar(1)
+        pos = self._n
+        for c in BASE_COLS:
+            self._gravar_um(c, pos, registro.get(c))
+        self._n += 1
+        self._pos_id[id_] = pos
+        self._nos.adicionar(*self._aresta(pos))
+        self._seq_ramo.pop(self._dados['ramo'][pos], None)
+        self._alterado(estrutura=True)
+        return pos
+
+    def extend(self, colunas: Mapping) -> np.ndarray:
+        """Acrescenta vários trechos de uma vez (dict coluna → sequência de mesmo tamanho).
+        Ids ausentes ou repetidos recebem um id novo. Devolve as posições inseridas."""
+        tam = {len(v) for v in colunas.values()}
+        if len(tam) > 1:
+            raise ValueError('colunas com tamanhos diferentes')
+        m = tam.pop() if tam else 0
+        if m == 0:
+            return np.zeros(0, dtype=np.int64)
+        ids = []
+        novos = set()
+        for v in (colunas.get('id') if 'id' in colunas else [None] * m):
+            s = self.novo_id(v, novos)
+            novos.add(s)
+            ids.append(s)
+        self._reservar(m)
+        pos = np.arange(self._n, self._n + m)
+        for c in BASE_COLS:
+            self._gravar(c, pos, ids if c == 'id' else colunas.get(c, [None] * m))
+        self._n += m
+        self._pos_id.update(zip(ids, pos.tolist()))
+        for p in pos.tolist():
+            self._nos.adicionar(*self._aresta(p))
+        self._descartar_seq(pos)
+        self._alterado(estrutura=True)
+        return pos
+
+    def set_valor(self, pos: int, coluna: str, valor):
+        self.set_coluna(coluna, [valor], [pos])
+
+    def set_coluna(self, coluna: str, valores, pos=None):
+        """Grava `valores` na coluna (todas as linhas, ou só as posições `pos`)."""
+        pos = np.arange(self._n) if pos is None else np.asarray(pos, dtype=np.int64)
+        valores = list(valores) if not np.isscalar(valores) else [valores] * len(pos)
+        if len(valores) != len(pos):
+            raise ValueError('quantidade de valores difere da de posições')
+        if pos.size and (pos.min() < 0 or pos.max() >= self._n):
+            raise IndexError('posição fora da tabela')
+        if coluna == 'id':
+            antigos = [self._dados['id'][p] for p in pos.tolist()]
+            novos = [_conv_str(v) for v in valores]
+            restantes = set(self._pos_id) - set(antigos)
+            if any(v is None for v in novos) or len(set(novos)) != len(novos) or restantes & set(novos):
+                raise ValueError('ids devem ser únicos e não vazios')
+            for a in antigos:
+                self._pos_id.pop(a, None)
+            self._pos_id.update(zip(novos, pos.tolist()))
+        if coluna == 'ramo':
+            self._descartar_seq(pos)        # ramos de origem
+        self._gravar(coluna, pos, valores)
+        if coluna in ('ramo', 'ordem'):
+            self._descartar_seq(pos)
+        if coluna in ('de_no', 'para_no', 'tipo_ini'):
+            n = self._n
+            self._nos = IndiceNos.from_columns(self._dados['de_no'][:n], self._dados['para_no'][:n],
+                                               self._dados['tipo_ini'][:n])
+        self._alterado(estrutura=coluna in ('id', 'de_no', 'para_no'))
+
+    def _aresta(self, pos):
+        return self._dados['de_no'][pos], self._dados['para_no'][pos], self._dados['tipo_ini'][pos]
+
+    def remover(self, posicoes):
+        """Remove as linhas indicadas (as demais mantêm a ordem relativa)."""
+        rem = np.unique(np.asarray(posicoes, dtype=np.int64))
+        rem = rem[(rem >= 0) & (rem < self._n)]
+        if not rem.size:
+            return
+        # baixa aresta a aresta (O(1) cada; o componente afetado é refeito na próxima
+        # consulta), salvo se sobrar menos da metade: aí é mais barato recriar o índice
+        reconstruir = 2 * rem.size > self._n
+        if not reconstruir:
+            for p in rem.tolist():
+                self._nos.remover(*self._aresta(p))
+        manter = np.ones(self._n, dtype=bool)
+        manter[rem] = False
+        m = int(manter.sum())
+        for c, arr in self._dados.items():
+            arr[:m] = arr[:self._n][manter]
+            arr[m:self._n] = None if self._tipos[c] == 'str' else 0 if self._tipos[c] == 'int' else np.nan
+        for c, mk in self._mascara.items():
+            mk[:m] = mk[:self._n][manter]
+            mk[m:self._n] = True
+        self._n = m
+        self._pos_id = {v: i for i, v in enumerate(self._dados['id'][:m].tolist())}
+        self._seq_ramo.clear()              # posições deslocadas
+        if reconstruir:
+            self._nos = IndiceNos.from_columns(self._dados['de_no'][:m], self._dados['para_no'][:m],
+                                               self._dados['tipo_ini'][:m])
+        self._alterado(estrutura=True)
+
+    def _descartar_seq(self, pos):
+        """Invalida a sequência de 'ordem' dos ramos das linhas `pos`."""
+        if self._seq_ramo:
+            for r in set(self._dados['ramo'][pos].tolist()):
+                self._seq_ramo.pop(r, None)
+
+    def _seq(self, ramo):
+        """Posições do ramo em ordem crescente de 'ordem' (empate: posição), em cache
+        até uma inserção, exclusão ou edição de 'ramo'/'ordem' fora de `mover`. Um
+        ramo com 'ordem' ausente ou repetida é renumerado 1..n ao montar."""
+        seq = self._seq_ramo.get(ramo)
+        if seq is not None:
+            return seq
+        n = self._n
+        ramos = self._dados['ramo'][:n]
+        pos = np.flatnonzero(np.equal(ramos, None) if ramo is None else ramos == ramo)
+        ordem, falta = self._dados['ordem'], self._mascara['ordem']
+        seq = pos[np.lexsort((pos, np.where(falta[pos], np.iinfo(np.int64).max, ordem[pos])))]
+        vals = ordem[seq]
+        if falta[seq].any() or (vals[1:] == vals[:-1]).any():
+            self._gravar('ordem', seq, range(1, seq.size + 1))
+            self._alterado()
+        if self._casa.size < self._cap:
+            casa = np.full(self._cap, -1, dtype=np.int64)
+            casa[:self._casa.size] = self._casa
+            self._casa = casa
+        self._casa[seq] = np.arange(seq.size)
+        self._seq_ramo[ramo] = seq
+        return seq
+
+    def mover(self, posicoes, sentido: int) -> np.ndarray:
+        """Sobe (sentido < 0) ou desce (sentido > 0) as linhas indicadas uma casa dentro
+        do próprio ramo, na sequência de 'ordem'.
+
+        Linhas selecionadas consecutivas andam em bloco e a vizinha passa para o outro
+        lado do bloco. Os valores de 'ordem' existentes (com eventuais lacunas) só são
+        permutados entre as linhas trocadas. A sequência de cada ramo (`_seq`) custa
+        O(N + m log m) na primeira vez e fica em cache; daí em diante um movimento é
+        O(k), só as k linhas selecionadas e suas vizinhas. Devolve as posições regravadas.
+        """
+        sel = np.unique(np.asarray(posicoes, dtype=np.int64))
+        sel = sel[(sel >= 0) & (sel < self._n)]
+        if not sel.size or not sentido:
+            return np.zeros(0, dtype=np.int64)
+        ramos_sel = self._dados['ramo'][sel]
+        ordem = self._dados['ordem']
+        escritas, valores = [], []
+        for r in dict.fromkeys(ramos_sel.tolist()):
+            seq = self._seq(r)
+            m = seq.size
+            casas = np.sort(self._casa[sel[np.equal(ramos_sel, None) if r is None else ramos_sel == r]])
+            quebra = np.flatnonzero(np.diff(casas) != 1)
+            inicios = casas[np.r_[0, quebra + 1]]
+            fins = casas[np.r_[quebra, casas.size - 1]]
+            if sentido < 0:
+                ok = inicios > 0                     # bloco já no início do ramo fica
+                inicios, fins = inicios[ok], fins[ok]
+                tocadas = [np.arange(a - 1, b + 1) for a, b in zip(inicios.tolist(), fins.tolist())]
+                novas = [np.r_[seq[a:b + 1], seq[a - 1]] for a, b in zip(inicios.tolist(), fins.tolist())]
+            else:
+                ok = fins < m - 1                    # bloco já no fim do ramo fica
+                inicios, fins = inicios[ok], fins[ok]
+                tocadas = [np.arange(a, b + 2) for a, b in zip(inicios.tolist(), fins.tolist())]
+                novas = [np.r_[seq[b + 1], seq[a:b + 1]] for a, b in zip(inicios.tolist(), fins.tolist())]
+            if not tocadas:
+                continue
+            tocadas, novas = np.concatenate(tocadas), np.concatenate(novas)
+            valores.append(ordem[seq[tocadas]])      # cada casa da sequência mantém seu valor
+            seq[tocadas] = novas
+            self._casa[novas] = tocadas
+            escritas.append(novas)
+        if not escritas:
+            return np.zeros(0, dtype=np.int64)
+        escritas, valores = np.concatenate(escritas), np.concatenate(valores)
+        ordem[escritas] = valores
+        self._alterado()
+        return escritas
+
+    # ---------- leitura ----------
+    def coluna(self, nome: str) -> np.ndarray:
+        """Valores da coluna (visão somente leitura; 'ordem' ausente → -1)."""
+        v = self._dados[nome][:self._n]
+        if nome in self._mascara:
+            v = np.where(self._mascara[nome][:self._n], -1, v)
+        else:
+            v = v.view()
+        v.flags.writeable = False
+        return v
+
+    def to_frame(self) -> pd.DataFrame:
+        """DataFrame (BASE_COLS, DTYPES) para exibição. Em cache até a próxima
+        alteração: trate como somente leitura e grave pelo store."""
+        if self._cache is None:
+            n = self._n
+            dados = {}
+            for c in BASE_COLS:
+                t = self._tipos[c]
+                if t == 'str':
+                    dados[c] = pd.array(self._dados[c][:n].copy(), dtype='string')
+                elif t == 'int':
+                    dados[c] = pd.arrays.IntegerArray(self._dados[c][:n].copy(), self._mascara[c][:n].copy())
+                else:
+                    dados[c] = self._dados[c][:n].copy()
+            self._cache = pd.DataFrame(dados, columns=BASE_COLS)
+        return self._cache
@@ -1,9 +1,12 @@
 
+import numpy as np
 import pandas as pd
 
+from .table_cache import read_csv_cached
+
 def load_uc_default(csv_path: str) -> pd.DataFrame:
     try:
-        df = pd.read_csv(csv_path)
+        df = read_csv_cached(csv_path).copy()
         df["aparelho_full"] = df["aparelho_full"].astype(str)
         df["peso_uc"] = pd.to_numeric(df["peso_uc"], errors="coerce").fillna(1.0)
         return df[["aparelho_full","peso_uc"]]
@@ -25,19 +28,34 @@ def normalize_peso_andar_table(peso_andar_tidy: pd.DataFrame) -> pd.DataFrame:
     df = df[["aparelho_full","AF1","AF2","AF3","AF4"]]
     return df
 
-def compute_uc_by_floor(peso_andar_tidy: pd.DataFrame, pesos_uc: pd.DataFrame, aptos_por_andar: pd.DataFrame) -> pd.DataFrame:
+AF_COLS = ["AF1","AF2","AF3","AF4"]
+
+def _fixture_matrix(peso_andar_tidy: pd.DataFrame, pesos_uc: pd.DataFrame):
+    """Catálogo de aparelhos como matrizes: nomes, quantidades aparelho × tipo AF e pesos (UC)."""
     cat = normalize_peso_andar_table(peso_andar_tidy)
     pes = pesos_uc.set_index("aparelho_full")["peso_uc"]
-    res_rows = []
-    for andar, row in aptos_por_andar.iterrows():
-        total_uc = 0.0
-        for _, r in cat.iterrows():
-            qtd = 0.0
-            for af in ["AF1","AF2","AF3","AF4"]:
-                qtd += (r.get(af,0.0) or 0.0) * (row.get(af,0.0) or 0.0)
-            total_uc += qtd * float(pes.get(r["aparelho_full"], 1.0))
-        res_rows.append({"andar": andar, "UC_total": total_uc})
-    return pd.DataFrame(res_rows).set_index("andar")
+    pes = pes[~pes.index.duplicated(keep="first")]
+    nomes = cat["aparelho_full"].to_numpy()
+    qtd = cat[AF_COLS].to_numpy(dtype=float)
+    w = pd.to_numeric(pes.reindex(nomes), errors="coerce").to_numpy(dtype=float, copy=True)
+    w[~pd.Index(nomes).isin(pes.index)] = 1.0
+    return nomes, qtd, w
+
+def _aptos_matrix(aptos_por_andar: pd.DataFrame) -> np.ndarray:
+    """Andares × tipos AF (colunas ausentes contam 0; células vazias ficam NaN)."""
+    F = aptos_por_andar.reindex(columns=AF_COLS, fill_value=0.0)
+    return F.apply(pd.to_numeric, errors="coerce").to_numpy(dtype=float)
+
+def compute_uc_by_floor(peso_andar_tidy: pd.DataFrame, pesos_uc: pd.DataFrame, aptos_por_andar: pd.DataFrame) -> pd.DataFrame:
+    """UC por andar = (andares × AF) · (AF × aparelhos) · pesos dos aparelhos.
+    Andar com nº de apartamentos vazio dá UC NaN (havendo aparelhos no catálogo)."""
+    _, qtd, w = _fixture_matrix(peso_andar_tidy, pesos_uc)
+    F = _aptos_matrix(aptos_por_andar)
+    vazio = np.isnan(F)
+    uc = np.where(vazio, 0.0, F) @ (qtd.T @ w)
+    if qtd.shape[0]:
+        uc[vazio.any(axis=1)] = np.nan
+    return pd.DataFrame({"UC_total": uc}, index=pd.Index(aptos_por_andar.index, name="andar"))
 
 def vazao_probavel_from_uc(uc: float, k: float, exp: float) -> float:
     if (uc or 0) <= 0: return 0.0
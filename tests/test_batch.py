@@ -0,0 +1,45 @@
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.gerador import gerar_predio
+from core.batch import process_project, run_batch
+from core.malha import resolver_malha
+from core.projeto import calc_kwargs
+from core.projeto_npz import save_project_npz
+
+PARAMS = {'material': 'PVC', 'Q_from_Peso': {'acumular_peso': True}, 'reservatorio_m': {'H_oper': 25.0}}
+
+
+def test_projeto_com_malhas_usa_o_gradiente_global(tmp_path):
+    trechos = gerar_predio(400, 0, malhas=True)
+    save_project_npz(tmp_path / 'anel.npz', trechos, PARAMS)
+    kw = calc_kwargs(PARAMS)
+    kw.pop('solucionador')
+    esperado = resolver_malha(trechos, **kw).resultados['p_out (kPa)']
+
+    linha = process_project(tmp_path / 'anel.npz', tmp_path, 'csv', {})
+    assert linha['erro'] is None and linha['solucionador'] == 'malha'
+    p_out = pd.read_csv(linha['saida'])['p_out (kPa)'].to_numpy(float)
+    np.testing.assert_allclose(p_out, esperado, rtol=1e-9, equal_nan=True)
+
+    # gravado pelo app com "Resolver malhas" desmarcado: aproximação em árvore
+    arvore = process_project(tmp_path / 'anel.npz', tmp_path, 'csv', {'solucionador': 'arvore'})
+    assert arvore['erro'] is None and arvore['solucionador'] == 'arvore'
+
+
+def test_saidas_com_o_mesmo_nome_nao_se_sobrescrevem(tmp_path):
+    for pasta, n in (('x', 40), ('y', 60)):
+        (tmp_path / pasta).mkdir()
+        save_project_npz(tmp_path / pasta / 'proj.npz', gerar_predio(n, 0), PARAMS)
+    (tmp_path / 'x' / 'proj.json').write_text(
+        json.dumps({'params': PARAMS, 'trechos': gerar_predio(80, 0).to_dict(orient='list')}))
+    entradas = [tmp_path / 'x', tmp_path / 'y' / 'proj.npz']
+    resumo = run_batch(entradas, tmp_path / 'out', workers=1)
+    assert resumo['erro'].isna().all()
+    saidas = sorted(Path(s).name for s in resumo['saida'])
+    assert saidas == ['x_proj_json.csv', 'x_proj_npz.csv', 'y_proj_npz.csv']
+    assert [len(pd.read_csv(s)) for s in resumo['saida']] == resumo['n_trechos'].tolist()
+    assert resumo['n_trechos'].nunique() == 3
@@ -0,0 +1,31 @@
+import numpy as np
+
+from benchmarks.gerador import gerar_predio
+from core.dimensionamento import dimensionar_dn
+from core.pecas import QuantidadesPecas, leq_candidatos, leq_trechos
+from core.tables import dn_index, load_eqlen_tables
+from core.trecho_store import TrechoStore
+
+PARAMS = dict(material='PVC', modelo_perda='Hazen-Williams', k=0.3, exp=0.5, c=150.0, h_oper=25.0,
+              acumular_peso=True)
+
+
+def test_leq_proposto_com_pecas_e_o_da_tabela_no_dn_escolhido():
+    pvc, _ = load_eqlen_tables()
+    indice = dn_index(pvc)
+    store = TrechoStore.from_frame(gerar_predio(300, 0))
+    pecas = QuantidadesPecas()
+    for i in store.coluna('id')[::3].tolist():
+        pecas.definir(i, {'joelho_90_m': 2, 'te_saida_de_lado_m': 1})
+    base = store.to_frame()
+
+    cand = leq_candidatos(pecas, store.posicao, len(base), indice)
+    prop = dimensionar_dn(base, indice.de_mm, leq_candidatos=cand, **PARAMS)
+
+    # o que `_sincronizar_leq` grava depois de aplicar os DNs propostos
+    leq, com = leq_trechos(pecas, store.posicao, prop['dn_mm'], indice)
+    assert com.sum() == len(pecas)
+    np.testing.assert_allclose(prop['leq_m'][com], leq[com])
+    # sem peças: reescala linear do leq_m informado
+    np.testing.assert_allclose(prop['leq_m'][~com],
+                               base['leq_m'].to_numpy()[~com] * prop['dn_mm'][~com] / base['de_ref_mm'].to_numpy()[~com])
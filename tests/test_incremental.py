@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+
+from core.incremental import ResultadosIncrementais
+from core.network import calcular_resultados
+
+PARAMS = dict(material='PVC', modelo_perda='Hazen-Williams', k=0.3, exp=0.5, c=150.0, h_oper=10.0,
+              acumular_peso=True)
+
+
+def _trechos(de, para):
+    n = len(de)
+    return pd.DataFrame({'id': [f't{i}' for i in range(n)], 'de_no': de, 'para_no': para,
+                         'dn_mm': 25.0, 'comp_real_m': 3.0, 'dz_io_m': 1.0, 'peso_trecho': 1.0, 'leq_m': 0.5})
+
+
+def _conferir(res, df):
+    ref = calcular_resultados(df, **PARAMS)
+    for c, v in ref.items():
+        np.testing.assert_allclose(res[c], v, equal_nan=True, err_msg=c)
+
+
+def test_peso_alterado_em_malha_orfa_nao_trava():
+    # R→S ligado à Entrada; A→B / B→A formam uma malha sem caminho a partir da Entrada
+    df = _trechos(['R', 'A', 'B'], ['S', 'B', 'A'])
+    motor = ResultadosIncrementais()
+    motor.atualizar(df, **PARAMS)
+    df.loc[1, 'peso_trecho'] = 4.0
+    _conferir(motor.atualizar(df, **PARAMS), df)
+
+
+def test_versao_estrutura_dispensa_comparar_ids():
+    df = _trechos(['R', 'S', 'S', 'T'], ['S', 'T', 'U', 'V'])
+    motor = ResultadosIncrementais()
+    motor.atualizar(df, versao_estrutura=1, **PARAMS)
+    df.loc[2, 'dn_mm'] = 32.0         # folha S→U: só ela é recalculada
+    res = motor.atualizar(df, versao_estrutura=1, **PARAMS)
+    assert motor.ultimo_recalculo == 1
+    _conferir(res, df)
+    df.loc[3, 'de_no'] = 'U'          # mudança de estrutura sinalizada pela versão
+    _conferir(motor.atualizar(df, versao_estrutura=2, **PARAMS), df)
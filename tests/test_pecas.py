@@ -0,0 +1,49 @@
+import io
+import json
+
+import pandas as pd
+
+from core.pecas import QuantidadesPecas
+from core.projeto import load_project
+from core.projeto_npz import save_project_npz
+
+
+def _quantidades():
+    q = QuantidadesPecas()
+    q.definir('t1', {'joelho_90_m': 2, 'te_90_saida_de_lado_m': 1})   # nome de coluna → chave canônica
+    q.definir('t2', {})                                               # presente, sem peças (L_eq 0)
+    q.definir('t3', {'registro_gaveta_aberto_m': 1.5})
+    return q
+
+
+def _iguais(a, b):
+    return a.ids() == b.ids() and all(a.linha(i) == b.linha(i) for i in a.ids())
+
+
+def test_triplas_ida_e_volta():
+    q = _quantidades()
+    assert ('t2', None, 0.0) in q.triplas()
+    assert _iguais(QuantidadesPecas.from_triplas(q.triplas()), q)
+
+
+def test_pecas_gravadas_no_projeto_json_e_npz():
+    q = _quantidades()
+    trechos = pd.DataFrame({'id': ['t1', 't2', 't3'], 'de_no': ['A', 'B', 'C'], 'para_no': ['B', 'C', 'D']})
+
+    js = io.BytesIO(json.dumps({'params': {}, 'trechos': trechos.to_dict(orient='list'),
+                                'pecas': q.triplas()}).encode('utf-8'))
+    js.name = 'p.json'
+    npz = io.BytesIO()
+    save_project_npz(npz, trechos, {}, pecas=q.triplas())
+    npz.seek(0)
+    npz.name = 'p.npz'
+    for arq in (js, npz):
+        _, df, triplas = load_project(arq, pecas=True)
+        assert len(df) == 3
+        assert _iguais(QuantidadesPecas.from_triplas(triplas), q)
+
+    vazio = io.BytesIO()
+    save_project_npz(vazio, trechos, {})
+    vazio.seek(0)
+    vazio.name = 'v.npz'
+    assert load_project(vazio, pecas=True)[2] == []
@@ -0,0 +1,42 @@
+import random
+
+from core.topologia import IndiceNos
+
+ENTRADA, TE = 'Entrada de Água', 'Tê'
+
+
+def _estado(idx):
+    comp = {frozenset(nos) for nos in idx.componentes().values()}
+    soltos = idx.desconectados()
+    # sem Entrada, o principal é o maior componente (empates: qualquer um deles)
+    return idx.ciclos, comp, sorted(soltos) if any('entrada' in t for t in idx.tipos.values()) else len(soltos)
+
+
+def test_desconectados_sai_das_raizes():
+    idx = IndiceNos.from_columns(['A', 'B', 'X', 'P'], ['B', 'C', 'Y', 'Q'], [ENTRADA, TE, TE, ENTRADA])
+    # P-Q tem a própria Entrada; só X-Y fica sem alimentação
+    assert sorted(idx.desconectados()) == ['X', 'Y']
+    idx.adicionar('C', 'X', TE)
+    assert idx.desconectados() == []
+    idx.remover('B', 'C', TE)
+    assert sorted(idx.desconectados()) == ['C', 'X', 'Y']
+
+
+def test_remocoes_equivalem_a_recriar_o_indice():
+    rng = random.Random(7)
+    for _ in range(300):
+        idx, trechos = IndiceNos(), []
+        for _ in range(rng.randint(1, 25)):
+            if trechos and rng.random() < 0.4:
+                t = trechos.pop(rng.randrange(len(trechos)))
+                idx.remover(*t)
+            else:
+                de, para = map(str, rng.sample(range(8), 2))
+                if any(t[:2] == (de, para) for t in trechos):
+                    continue
+                t = (de, para, rng.choice([TE, TE, ENTRADA]))
+                trechos.append(t)
+                idx.adicionar(*t)
+            if rng.random() < 0.5:
+                novo = IndiceNos.from_columns(*zip(*trechos)) if trechos else IndiceNos()
+                assert _estado(idx) == _estado(novo)
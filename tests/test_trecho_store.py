@@ -0,0 +1,41 @@
+import pandas as pd
+
+from core.trecho_store import TrechoStore
+
+
+def _store():
+    return TrechoStore.from_frame(pd.DataFrame({
+        'id': list('abcdefg'), 'ramo': ['A'] * 5 + ['B'] * 2, 'ordem': [1, 2, 4, 7, 9, 1, 2],
+        'de_no': list('1234567'), 'para_no': list('2345678')}))
+
+
+def _sequencia(store, ramo):
+    f = store.to_frame()
+    f = f[f['ramo'] == ramo].sort_values('ordem', kind='stable')
+    return f['id'].tolist(), f['ordem'].tolist()
+
+
+def test_mover_blocos_mantem_valores_de_ordem():
+    s = _store()
+    pos = lambda *ids: [s.posicao(i) for i in ids]
+    s.mover(pos('c', 'd'), -1)
+    assert _sequencia(s, 'A') == (list('acdbe'), [1, 2, 4, 7, 9])
+    s.mover(pos('a', 'e'), +1)          # 'e' já é o último: só 'a' desce
+    assert _sequencia(s, 'A') == (list('cadbe'), [1, 2, 4, 7, 9])
+    s.mover(pos('c', 'g'), -1)          # 'c' já é o primeiro do ramo A; 'g' sobe no B
+    assert _sequencia(s, 'A')[0] == list('cadbe') and _sequencia(s, 'B') == (list('gf'), [1, 2])
+
+
+def test_sequencia_em_cache_acompanha_edicoes():
+    s = _store()
+    s.mover([s.posicao('b')], +1)       # monta a sequência do ramo A
+    assert _sequencia(s, 'A')[0] == list('acbde')
+    s.set_coluna('ordem', [3], [s.posicao('e')])    # edição fora de `mover`: e vai para entre c e b
+    s.mover([s.posicao('e')], -1)
+    assert _sequencia(s, 'A') == (list('aecbd'), [1, 2, 3, 4, 7])
+    s.set_coluna('ramo', ['A'], [s.posicao('f')])   # f entra no ramo A com ordem 1 (empata com a)
+    s.append({'id': 'h', 'ramo': 'A', 'ordem': 100, 'de_no': '8', 'para_no': '9'})
+    s.remover([s.posicao('c')])
+    s.mover([s.posicao('h')], -1)       # ordem repetida: o ramo é renumerado 1..n antes
+    ids, ordem = _sequencia(s, 'A')
+    assert ids == list('afebhd') and ordem == [1, 2, 3, 4, 5, 6]
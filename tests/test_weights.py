@@ -0,0 +1,36 @@
+import numpy as np
+import pandas as pd
+
+from benchmarks.gerador import gerar_peso_andar
+from core.weights import compute_uc_by_floor, normalize_peso_andar_table
+
+
+def _uc_por_linhas(peso_andar_tidy, pesos_uc, aptos_por_andar):
+    """Implementação original, aparelho a aparelho e andar a andar."""
+    cat = normalize_peso_andar_table(peso_andar_tidy)
+    pes = pesos_uc.set_index("aparelho_full")["peso_uc"]
+    res_rows = []
+    for andar, row in aptos_por_andar.iterrows():
+        total_uc = 0.0
+        for _, r in cat.iterrows():
+            qtd = 0.0
+            for af in ["AF1", "AF2", "AF3", "AF4"]:
+                qtd += (r.get(af, 0.0) or 0.0) * (row.get(af, 0.0) or 0.0)
+            total_uc += qtd * float(pes.get(r["aparelho_full"], 1.0))
+        res_rows.append({"andar": andar, "UC_total": total_uc})
+    return pd.DataFrame(res_rows).set_index("andar")
+
+
+def test_uc_por_andar_igual_a_implementacao_por_linhas():
+    tidy, pesos, aptos = gerar_peso_andar(12, 3)
+    tidy.loc[2, 'AF3'] = np.nan                                   # quantidade vazia no catálogo conta 0
+    pesos = pesos[pesos['aparelho_full'] != 'Pia']                 # aparelho sem peso cadastrado: 1 UC
+    aptos = aptos.astype(float)
+    aptos.loc['2º', 'AF2'] = np.nan                                # nº de apartamentos vazio: UC NaN
+    aptos.loc['5º', ['AF1', 'AF4']] = np.nan
+    for a in (aptos, aptos.drop(columns='AF3')):                   # coluna ausente conta 0
+        esperado = _uc_por_linhas(tidy, pesos, a)
+        obtido = compute_uc_by_floor(tidy, pesos, a)
+        assert obtido.index.tolist() == esperado.index.tolist()
+        np.testing.assert_allclose(obtido['UC_total'], esperado['UC_total'], rtol=1e-12, equal_nan=True)
+        assert obtido['UC_total'].isna().tolist() == [i in ('2º', '5º') for i in a.index]